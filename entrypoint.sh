@@ -20,6 +20,12 @@ if [ "$DJANGO_MODE" = "production" ]; then
       exit 1
     fi
 
+    python manage.py createcachetable
+    if [ $? -ne 0 ]; then
+      echo "Error: createcachetable failed."
+      exit 1
+    fi
+
     echo "Migrations completed successfully."
     gunicorn vsm_tb.wsgi:application --bind 0.0.0.0:8001
 else
@@ -36,6 +42,12 @@ else
       exit 1
     fi
 
+    python manage.py createcachetable
+    if [ $? -ne 0 ]; then
+      echo "Error: createcachetable failed."
+      exit 1
+    fi
+
     echo "Migrations completed successfully."
     python manage.py runserver 0.0.0.0:8000
 fi
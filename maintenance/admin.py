@@ -1,12 +1,17 @@
 from django.contrib import admin, messages
-from .models import Maintenance
-from datetime import date, timedelta
-from django.utils.html import format_html
-from django.urls import reverse
+from .models import Maintenance, MaintenancePlan
+from datetime import MAXYEAR, MINYEAR, date, timedelta
+from django.http import Http404
+from django.template.response import TemplateResponse
+from django.utils.html import format_html, format_html_join
+from django.urls import path, reverse
+from tb2_vsm.exports import ExportMixin
+from .schedule import generate_due_dates, month_items
+from .summary import EXPIRED, UPCOMING, UPCOMING_DAYS, maintenance_summary
 
 
 @admin.register(Maintenance)
-class MaintenanceAdmin(admin.ModelAdmin):
+class MaintenanceAdmin(ExportMixin, admin.ModelAdmin):
     list_display = (
         "equipment",
         "equipment_id_link",
@@ -16,8 +21,66 @@ class MaintenanceAdmin(admin.ModelAdmin):
         "colored_status",
         "next_maintenance_in_days_display",
     )
-    list_filter = ("equipment__location",)
+    list_filter = ("status", "equipment__location")
+    list_select_related = ("equipment__location",)
     ordering = ("next_maintenance_day",)
+    change_list_template = "admin/maintenance/maintenance/change_list.html"
+    export_fields = [
+        ("Equipment ID", "equipment_id"),
+        ("Equipment", "equipment.name"),
+        ("Location", "equipment.location"),
+        ("Last Maintenance", "last_maintenance_day"),
+        ("Next Maintenance", "next_maintenance_day"),
+        ("Status", lambda obj: obj.get_status_display()),
+        ("Next Maintenance In Days", "next_maintenance_in_days_display"),
+    ]
+    export_select_related = ["equipment__location"]
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "calendar/",
+                self.admin_site.admin_view(self.calendar_view),
+                name="maintenance_calendar",
+            ),
+            path(
+                "calendar/<int:year>/<int:month>/",
+                self.admin_site.admin_view(self.calendar_view),
+                name="maintenance_calendar_month",
+            ),
+        ]
+        return custom_urls + urls
+
+    def calendar_view(self, request, year=None, month=None):
+        today = date.today()
+        if year is None:
+            year, month = today.year, today.month
+        # The previous and next month links must stay within date's range.
+        if not (MINYEAR < year < MAXYEAR and 1 <= month <= 12):
+            raise Http404("No such month.")
+        weeks, items = month_items(year, month)
+        first = date(year, month, 1)
+        previous = first - timedelta(days=1)
+        following = first + timedelta(days=32)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Maintenance Calendar – {first:%B %Y}",
+            "opts": self.model._meta,
+            "month": month,
+            "today": today,
+            "weeks": [[(day, items.get(day, [])) for day in week] for week in weeks],
+            "previous_url": reverse(
+                "admin:maintenance_calendar_month",
+                args=[previous.year, previous.month],
+            ),
+            "next_url": reverse(
+                "admin:maintenance_calendar_month",
+                args=[following.year, following.month],
+            ),
+        }
+        return TemplateResponse(request, "admin/maintenance_calendar.html", context)
 
     def equipment_id_link(self, obj):
         url = reverse("admin:tb2_vsm_equipment_change", args=[obj.equipment.id])
@@ -38,8 +101,10 @@ class MaintenanceAdmin(admin.ModelAdmin):
     next_maintenance_in_days_display.short_description = "Next Maintenance In Days"
 
     def colored_status(self, obj):
-        color = "#ffcccc" if obj.is_expired() else "#ccffcc"
-        label = "Expired" if obj.is_expired() else "On Track"
+        # Uses the stored status kept current by refresh_maintenance_status.
+        expired = obj.status == "expired"
+        color = "#ffcccc" if expired else "#ccffcc"
+        label = "Expired" if expired else "On Track"
         return format_html(
             '<div style="background-color:{}; border-radius:5px; padding:2px 8px; display:inline-block;">{}</div>',
             color,
@@ -47,34 +112,68 @@ class MaintenanceAdmin(admin.ModelAdmin):
         )
 
     colored_status.short_description = "Status"
+    colored_status.admin_order_field = "status"
 
     def changelist_view(self, request, extra_context=None):
-        today = date.today()
-        upcoming_maintenances = Maintenance.objects.filter(
-            next_maintenance_day__lte=today + timedelta(days=7),
-            next_maintenance_day__gte=today,
-        )
-        expired_maintenances = Maintenance.objects.filter(
-            next_maintenance_day__lt=today
-        )
-
-        maintenance_msgs = []
+        if request.method == "GET":
+            self.add_summary_banner(request)
+        return super().changelist_view(request, extra_context=extra_context)
 
-        if expired_maintenances.exists():
-            expired_list = ", ".join(
-                f"{m.equipment.name} (Expired: {m.next_maintenance_day})"
-                for m in expired_maintenances
+    def add_summary_banner(self, request):
+        today = date.today()
+        url = reverse("admin:maintenance_maintenance_changelist")
+        links = {
+            EXPIRED: f"{url}?next_maintenance_day__lt={today.isoformat()}",
+            UPCOMING: (
+                f"{url}?next_maintenance_day__gte={today.isoformat()}"
+                f"&next_maintenance_day__lte="
+                f"{(today + timedelta(days=UPCOMING_DAYS)).isoformat()}"
+            ),
+        }
+        labels = {
+            EXPIRED: "Expired maintenance",
+            UPCOMING: f"Due within {UPCOMING_DAYS} days",
+        }
+
+        parts = []
+        for bucket, data in maintenance_summary().items():
+            if not data["count"]:
+                continue
+            names = ", ".join(
+                f"{item['equipment']} ({item['next_maintenance_day']})"
+                for item in data["items"]
             )
-            maintenance_msgs.append(f"Expired Maintenance: {expired_list}")
-
-        if upcoming_maintenances.exists():
-            upcoming_list = ", ".join(
-                f"{m.equipment.name} (Next: {m.next_maintenance_day})"
-                for m in upcoming_maintenances
+            more = data["count"] - len(data["items"])
+            if more > 0:
+                names += f" and {more} more"
+            parts.append(
+                format_html(
+                    '{}: <a href="{}">{}</a> — {}',
+                    labels[bucket],
+                    links[bucket],
+                    data["count"],
+                    names,
+                )
+            )
+        if parts:
+            messages.warning(
+                request, format_html_join(" | ", "{}", ((p,) for p in parts))
             )
-            maintenance_msgs.append(f"Upcoming Maintenance: {upcoming_list}")
 
-        if maintenance_msgs:
-            messages.warning(request, " | ".join(maintenance_msgs))
 
-        return super().changelist_view(request, extra_context=extra_context)
+@admin.register(MaintenancePlan)
+class MaintenancePlanAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "category", "equipment", "interval_days", "active")
+    list_filter = ("active", "category")
+    list_select_related = ("equipment",)
+    autocomplete_fields = ("equipment",)
+    actions = ["generate_due_dates_action"]
+
+    @admin.action(description="Generate due dates for selected active plans")
+    def generate_due_dates_action(self, request, queryset):
+        result = generate_due_dates(plans=queryset)
+        messages.success(
+            request,
+            f"Rolled {result['rolled']} due date(s) forward and created "
+            f"{result['created']} maintenance record(s).",
+        )
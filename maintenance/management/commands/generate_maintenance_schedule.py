@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.schedule import generate_due_dates
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply active maintenance plans: roll next due dates forward from the "
+        "last maintenance and create records for planned equipment without one."
+    )
+
+    def handle(self, *args, **options):
+        result = generate_due_dates()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rolled {result['rolled']} due date(s) forward and created "
+                f"{result['created']} maintenance record(s)."
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from maintenance.models import Maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute stored maintenance statuses for today with set-based updates. "
+        "Run daily (e.g. from cron) so statuses do not go stale."
+    )
+
+    def handle(self, *args, **options):
+        changed = Maintenance.objects.refresh_statuses()
+        self.stdout.write(
+            self.style.SUCCESS(f"Updated {changed} maintenance status(es).")
+        )
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maintenance", "0003_alter_maintenance_equipment"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="maintenance",
+            name="next_maintenance_day",
+            field=models.DateField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="maintenance",
+            index=models.Index(
+                fields=["status", "next_maintenance_day"],
+                name="maintenance_status_next_idx",
+            ),
+        ),
+    ]
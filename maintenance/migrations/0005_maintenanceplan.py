@@ -0,0 +1,87 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maintenance", "0004_maintenance_status_indexes"),
+        ("tb2_vsm", "0017_serial_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MaintenancePlan",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "category",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("Laser Marker", "Laser Marker"),
+                            ("Computer", "Computer"),
+                            ("SDR", "SDR"),
+                            ("Printer", "Printer"),
+                            ("USB-Hub", "USB-Hub"),
+                            ("JIG", "JIG"),
+                            ("TMS", "TMS"),
+                            ("Display", "Display"),
+                            ("NFC Reader", "NFC Reader"),
+                            ("Camera", "Camera"),
+                            ("Switch", "Switch"),
+                            ("UPS", "UPS"),
+                            ("Facility Controller", "Facility Controller"),
+                            ("Scanner", "Scanner"),
+                            ("Button", "Button"),
+                            ("Light Strip", "Light Strip"),
+                            ("Router", "Router"),
+                            ("Other", "Other"),
+                        ],
+                        max_length=20,
+                        null=True,
+                        unique=True,
+                    ),
+                ),
+                ("interval_days", models.PositiveIntegerField()),
+                ("active", models.BooleanField(default=True)),
+                ("notes", models.TextField(blank=True, null=True)),
+                (
+                    "equipment",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="maintenance_plan",
+                        to="tb2_vsm.equipment",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.CheckConstraint(
+                        condition=models.Q(
+                            models.Q(
+                                ("category__isnull", False), ("equipment__isnull", True)
+                            ),
+                            models.Q(
+                                ("category__isnull", True), ("equipment__isnull", False)
+                            ),
+                            _connector="OR",
+                        ),
+                        name="maintenance_plan_category_xor_equipment",
+                    )
+                ],
+            },
+        ),
+    ]
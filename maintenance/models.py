@@ -1,9 +1,27 @@
 from django.db import models
+from django.db.models import Q
 
 from tb2_vsm.models import Equipment
 from datetime import date
 
 
+class MaintenanceQuerySet(models.QuerySet):
+    def refresh_statuses(self, today=None):
+        """Bring stored statuses in line with ``today`` using two UPDATEs.
+
+        Returns the number of rows whose status changed.
+        """
+        today = today or date.today()
+        expired = Q(next_maintenance_day__lt=today)
+        changed = (
+            self.filter(expired).exclude(status="expired").update(status="expired")
+        )
+        changed += (
+            self.exclude(expired).exclude(status="on_track").update(status="on_track")
+        )
+        return changed
+
+
 class Maintenance(models.Model):
     STATUS_CHOICES = [
         ("expired", "Expired"),
@@ -12,13 +30,23 @@ class Maintenance(models.Model):
 
     equipment = models.OneToOneField(Equipment, on_delete=models.CASCADE)
     last_maintenance_day = models.DateField(blank=True, null=True)
-    next_maintenance_day = models.DateField(blank=True, null=True)
+    next_maintenance_day = models.DateField(blank=True, null=True, db_index=True)
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
         editable=False,
     )
 
+    objects = MaintenanceQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "next_maintenance_day"],
+                name="maintenance_status_next_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.equipment.name} - {self.status}"
 
@@ -38,3 +66,43 @@ class Maintenance(models.Model):
         else:
             self.status = "on_track"
         super().save(*args, **kwargs)
+
+
+class MaintenancePlan(models.Model):
+    """Maintenance interval for every equipment of a category, or for one item.
+
+    A plan for a specific equipment takes precedence over its category plan.
+    """
+
+    category = models.CharField(
+        max_length=20,
+        choices=Equipment.CATEGORY_CHOICES,
+        blank=True,
+        null=True,
+        unique=True,
+    )
+    equipment = models.OneToOneField(
+        Equipment,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="maintenance_plan",
+    )
+    interval_days = models.PositiveIntegerField()
+    active = models.BooleanField(default=True)
+    notes = models.TextField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    Q(category__isnull=False, equipment__isnull=True)
+                    | Q(category__isnull=True, equipment__isnull=False)
+                ),
+                name="maintenance_plan_category_xor_equipment",
+            ),
+        ]
+
+    def __str__(self):
+        target = self.equipment or self.category
+        return f"{target} every {self.interval_days} days"
@@ -0,0 +1,111 @@
+import calendar
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+
+from tb2_vsm import serial_lookup
+from tb2_vsm.models import Equipment
+
+from . import summary
+from .models import Maintenance, MaintenancePlan
+
+
+def _plan_groups(plans=None):
+    """Yield ``(equipment_filter, interval_days)`` per plan group.
+
+    Item plans are grouped by interval; category plans skip equipment that
+    has an active plan of its own. The number of groups depends on the plans,
+    never on the number of equipment. ``plans`` limits the groups to a subset
+    of the plans; inactive ones are ignored either way.
+    """
+    restricted = plans is not None
+    if plans is None:
+        plans = MaintenancePlan.objects.all()
+    plans = plans.filter(active=True)
+    item_plans = plans.filter(equipment__isnull=False)
+    item_intervals = (
+        item_plans.order_by("interval_days")
+        .values_list("interval_days", flat=True)
+        .distinct()
+    )
+    for interval in item_intervals:
+        equipment_filter = Q(
+            maintenance_plan__active=True, maintenance_plan__interval_days=interval
+        )
+        if restricted:
+            equipment_filter &= Q(maintenance_plan__in=item_plans)
+        yield equipment_filter, interval
+    for category, interval in plans.filter(category__isnull=False).values_list(
+        "category", "interval_days"
+    ):
+        yield Q(category=category) & ~Q(maintenance_plan__active=True), interval
+
+
+def generate_due_dates(today=None, batch_size=1000, plans=None):
+    """Apply maintenance plans to every equipment with set-based statements.
+
+    Records whose last maintenance is newer than their next due date get
+    ``next = last + interval`` in one UPDATE per plan group. Planned equipment
+    without a record gets one due ``interval`` days from ``today``. Statuses
+    are refreshed afterwards. ``plans`` restricts generation to the given
+    plans' equipment. Returns ``{"rolled": n, "created": n}``.
+    """
+    today = today or date.today()
+    rolled = created = 0
+    needs_roll = Q(last_maintenance_day__isnull=False) & (
+        Q(next_maintenance_day__isnull=True)
+        | Q(next_maintenance_day__lte=F("last_maintenance_day"))
+    )
+
+    with transaction.atomic():
+        for equipment_filter, interval in _plan_groups(plans):
+            equipment = Equipment.objects.filter(equipment_filter)
+            rolled += Maintenance.objects.filter(
+                needs_roll, equipment__in=equipment
+            ).update(
+                next_maintenance_day=F("last_maintenance_day")
+                + timedelta(days=interval)
+            )
+            missing = equipment.filter(maintenance__isnull=True).values_list(
+                "pk", flat=True
+            )
+            created += len(
+                Maintenance.objects.bulk_create(
+                    (
+                        Maintenance(
+                            equipment_id=pk,
+                            next_maintenance_day=today + timedelta(days=interval),
+                            status="on_track",
+                        )
+                        for pk in missing.iterator()
+                    ),
+                    batch_size=batch_size,
+                )
+            )
+        Maintenance.objects.refresh_statuses(today)
+        # Set-based updates skip the signals that invalidate the banner and
+        # the cached serial lookups.
+        transaction.on_commit(summary.bump_version)
+        transaction.on_commit(serial_lookup.bump_version)
+    return {"rolled": rolled, "created": created}
+
+
+def month_items(year, month):
+    """Return ``(weeks, items_by_day)`` for a calendar month.
+
+    ``weeks`` is a list of weeks of dates (Monday first); due items come from
+    a single date-range query.
+    """
+    weeks = calendar.Calendar().monthdatescalendar(year, month)
+    items = (
+        Maintenance.objects.filter(
+            next_maintenance_day__range=(weeks[0][0], weeks[-1][-1])
+        )
+        .select_related("equipment__location")
+        .order_by("next_maintenance_day", "equipment__name")
+    )
+    by_day = {}
+    for item in items:
+        by_day.setdefault(item.next_maintenance_day, []).append(item)
+    return weeks, by_day
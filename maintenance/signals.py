@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import summary
+from .models import Maintenance
+
+
+@receiver(post_save, sender=Maintenance)
+@receiver(post_delete, sender=Maintenance)
+@receiver(post_save, sender="tb2_vsm.Equipment")
+def invalidate_maintenance_summary(sender, raw=False, **kwargs):
+    if not raw:
+        summary.bump_version()
@@ -0,0 +1,81 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, F, Value, When, Window
+from django.db.models.functions import RowNumber
+
+from .models import Maintenance
+
+UPCOMING_DAYS = 7
+TOP_N = 3
+VERSION_KEY = "maintenance:summary_version"
+EXPIRED = "expired"
+UPCOMING = "upcoming"
+
+
+def bump_version():
+    """Invalidate the cached summary after a Maintenance change."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        if not cache.add(VERSION_KEY, 1, timeout=None):
+            cache.incr(VERSION_KEY)
+
+
+def _seconds_until_tomorrow():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return max(int((tomorrow - datetime.now()).total_seconds()), 1)
+
+
+def compute_summary(today, limit=TOP_N):
+    """Count expired and upcoming maintenance and list the first ``limit`` of
+    each, in a single query ranked with window functions."""
+    bucket = Case(
+        When(next_maintenance_day__lt=today, then=Value(EXPIRED)),
+        default=Value(UPCOMING),
+        output_field=CharField(),
+    )
+    rows = (
+        Maintenance.objects.filter(
+            next_maintenance_day__lte=today + timedelta(days=UPCOMING_DAYS)
+        )
+        .select_related("equipment")
+        .annotate(
+            bucket=bucket,
+            bucket_total=Window(Count("pk"), partition_by=[bucket]),
+            rank=Window(
+                RowNumber(),
+                partition_by=[bucket],
+                order_by=[F("next_maintenance_day").asc(), F("pk").asc()],
+            ),
+        )
+        .filter(rank__lte=limit)
+        .order_by("next_maintenance_day", "pk")
+    )
+
+    summary = {
+        EXPIRED: {"count": 0, "items": []},
+        UPCOMING: {"count": 0, "items": []},
+    }
+    for row in rows:
+        summary[row.bucket]["count"] = row.bucket_total
+        summary[row.bucket]["items"].append(
+            {
+                "id": row.pk,
+                "equipment": row.equipment.name or str(row.equipment),
+                "next_maintenance_day": row.next_maintenance_day,
+            }
+        )
+    return summary
+
+
+def maintenance_summary():
+    """Return the summary for today, cached until midnight or the next
+    Maintenance change."""
+    today = date.today()
+    key = f"maintenance:summary:{today.isoformat()}:{cache.get(VERSION_KEY, 0)}"
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_summary(today)
+        cache.set(key, summary, timeout=_seconds_until_tomorrow())
+    return summary
@@ -1,8 +1,18 @@
 from django.test import TestCase
 from django.utils import timezone
-from datetime import timedelta
-from .models import Maintenance
-from tb2_vsm.models import Location, Equipment
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from io import StringIO
+from django.urls import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Maintenance, MaintenancePlan
+from .schedule import generate_due_dates
+from .summary import compute_summary, maintenance_summary
+from tb2_vsm import serial_lookup
+from tb2_vsm.models import Location, Equipment, EquipmentSerial
 from django.db.utils import IntegrityError
 
 
@@ -73,3 +83,289 @@ class MaintenanceModelTest(TestCase):
                 next_maintenance_day=self.next_maintenance + timedelta(days=10),
                 status="on_track",
             )
+
+
+class MaintenanceSummaryTest(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(country="DE", supplier_name="Sup")
+        self.today = date.today()
+        cache.clear()
+
+    def add(self, days, name=None):
+        equipment = Equipment.objects.create(
+            name=name or f"Equipment {days}",
+            category=Equipment.OTHER,
+            location=self.location,
+        )
+        return Maintenance.objects.create(
+            equipment=equipment,
+            next_maintenance_day=self.today + timedelta(days=days),
+        )
+
+    def test_counts_and_capped_lists_in_one_query(self):
+        for days in [-30, -10, -5, -1, 0, 3, 7, 8, 60]:
+            self.add(days)
+        with self.assertNumQueries(1):
+            result = compute_summary(self.today, limit=2)
+        self.assertEqual(result["expired"]["count"], 4)
+        self.assertEqual(
+            [item["equipment"] for item in result["expired"]["items"]],
+            ["Equipment -30", "Equipment -10"],
+        )
+        self.assertEqual(result["upcoming"]["count"], 3)
+        self.assertEqual(
+            [item["equipment"] for item in result["upcoming"]["items"]],
+            ["Equipment 0", "Equipment 3"],
+        )
+
+    def test_summary_is_cached_until_maintenance_changes(self):
+        self.add(-2)
+        self.assertEqual(maintenance_summary()["expired"]["count"], 1)
+        with self.assertNumQueries(2):  # version + summary from the shared cache
+            maintenance_summary()
+        self.add(-3)
+        self.assertEqual(maintenance_summary()["expired"]["count"], 2)
+
+    def test_banner_shows_counts_and_filtered_links(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        for days in range(-6, 0):
+            self.add(days)
+        self.add(2, name="Laser")
+
+        url = reverse("admin:maintenance_maintenance_changelist")
+        response = self.client.get(url)
+        self.assertContains(response, "and 3 more")
+        self.assertContains(response, "Laser")
+        self.assertNotContains(response, "Equipment -1 (")
+        link = f"{url}?next_maintenance_day__lt={self.today.isoformat()}"
+        self.assertContains(response, f'href="{link}"')
+        filtered = self.client.get(link)
+        self.assertEqual(filtered.status_code, 200)
+        self.assertEqual(filtered.context["cl"].result_count, 6)
+
+
+class MaintenanceStatusRefreshTest(TestCase):
+    def setUp(self):
+        location = Location.objects.create(country="DE", supplier_name="Sup")
+        self.today = date.today()
+        self.records = {}
+        for days in [-5, 0, 5]:
+            equipment = Equipment.objects.create(
+                name=f"Equipment {days}", category=Equipment.OTHER, location=location
+            )
+            self.records[days] = Maintenance.objects.create(
+                equipment=equipment,
+                next_maintenance_day=self.today + timedelta(days=days),
+            )
+
+    def test_refresh_flips_stale_statuses_with_two_updates(self):
+        # Simulate time passing: statuses stored yesterday are now stale.
+        Maintenance.objects.update(status="on_track")
+        Maintenance.objects.filter(pk=self.records[5].pk).update(status="expired")
+        with self.assertNumQueries(2):
+            changed = Maintenance.objects.refresh_statuses(self.today)
+        self.assertEqual(changed, 2)
+        statuses = dict(
+            Maintenance.objects.values_list("next_maintenance_day", "status")
+        )
+        self.assertEqual(
+            statuses,
+            {
+                self.today - timedelta(days=5): "expired",
+                self.today: "on_track",
+                self.today + timedelta(days=5): "on_track",
+            },
+        )
+        self.assertEqual(
+            Maintenance.objects.refresh_statuses(self.today + timedelta(days=1)), 1
+        )
+
+    def test_command_and_status_filter(self):
+        Maintenance.objects.update(status="on_track")
+        out = StringIO()
+        call_command("refresh_maintenance_status", stdout=out)
+        self.assertIn("Updated 1 maintenance status(es).", out.getvalue())
+
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        response = self.client.get(
+            reverse("admin:maintenance_maintenance_changelist"),
+            {"status__exact": "expired"},
+        )
+        self.assertEqual(response.context["cl"].result_count, 1)
+
+
+class MaintenanceScheduleTest(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(country="DE", supplier_name="Sup")
+        self.today = date.today()
+
+    def equipment(self, category=Equipment.PRINTER, name="Item"):
+        return Equipment.objects.create(
+            name=name, category=category, location=self.location
+        )
+
+    def test_generates_due_dates_per_category_and_item_plan(self):
+        MaintenancePlan.objects.create(category=Equipment.PRINTER, interval_days=30)
+        printers = [self.equipment(name=f"Printer {i}") for i in range(3)]
+        special = self.equipment(name="Special printer")
+        MaintenancePlan.objects.create(equipment=special, interval_days=7)
+        unplanned = self.equipment(category=Equipment.CAMERA)
+
+        done = self.today - timedelta(days=40)
+        Maintenance.objects.create(equipment=printers[0], last_maintenance_day=done)
+        Maintenance.objects.create(
+            equipment=special,
+            last_maintenance_day=self.today,
+            next_maintenance_day=self.today - timedelta(days=3),
+        )
+        untouched = self.today + timedelta(days=90)
+        Maintenance.objects.create(
+            equipment=printers[1],
+            last_maintenance_day=done,
+            next_maintenance_day=untouched,
+        )
+
+        with self.assertNumQueries(11):
+            result = generate_due_dates(self.today)
+        self.assertEqual(result, {"rolled": 2, "created": 1})
+
+        def due(equipment):
+            return Maintenance.objects.get(equipment=equipment)
+
+        self.assertEqual(due(printers[0]).next_maintenance_day, done + timedelta(30))
+        self.assertEqual(due(printers[0]).status, "expired")
+        self.assertEqual(due(special).next_maintenance_day, self.today + timedelta(7))
+        self.assertEqual(due(special).status, "on_track")
+        self.assertEqual(due(printers[1]).next_maintenance_day, untouched)
+        self.assertEqual(
+            due(printers[2]).next_maintenance_day, self.today + timedelta(30)
+        )
+        self.assertFalse(Maintenance.objects.filter(equipment=unplanned).exists())
+
+        self.assertEqual(generate_due_dates(self.today), {"rolled": 0, "created": 0})
+
+    def test_generates_due_dates_for_selected_plans_only(self):
+        printer_plan = MaintenancePlan.objects.create(
+            category=Equipment.PRINTER, interval_days=30
+        )
+        MaintenancePlan.objects.create(category=Equipment.CAMERA, interval_days=10)
+        printer = self.equipment()
+        camera = self.equipment(category=Equipment.CAMERA, name="Camera")
+        special = self.equipment(name="Special printer")
+        special_plan = MaintenancePlan.objects.create(
+            equipment=special, interval_days=7
+        )
+        other = self.equipment(name="Other printer")
+        MaintenancePlan.objects.create(equipment=other, interval_days=7)
+
+        result = generate_due_dates(
+            self.today,
+            plans=MaintenancePlan.objects.filter(
+                pk__in=[printer_plan.pk, special_plan.pk]
+            ),
+        )
+        self.assertEqual(result, {"rolled": 0, "created": 2})
+        self.assertEqual(
+            set(Maintenance.objects.values_list("equipment", flat=True)),
+            {printer.pk, special.pk},
+        )
+        self.assertFalse(Maintenance.objects.filter(equipment=camera).exists())
+        self.assertEqual(
+            Maintenance.objects.get(equipment=special).next_maintenance_day,
+            self.today + timedelta(7),
+        )
+
+    def test_admin_action_generates_due_dates_for_selected_plans(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        printer_plan = MaintenancePlan.objects.create(
+            category=Equipment.PRINTER, interval_days=30
+        )
+        MaintenancePlan.objects.create(category=Equipment.CAMERA, interval_days=10)
+        printer = self.equipment()
+        self.equipment(category=Equipment.CAMERA, name="Camera")
+
+        response = self.client.post(
+            reverse("admin:maintenance_maintenanceplan_changelist"),
+            {
+                "action": "generate_due_dates_action",
+                "_selected_action": [printer_plan.pk],
+            },
+            follow=True,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "created 1 maintenance record(s)")
+        self.assertEqual(
+            list(Maintenance.objects.values_list("equipment", flat=True)),
+            [printer.pk],
+        )
+
+    def test_due_date_generation_invalidates_serial_lookups(self):
+        MaintenancePlan.objects.create(category=Equipment.PRINTER, interval_days=30)
+        printer = self.equipment()
+        EquipmentSerial.objects.create(equipment=printer, serial_number="PR-1")
+        serial_lookup.serial_cache.clear()
+
+        def lookup():
+            _, [row], cached = serial_lookup.lookup_serial("PR-1")
+            return row["maintenance"], cached
+
+        self.assertEqual(lookup(), (None, False))
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_due_dates(self.today)
+        maintenance, cached = lookup()
+        self.assertFalse(cached)
+        self.assertEqual(maintenance["days_until"], 30)
+        self.assertTrue(lookup()[1])
+
+    def test_plan_must_target_category_or_equipment(self):
+        with self.assertRaises(IntegrityError):
+            MaintenancePlan.objects.create(interval_days=10)
+
+    def test_calendar_loads_month_in_one_query(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        first = self.today.replace(day=1)
+        for i in range(5):
+            Maintenance.objects.create(
+                equipment=self.equipment(name=f"Due {i}"),
+                next_maintenance_day=first + timedelta(days=i * 3),
+            )
+        url = reverse(
+            "admin:maintenance_calendar_month", args=[first.year, first.month]
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for i in range(5):
+            self.assertContains(response, f"Due {i}")
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        maintenance_queries = [
+            q for q in ctx.captured_queries if "maintenance_maintenance" in q["sql"]
+        ]
+        self.assertEqual(len(maintenance_queries), 1)
+        self.assertEqual(
+            self.client.get(reverse("admin:maintenance_calendar")).status_code, 200
+        )
+
+    def test_calendar_rejects_months_out_of_range(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        for year, month in [(0, 1), (1, 1), (9999, 12), (2024, 0), (2024, 13)]:
+            url = reverse("admin:maintenance_calendar_month", args=[year, month])
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+        url = reverse("admin:maintenance_calendar_month", args=[9998, 12])
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,7 +1,20 @@
-from django.contrib import admin
-from django.utils.html import format_html
-from .models import BackupEquipment, Buyer, Producer
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from . import ledger, reorder
+from .models import BackupEquipment, Buyer, Producer, StockMovement
 from decimal import Decimal
+from tb2_vsm.admin import CascadeDeleteMixin
+from tb2_vsm.exports import FORMATS, XLSX, ExportMixin, stream_csv, xlsx_response
+
+CENTS = Decimal("0.01")
 
 
 @admin.register(Buyer)
@@ -39,7 +52,10 @@ class ProducerAdmin(admin.ModelAdmin):
 
 
 @admin.register(BackupEquipment)
-class BackupEquipmentAdmin(admin.ModelAdmin):
+class BackupEquipmentAdmin(CascadeDeleteMixin, ExportMixin, admin.ModelAdmin):
+    change_list_template = (
+        "admin/spare_parts_management/backupequipment/change_list.html"
+    )
     list_display = [
         "id",
         "name",
@@ -56,7 +72,25 @@ class BackupEquipmentAdmin(admin.ModelAdmin):
     ]
 
     list_filter = ["status", "location", "category"]
-    readonly_fields = ["status"]
+    list_select_related = ["location", "producer", "buyer"]
+    readonly_fields = ["status", "stock_movements_panel"]
+    stock_movements_panel_size = 10
+    export_fields = [
+        ("ID", "id"),
+        ("Name", "name"),
+        ("Category", "category"),
+        ("Minimum Quantity", "minimum_quantity"),
+        ("Current Quantity", "current_quantity"),
+        ("Status", "status"),
+        ("Price (€)", "price"),
+        ("Investment Required (€)", "investment_required_display"),
+        ("Location", "location"),
+        ("Producer", "producer"),
+        ("Buyer Email", "buyer.email"),
+        ("Notes", "notes"),
+    ]
+    export_select_related = ["location", "producer", "buyer"]
+    actions = ["export_selected_csv", "adjust_stock"]
 
     def colored_status(self, obj):
         color_map = {
@@ -73,28 +107,187 @@ class BackupEquipmentAdmin(admin.ModelAdmin):
 
     colored_status.short_description = "Status"
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_investment_required()
+
     def investment_required_display(self, obj):
-        return self._investment_required(obj)
+        # SQLite returns computed decimals unscaled.
+        return obj.investment_required.quantize(CENTS)
 
     investment_required_display.short_description = "Investment Required (€)"
-
-    def _investment_required(self, obj):
-        if obj.price is not None and obj.current_quantity < obj.minimum_quantity:
-            return (obj.minimum_quantity - obj.current_quantity) * obj.price
-        return Decimal("0.00")
+    investment_required_display.admin_order_field = "investment_required"
 
     def changelist_view(self, request, extra_context=None):
-        queryset = self.get_queryset(request)
-        total_investment = sum(self._investment_required(obj) for obj in queryset)
+        response = super().changelist_view(request, extra_context=extra_context)
+        changelist = getattr(response, "context_data", {}).get("cl")
+        if changelist is not None:
+            # Messages render with the response, so the banner can use the
+            # filtered changelist queryset instead of building it twice.
+            total_investment = changelist.queryset.total_investment_required()
+            messages.info(
+                request,
+                f"💶 Total Investment Required for Visible Items: "
+                f"{total_investment:.2f} €",
+            )
+        return response
+
+    @admin.action(description="Adjust stock of selected items")
+    def adjust_stock(self, request, queryset):
+        form = StockAdjustmentForm(request.POST if "apply" in request.POST else None)
+        if form.is_valid():
+            quantity = form.cleaned_data["quantity"]
+            if form.cleaned_data["mode"] == StockAdjustmentForm.SET:
+                counts = dict.fromkeys(queryset.values_list("pk", flat=True), quantity)
+                updated = ledger.apply_counts(counts, user=request.user)
+            else:
+                updated = ledger.adjust(queryset, quantity, user=request.user)
+            messages.success(request, f"Adjusted stock of {updated} item(s).")
+            return None
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Adjust Stock",
+            "form": form,
+            "count": queryset.count(),
+            "preview": queryset[:20],
+            "select_across": request.POST.get("select_across", "0"),
+            "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            "opts": self.model._meta,
+        }
+        return TemplateResponse(request, "admin/stock_adjustment.html", context)
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = super().get_readonly_fields(request, obj)
+        if obj is None:
+            return readonly_fields
+        # Existing stock only changes through ledger movements.
+        return ["current_quantity", *readonly_fields]
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Write only the edited fields so a concurrent movement on
+        # current_quantity is never overwritten with the value loaded here.
+        obj.save(update_fields=[name for name in form.changed_data if name != "status"])
+        BackupEquipment.objects.filter(pk=obj.pk).refresh_statuses()
 
-        from django.contrib import messages
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path(
+                "<int:object_id>/movement/",
+                self.admin_site.admin_view(self.stock_movement_view),
+                name=f"{opts.app_label}_{opts.model_name}_movement",
+            ),
+            path(
+                "reorder-plan/",
+                self.admin_site.admin_view(self.reorder_plan_view),
+                name="reorder_plan",
+            ),
+            path(
+                "reorder-plan/export/<str:file_format>/",
+                self.admin_site.admin_view(self.reorder_plan_export_view),
+                name="reorder_plan_export",
+            ),
+        ] + super().get_urls()
 
-        messages.info(
-            request,
-            f"💶 Total Investment Required for Visible Items: {total_investment:.2f} €",
+    def reorder_plan_view(self, request):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        groups = list(reorder.plan_summary())
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Reorder Plan",
+            "groups": groups,
+            "items": sum(group["items"] for group in groups),
+            "units": sum(group["units"] for group in groups),
+            "total": sum((group["total"] for group in groups), Decimal("0.00")),
+            "opts": self.model._meta,
+        }
+        return TemplateResponse(request, "admin/reorder_plan.html", context)
+
+    def reorder_plan_export_view(self, request, file_format):
+        if file_format not in FORMATS:
+            raise Http404(f"Unknown export format: {file_format}")
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        filename = f"reorder_plan_{timezone.localdate():%Y%m%d}"
+        if file_format == XLSX:
+            return xlsx_response(reorder.HEADER, reorder.plan_rows(), filename)
+        return stream_csv(reorder.HEADER, reorder.plan_rows(), filename)
+
+    @admin.display(description="Stock Movements")
+    def stock_movements_panel(self, obj):
+        if not obj.pk:
+            return "-"
+        movements = obj.movements.all()[: self.stock_movements_panel_size]
+        rows = format_html_join(
+            "",
+            "<li>{} · {} {} {}</li>",
+            (
+                (
+                    movement.created_at.strftime("%Y-%m-%d %H:%M"),
+                    movement.get_kind_display(),
+                    f"{movement.quantity:+d}",
+                    movement.reference,
+                )
+                for movement in movements
+            ),
+        )
+        return format_html(
+            '<ul style="margin:0; padding-left:1.2em;">{}</ul>'
+            '<a href="{}">Record movement</a> · '
+            '<a href="{}?backup_equipment__id__exact={}">Full history</a>',
+            rows,
+            reverse(
+                "admin:spare_parts_management_backupequipment_movement", args=[obj.pk]
+            ),
+            reverse("admin:spare_parts_management_stockmovement_changelist"),
+            obj.pk,
         )
 
-        return super().changelist_view(request, extra_context=extra_context)
+    def stock_movement_view(self, request, object_id):
+        item = get_object_or_404(
+            self.get_queryset(request).select_related("location"), pk=object_id
+        )
+        if not self.has_change_permission(request, item):
+            raise PermissionDenied
+        form = StockMovementForm(item, request.POST or None)
+        if form.is_valid():
+            quantity = form.cleaned_data["quantity"]
+            reference = form.cleaned_data["reference"]
+            kind = form.cleaned_data["kind"]
+            try:
+                if kind == StockMovement.RECEIPT:
+                    ledger.receive(item, quantity, reference, request.user)
+                elif kind == StockMovement.CONSUMPTION:
+                    ledger.consume(item, quantity, reference, request.user)
+                else:
+                    ledger.transfer(
+                        item,
+                        form.cleaned_data["destination"],
+                        quantity,
+                        reference,
+                        request.user,
+                    )
+            except ledger.InsufficientStock as e:
+                form.add_error("quantity", str(e))
+            else:
+                label = dict(form.fields["kind"].choices)[kind]
+                messages.success(request, f"Recorded {label.lower()} of {quantity}.")
+                return redirect(
+                    "admin:spare_parts_management_backupequipment_change", item.pk
+                )
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"Record Stock Movement: {item}",
+            "form": form,
+            "item": item,
+            "opts": self.model._meta,
+        }
+        return TemplateResponse(request, "admin/stock_movement.html", context)
 
     def producer_link(self, obj):
         if obj.producer:
@@ -112,3 +305,89 @@ class BackupEquipmentAdmin(admin.ModelAdmin):
         return "-"
 
     buyer_email_link.short_description = "Buyer Email"
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = [
+        "created_at",
+        "backup_equipment",
+        "kind",
+        "quantity",
+        "reference",
+        "created_by",
+    ]
+    list_filter = ["kind", "backup_equipment__location", "created_at"]
+    list_select_related = ["backup_equipment__location", "created_by"]
+    search_fields = ["backup_equipment__name", "reference"]
+    date_hierarchy = "created_at"
+
+    # The ledger is append-only; movements are recorded from the backup
+    # equipment page, the stock adjustment action or the count import, and
+    # only go away together with their item.
+    deleted_with_parent = True
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class StockMovementForm(forms.Form):
+    """Receipt, consumption or transfer of one backup equipment item."""
+
+    kind = forms.ChoiceField(
+        choices=[
+            (StockMovement.RECEIPT, "Receipt"),
+            (StockMovement.CONSUMPTION, "Consumption"),
+            (StockMovement.TRANSFER_OUT, "Transfer to another location"),
+        ]
+    )
+    quantity = forms.IntegerField(min_value=1)
+    destination = forms.ModelChoiceField(
+        queryset=BackupEquipment.objects.none(),
+        required=False,
+        help_text="The same part at the receiving location (transfers only).",
+    )
+    reference = forms.CharField(max_length=255, required=False)
+
+    def __init__(self, item, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["destination"].queryset = (
+            BackupEquipment.objects.exclude(location=item.location_id)
+            .select_related("location")
+            .order_by("name")
+        )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        transfer = cleaned_data.get("kind") == StockMovement.TRANSFER_OUT
+        if transfer and not cleaned_data.get("destination"):
+            self.add_error("destination", "Choose where the stock goes.")
+        return cleaned_data
+
+
+class StockAdjustmentForm(forms.Form):
+    """Quantity form for the bulk stock adjustment action."""
+
+    SET = "set"
+    ADD = "add"
+
+    mode = forms.ChoiceField(
+        choices=[
+            (SET, "Set current quantity to"),
+            (ADD, "Add to current quantity (negative to remove)"),
+        ],
+        initial=SET,
+    )
+    quantity = forms.IntegerField()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("mode") == self.SET and cleaned_data.get("quantity", 0) < 0:
+            self.add_error("quantity", "A stock level cannot be negative.")
+        return cleaned_data
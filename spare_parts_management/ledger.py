@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import models, transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BackupEquipment, StockMovement, StockSnapshot
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Snapshots stop a little in the past so movements from transactions that
+# are still open when the snapshot runs are not missed.
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+
+class InsufficientStock(Exception):
+    """Raised when a movement would take stock below zero."""
+
+
+def _record(item_id, kind, delta, reference="", user=None, transfer_from=None):
+    # A single conditional UPDATE; concurrent movements on the same row queue
+    # on its lock instead of overwriting each other.
+    items = BackupEquipment.objects.filter(pk=item_id)
+    if delta < 0:
+        items = items.filter(current_quantity__gte=-delta)
+    if not items.update(current_quantity=F("current_quantity") + delta):
+        if BackupEquipment.objects.filter(pk=item_id).exists():
+            raise InsufficientStock(f"Not enough stock to remove {-delta}.")
+        raise BackupEquipment.DoesNotExist(f"No backup equipment {item_id}.")
+    return StockMovement.objects.create(
+        backup_equipment_id=item_id,
+        kind=kind,
+        quantity=delta,
+        reference=reference,
+        created_by=user,
+        transfer_from=transfer_from,
+    )
+
+
+def _lock(pks):
+    """Lock rows in primary key order so concurrent batches cannot deadlock."""
+    return dict(
+        BackupEquipment.objects.select_for_update()
+        .filter(pk__in=pks)
+        .order_by("pk")
+        .values_list("pk", "current_quantity")
+    )
+
+
+def receive(item, quantity, reference="", user=None):
+    with transaction.atomic():
+        return _record(item.pk, StockMovement.RECEIPT, quantity, reference, user)
+
+
+def consume(item, quantity, reference="", user=None):
+    with transaction.atomic():
+        return _record(item.pk, StockMovement.CONSUMPTION, -quantity, reference, user)
+
+
+def transfer(source, destination, quantity, reference="", user=None):
+    """Move ``quantity`` from ``source`` to the same part at another location."""
+    if source.location_id == destination.location_id:
+        raise ValueError("A transfer needs a destination at another location.")
+    with transaction.atomic():
+        _lock([source.pk, destination.pk])
+        outgoing = _record(
+            source.pk, StockMovement.TRANSFER_OUT, -quantity, reference, user
+        )
+        incoming = _record(
+            destination.pk,
+            StockMovement.TRANSFER_IN,
+            quantity,
+            reference,
+            user,
+            transfer_from=outgoing,
+        )
+    return outgoing, incoming
+
+
+def receive_many(quantities, reference="", user=None, batch_size=500):
+    """Apply a burst of receipts, ``{pk: quantity}``, e.g. summed scanner
+    check-ins. Each batch is one locking SELECT, one UPDATE and one INSERT,
+    however many scans it contains. Returns the movements created."""
+    quantities = list(quantities.items())
+    movements = []
+    for start in range(0, len(quantities), batch_size):
+        batch = dict(quantities[start : start + batch_size])
+        with transaction.atomic():
+            missing = batch.keys() - _lock(batch).keys()
+            if missing:
+                raise BackupEquipment.DoesNotExist(
+                    f"No backup equipment {', '.join(map(str, sorted(missing)))}."
+                )
+            BackupEquipment.objects.filter(pk__in=batch).update(
+                current_quantity=Case(
+                    *(
+                        When(pk=pk, then=F("current_quantity") + Value(quantity))
+                        for pk, quantity in batch.items()
+                    ),
+                    output_field=models.PositiveIntegerField(),
+                )
+            )
+            movements += StockMovement.objects.bulk_create(
+                StockMovement(
+                    backup_equipment_id=pk,
+                    kind=StockMovement.RECEIPT,
+                    quantity=quantity,
+                    reference=reference,
+                    created_by=user,
+                )
+                for pk, quantity in batch.items()
+            )
+    return movements
+
+
+def _record_differences(before, after, reference, user):
+    StockMovement.objects.bulk_create(
+        StockMovement(
+            backup_equipment_id=pk,
+            kind=StockMovement.COUNT,
+            quantity=after[pk] - quantity,
+            reference=reference,
+            created_by=user,
+        )
+        for pk, quantity in before.items()
+        if after[pk] != quantity
+    )
+
+
+def apply_counts(counts, reference="Stock count", user=None, batch_size=500):
+    """Set stock from a physical count, ``{pk: quantity}``, recording the
+    differences as count movements. Returns the number of rows updated."""
+    counts = list(counts.items())
+    updated = 0
+    for start in range(0, len(counts), batch_size):
+        batch = dict(counts[start : start + batch_size])
+        with transaction.atomic():
+            before = _lock(batch)
+            updated += BackupEquipment.objects.set_stock(
+                {pk: batch[pk] for pk in before}, batch_size
+            )
+            _record_differences(before, batch, reference, user)
+    return updated
+
+
+def adjust(queryset, delta, reference="Stock adjustment", user=None):
+    """Add ``delta`` to the stock of every item in ``queryset``, never going
+    below zero, recording the applied change. Returns the rows updated."""
+    with transaction.atomic():
+        before = _lock(queryset.values("pk"))
+        updated = BackupEquipment.objects.filter(pk__in=before).adjust_stock(delta)
+        after = {pk: max(quantity + delta, 0) for pk, quantity in before.items()}
+        _record_differences(before, after, reference, user)
+    return updated
+
+
+def with_stock_at(at, queryset=None):
+    """Annotate ``stock_at``: each item's stock at ``at``, from its latest
+    snapshot up to then plus the movements after it, so only recent ledger
+    rows are read."""
+    queryset = BackupEquipment.objects.all() if queryset is None else queryset
+    snapshots = StockSnapshot.objects.filter(
+        backup_equipment=OuterRef("pk"), taken_at__lte=at
+    ).order_by("-taken_at")
+    movements = (
+        StockMovement.objects.filter(
+            backup_equipment=OuterRef("pk"),
+            created_at__lte=at,
+            created_at__gt=Coalesce(
+                OuterRef("snapshot_at"),
+                Value(EPOCH),
+                output_field=models.DateTimeField(),
+            ),
+        )
+        .order_by()
+        .values("backup_equipment")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return queryset.annotate(
+        snapshot_at=Subquery(snapshots.values("taken_at")[:1]),
+        stock_at=Coalesce(Subquery(snapshots.values("quantity")[:1]), 0)
+        + Coalesce(Subquery(movements), 0),
+    )
+
+
+def stock_at(item, at):
+    return with_stock_at(at, BackupEquipment.objects.filter(pk=item.pk)).values_list(
+        "stock_at", flat=True
+    )[0]
+
+
+def take_snapshots(at=None, batch_size=1000):
+    """Snapshot every item's stock at ``at`` (default: a few minutes ago).
+    Returns the number of snapshots written."""
+    at = at or timezone.now() - SNAPSHOT_LAG
+    rows = (
+        with_stock_at(at)
+        .exclude(snapshots__taken_at=at)
+        .values_list("pk", "stock_at")
+        .iterator(chunk_size=batch_size)
+    )
+    created = 0
+    batch = []
+    for pk, quantity in rows:
+        batch.append(
+            StockSnapshot(backup_equipment_id=pk, taken_at=at, quantity=quantity)
+        )
+        if len(batch) >= batch_size:
+            created += len(StockSnapshot.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        created += len(StockSnapshot.objects.bulk_create(batch))
+    return created
+
+
+def ledger_drift():
+    """Items whose current quantity disagrees with their ledger, e.g. after a
+    write that bypassed it."""
+    return with_stock_at(timezone.now()).exclude(stock_at=F("current_quantity"))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from spare_parts_management.stock_count import StockCountError, apply_stock_count
+
+
+class Command(BaseCommand):
+    help = (
+        "Set backup equipment stock from a CSV or XLSX physical count file "
+        "(columns: id, current_quantity). An exported changelist works as a "
+        "template."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and report without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["path"], "rb") as fileobj:
+                result = apply_stock_count(
+                    fileobj,
+                    options["path"],
+                    dry_run=options["dry_run"],
+                    batch_size=max(options["batch_size"], 1),
+                )
+        except (OSError, StockCountError) as e:
+            raise CommandError(str(e))
+
+        for issue in result.issues:
+            self.stdout.write(
+                f"line {issue['line']}: {issue['id'] or '-'}: {issue['message']}"
+            )
+        hidden = result.invalid - len(result.issues)
+        if hidden > 0:
+            self.stdout.write(f"... and {hidden} more issue(s)")
+        prefix = "Dry run: " if result.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
@@ -0,0 +1,74 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from spare_parts_management import reorder
+from tb2_vsm.exports import FORMATS, XLSX
+
+
+class Command(BaseCommand):
+    help = (
+        "Group every backup equipment item below its minimum quantity into "
+        "draft purchase lists per producer and buyer, print the totals and "
+        "optionally write the full plan to a CSV or XLSX file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output", help="Write the plan to this .csv or .xlsx file."
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        file_format = output.rsplit(".", 1)[-1].lower() if output else None
+        if output and file_format not in FORMATS:
+            raise CommandError(f"--output must end in one of: {', '.join(FORMATS)}")
+
+        start = time.perf_counter()
+        purchase_lists = reorder.purchase_lists()
+        for purchase_list in purchase_lists:
+            self.stdout.write(
+                f"{purchase_list}: {len(purchase_list.lines)} items, "
+                f"{purchase_list.units} units, {purchase_list.total:.2f} €"
+                + (
+                    f" ({purchase_list.unpriced} without price)"
+                    if purchase_list.unpriced
+                    else ""
+                )
+            )
+
+        if output:
+            rows = (
+                row
+                for purchase_list in purchase_lists
+                for row in reorder.plan_rows(purchase_list.lines)
+            )
+            if file_format == XLSX:
+                self.write_xlsx(output, rows)
+            else:
+                self.write_csv(output, rows)
+
+        total = sum(purchase_list.total for purchase_list in purchase_lists)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{len(purchase_lists)} purchase lists, {total:.2f} € in "
+                f"{time.perf_counter() - start:.2f}s."
+            )
+        )
+
+    def write_csv(self, path, rows):
+        with open(path, "w", newline="", encoding="utf-8") as fileobj:
+            writer = csv.writer(fileobj)
+            writer.writerow(reorder.HEADER)
+            writer.writerows(rows)
+
+    def write_xlsx(self, path, rows):
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(reorder.HEADER)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
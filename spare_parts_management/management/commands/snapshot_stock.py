@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from spare_parts_management.ledger import ledger_drift, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot backup equipment stock from the movement ledger so stock at "
+        "a date only reads movements since the latest snapshot, and report "
+        "items whose current quantity disagrees with the ledger."
+    )
+
+    def handle(self, *args, **options):
+        created = take_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Took {created} stock snapshot(s)."))
+        for pk, name, current, ledger in ledger_drift().values_list(
+            "pk", "name", "current_quantity", "stock_at"
+        )[:50]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{name} (#{pk}): current quantity {current}, ledger {ledger}"
+                )
+            )
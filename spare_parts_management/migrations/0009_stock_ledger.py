@@ -0,0 +1,139 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def snapshot_existing_stock(apps, schema_editor):
+    # Stock that predates the ledger becomes an opening snapshot.
+    BackupEquipment = apps.get_model("spare_parts_management", "BackupEquipment")
+    StockSnapshot = apps.get_model("spare_parts_management", "StockSnapshot")
+    now = django.utils.timezone.now()
+    StockSnapshot.objects.bulk_create(
+        (
+            StockSnapshot(backup_equipment_id=pk, taken_at=now, quantity=quantity)
+            for pk, quantity in BackupEquipment.objects.values_list(
+                "pk", "current_quantity"
+            ).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("spare_parts_management", "0008_alter_backupequipment_category"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("receipt", "Receipt"),
+                            ("consumption", "Consumption"),
+                            ("transfer_in", "Transfer in"),
+                            ("transfer_out", "Transfer out"),
+                            ("count", "Stock count"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.IntegerField(
+                        help_text="Signed change to the current quantity"
+                    ),
+                ),
+                ("reference", models.CharField(blank=True, max_length=255)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "backup_equipment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="movements",
+                        to="spare_parts_management.backupequipment",
+                    ),
+                ),
+                (
+                    "created_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "transfer_from",
+                    models.OneToOneField(
+                        blank=True,
+                        help_text="For transfers in: the matching transfer out",
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="transfer_to",
+                        to="spare_parts_management.stockmovement",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-created_at", "-pk"],
+                "indexes": [
+                    models.Index(
+                        fields=["backup_equipment", "created_at"],
+                        name="stock_movement_item_time_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("taken_at", models.DateTimeField()),
+                ("quantity", models.IntegerField()),
+                (
+                    "backup_equipment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="snapshots",
+                        to="spare_parts_management.backupequipment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-taken_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("backup_equipment", "taken_at"),
+                        name="stock_snapshot_item_time_unique",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_stock, migrations.RunPython.noop),
+    ]
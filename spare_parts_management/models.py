@@ -1,6 +1,46 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Case, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import LessThan
+from django.utils import timezone
 from tb2_vsm.models import Location
 
+MONEY = models.DecimalField(max_digits=30, decimal_places=2)
+QUANTITY_FIELDS = {"current_quantity", "minimum_quantity"}
+
+
+def stock_status(current_quantity, minimum_quantity):
+    """Status for a stock level; mirrored in SQL by stock_status_expression."""
+    if current_quantity < 1:
+        return "Critical"
+    if current_quantity < minimum_quantity:
+        return "Low"
+    return "Stable"
+
+
+def _expression(value):
+    return value if hasattr(value, "resolve_expression") else Value(value)
+
+
+def stock_status_expression(current_quantity=None, minimum_quantity=None):
+    """SQL version of stock_status. Pass the new values when updating
+    quantities so status is computed from them in the same statement."""
+    current = _expression(
+        F("current_quantity") if current_quantity is None else current_quantity
+    )
+    minimum = _expression(
+        F("minimum_quantity") if minimum_quantity is None else minimum_quantity
+    )
+    return Case(
+        When(LessThan(current, 1), then=Value("Critical")),
+        When(LessThan(current, minimum), then=Value("Low")),
+        default=Value("Stable"),
+        output_field=models.CharField(),
+    )
+
 
 class Producer(models.Model):
     name = models.CharField(max_length=255)
@@ -20,6 +60,90 @@ class Buyer(models.Model):
         return self.full_name
 
 
+class BackupEquipmentQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # status is derived from the quantities; keep it right in bulk updates.
+        if QUANTITY_FIELDS & kwargs.keys() and "status" not in kwargs:
+            kwargs["status"] = stock_status_expression(
+                kwargs.get("current_quantity"), kwargs.get("minimum_quantity")
+            )
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        fields = list(fields)
+        if QUANTITY_FIELDS & set(fields) and "status" not in fields:
+            for obj in objs:
+                obj.status = stock_status(obj.current_quantity, obj.minimum_quantity)
+            fields.append("status")
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    bulk_update.alters_data = True
+
+    def refresh_statuses(self):
+        """Recompute stored statuses in one UPDATE; returns the rows changed."""
+        expression = stock_status_expression()
+        return self.exclude(status=expression).update(status=expression)
+
+    def set_stock(self, counts, batch_size=500):
+        """Set ``current_quantity`` from a ``{pk: quantity}`` mapping.
+
+        Each batch is a single UPDATE with a CASE over the primary keys, and
+        status is computed from the new quantity in the same statement.
+        Returns the number of rows updated.
+        """
+        counts = list(counts.items())
+        updated = 0
+        for start in range(0, len(counts), batch_size):
+            batch = counts[start : start + batch_size]
+            updated += self.filter(pk__in=[pk for pk, _ in batch]).update(
+                current_quantity=Case(
+                    *(When(pk=pk, then=Value(quantity)) for pk, quantity in batch),
+                    output_field=models.PositiveIntegerField(),
+                )
+            )
+        return updated
+
+    def adjust_stock(self, delta):
+        """Add ``delta`` (which may be negative) to every row's stock, never
+        going below zero, in one UPDATE."""
+        return self.update(
+            current_quantity=Greatest(F("current_quantity") + delta, Value(0))
+        )
+
+    def with_investment_required(self):
+        """Annotate ``investment_required``: the cost of topping the stock up
+        to ``minimum_quantity``, or zero when stocked or unpriced."""
+        return self.annotate(
+            investment_required=Case(
+                When(
+                    Q(price__isnull=False)
+                    & Q(current_quantity__lt=F("minimum_quantity")),
+                    then=ExpressionWrapper(
+                        (F("minimum_quantity") - F("current_quantity")) * F("price"),
+                        output_field=MONEY,
+                    ),
+                ),
+                default=Value(Decimal("0.00")),
+                output_field=MONEY,
+            )
+        )
+
+    def total_investment_required(self):
+        """Sum ``investment_required`` over the queryset in one aggregate."""
+        queryset = self
+        if "investment_required" not in queryset.query.annotations:
+            queryset = queryset.with_investment_required()
+        return queryset.aggregate(
+            total=Coalesce(
+                Sum("investment_required"),
+                Value(Decimal("0.00")),
+                output_field=MONEY,
+            )
+        )["total"]
+
+
 class BackupEquipment(models.Model):
     STATUS_CHOICES = [
         ("Critical", "Critical"),
@@ -72,16 +196,107 @@ class BackupEquipment(models.Model):
         blank=True, null=True, help_text="Optional notes of the backup equipment"
     )
 
+    objects = BackupEquipmentQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
-        if self.current_quantity < 1:
-            self.status = "Critical"
-        elif (
-            self.current_quantity < self.minimum_quantity and self.current_quantity >= 1
-        ):
-            self.status = "Low"
-        else:
-            self.status = "Stable"
+        adding = self._state.adding
+        self.status = stock_status(self.current_quantity, self.minimum_quantity)
         super().save(*args, **kwargs)
+        if adding and self.current_quantity:
+            # Opening stock starts the item's ledger.
+            StockMovement.objects.create(
+                backup_equipment=self,
+                kind=StockMovement.COUNT,
+                quantity=self.current_quantity,
+                reference="Opening stock",
+            )
 
     def __str__(self):
         return f"{self.name} ({self.location.supplier_name})"
+
+
+class StockMovement(models.Model):
+    """Append-only record of a change to a BackupEquipment's stock.
+
+    ``quantity`` is the signed change applied to ``current_quantity``.
+    Movements are written by spare_parts_management.ledger, which applies the
+    change to the stock in the same transaction.
+    """
+
+    RECEIPT = "receipt"
+    CONSUMPTION = "consumption"
+    TRANSFER_IN = "transfer_in"
+    TRANSFER_OUT = "transfer_out"
+    COUNT = "count"
+
+    KIND_CHOICES = [
+        (RECEIPT, "Receipt"),
+        (CONSUMPTION, "Consumption"),
+        (TRANSFER_IN, "Transfer in"),
+        (TRANSFER_OUT, "Transfer out"),
+        (COUNT, "Stock count"),
+    ]
+
+    backup_equipment = models.ForeignKey(
+        BackupEquipment, on_delete=models.CASCADE, related_name="movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField(help_text="Signed change to the current quantity")
+    transfer_from = models.OneToOneField(
+        "self",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="transfer_to",
+        help_text="For transfers in: the matching transfer out",
+    )
+    reference = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at", "-pk"]
+        indexes = [
+            models.Index(
+                fields=["backup_equipment", "created_at"],
+                name="stock_movement_item_time_idx",
+            )
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only.")
+
+    def __str__(self):
+        return (
+            f"{self.get_kind_display()} {self.quantity:+d} {self.backup_equipment.name}"
+        )
+
+
+class StockSnapshot(models.Model):
+    """Stock level of an item at ``taken_at``, including every movement up to
+    then. Stock at a date is the latest snapshot plus the movements since."""
+
+    backup_equipment = models.ForeignKey(
+        BackupEquipment, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    taken_at = models.DateTimeField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        ordering = ["-taken_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["backup_equipment", "taken_at"],
+                name="stock_snapshot_item_time_unique",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.backup_equipment.name}: {self.quantity} at {self.taken_at}"
@@ -0,0 +1,116 @@
+from decimal import Decimal
+from itertools import groupby
+
+from django.db.models import Count, F, Q, Sum
+
+from .models import BackupEquipment
+
+HEADER = [
+    "Producer",
+    "Buyer",
+    "Buyer Email",
+    "Location",
+    "Item ID",
+    "Name",
+    "Category",
+    "Current Quantity",
+    "Minimum Quantity",
+    "Order Quantity",
+    "Unit Price (€)",
+    "Line Total (€)",
+]
+CENTS = Decimal("0.01")
+
+
+def shortfalls():
+    """Every item below its minimum, with ``shortfall`` and
+    ``investment_required`` annotated, ordered into purchase list groups."""
+    return (
+        BackupEquipment.objects.filter(current_quantity__lt=F("minimum_quantity"))
+        .with_investment_required()
+        .annotate(shortfall=F("minimum_quantity") - F("current_quantity"))
+        .select_related("location", "producer", "buyer")
+        .order_by(
+            "producer__name",
+            "producer_id",
+            "buyer__full_name",
+            "buyer_id",
+            "location__supplier_name",
+            "name",
+        )
+    )
+
+
+def plan_summary():
+    """One row per (producer, buyer) with item count, units to order, total
+    cost and unpriced items, aggregated in a single query."""
+    return (
+        shortfalls()
+        .values(
+            "producer_id",
+            "producer__name",
+            "buyer_id",
+            "buyer__full_name",
+            "buyer__email",
+        )
+        .annotate(
+            items=Count("pk"),
+            units=Sum("shortfall"),
+            total=Sum("investment_required"),
+            unpriced=Count("pk", filter=Q(price__isnull=True)),
+        )
+        .order_by("producer__name", "producer_id", "buyer__full_name", "buyer_id")
+    )
+
+
+class PurchaseList:
+    """Draft order for one producer and buyer."""
+
+    def __init__(self, producer, buyer, lines):
+        self.producer = producer
+        self.buyer = buyer
+        self.lines = lines
+        self.units = sum(line.shortfall for line in lines)
+        self.total = sum(
+            (line.investment_required for line in lines), Decimal("0.00")
+        ).quantize(CENTS)
+        self.unpriced = sum(1 for line in lines if line.price is None)
+
+    def __str__(self):
+        producer = self.producer.name if self.producer else "No producer"
+        buyer = self.buyer.full_name if self.buyer else "no buyer"
+        return f"{producer} / {buyer}"
+
+
+def purchase_lists(queryset=None):
+    """Group shortfalls into PurchaseLists, reading them in one query."""
+    queryset = shortfalls() if queryset is None else queryset
+    lists = []
+    for _, group in groupby(
+        queryset, key=lambda item: (item.producer_id, item.buyer_id)
+    ):
+        lines = list(group)
+        lists.append(PurchaseList(lines[0].producer, lines[0].buyer, lines))
+    return lists
+
+
+def plan_rows(items=None, chunk_size=2000):
+    """Export rows for ``items``, by default every shortfall streamed in
+    purchase list order."""
+    if items is None:
+        items = shortfalls().iterator(chunk_size=chunk_size)
+    for item in items:
+        yield [
+            item.producer.name if item.producer else None,
+            item.buyer.full_name if item.buyer else None,
+            item.buyer.email if item.buyer else None,
+            str(item.location),
+            item.pk,
+            item.name,
+            item.category,
+            item.current_quantity,
+            item.minimum_quantity,
+            item.shortfall,
+            item.price,
+            item.investment_required.quantize(CENTS),
+        ]
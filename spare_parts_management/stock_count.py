@@ -0,0 +1,86 @@
+from tb2_vsm.serial_import import SerialImportError, iter_rows
+
+from . import ledger
+from .models import BackupEquipment
+
+REQUIRED_COLUMNS = ["id", "current_quantity"]
+MAX_REPORTED_ISSUES = 500
+
+
+class StockCountError(Exception):
+    """Raised when a count file cannot be read at all (bad type, encoding,
+    workbook or header)."""
+
+
+class StockCountResult:
+    """Totals of a stock count; only the first issues are kept in memory."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.updated = 0
+        self.invalid = 0
+        self.issues = []
+
+    def add_issue(self, line, reference, message):
+        self.invalid += 1
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append({"line": line, "id": reference, "message": message})
+
+    def __str__(self):
+        verb = "would be updated" if self.dry_run else "updated"
+        return f"{self.rows} rows: {self.updated} {verb}, {self.invalid} invalid"
+
+
+def _read_counts(fileobj, filename, result):
+    counts = {}
+    lines = {}
+    for line, row in iter_rows(fileobj, filename, required=REQUIRED_COLUMNS):
+        result.rows += 1
+        try:
+            pk = int(row["id"])
+            quantity = int(row["current_quantity"])
+        except ValueError:
+            result.add_issue(line, row["id"], "ID and quantity must be integers.")
+            continue
+        if quantity < 0:
+            result.add_issue(line, row["id"], "Quantity cannot be negative.")
+        elif pk in counts:
+            result.add_issue(line, row["id"], "Counted more than once.")
+        else:
+            counts[pk] = quantity
+            lines[pk] = line
+    return counts, lines
+
+
+def apply_stock_count(fileobj, filename, dry_run=False, batch_size=500, user=None):
+    """Set backup equipment stock from a physical count file.
+
+    The file needs ``id`` and ``current_quantity`` columns, so an exported
+    changelist can be edited and uploaded again. Rows are applied with
+    ledger.apply_counts, a few statements per batch, which records the
+    differences as count movements. Unknown ids are reported.
+    """
+    result = StockCountResult(dry_run=dry_run)
+    try:
+        counts, lines = _read_counts(fileobj, filename, result)
+    except SerialImportError as e:
+        raise StockCountError(str(e))
+
+    existing = set()
+    pks = list(counts)
+    for start in range(0, len(pks), batch_size):
+        existing.update(
+            BackupEquipment.objects.filter(
+                pk__in=pks[start : start + batch_size]
+            ).values_list("pk", flat=True)
+        )
+    for pk in sorted(counts.keys() - existing, key=lines.get):
+        result.add_issue(lines[pk], str(pk), "No backup equipment with this ID.")
+        del counts[pk]
+
+    if dry_run:
+        result.updated = len(counts)
+    else:
+        result.updated = ledger.apply_counts(counts, user=user, batch_size=batch_size)
+    return result
@@ -1,7 +1,21 @@
+import csv
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 from tb2_vsm.models import Location
-from .models import Producer, Buyer, BackupEquipment
+from . import ledger, reorder
+from .models import Producer, Buyer, BackupEquipment, StockMovement
 
 
 class ProducerModelTests(TestCase):
@@ -90,3 +104,539 @@ class BackupEquipmentModelTests(TestCase):
         be.category = "InvalidCategory"
         with self.assertRaises(ValidationError):
             be.full_clean()
+
+
+class BackupEquipmentInvestmentTests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(country="DE", supplier_name="Sup A")
+        self.other_location = Location.objects.create(
+            country="CN", supplier_name="Sup B"
+        )
+        self.producer = Producer.objects.create(name="Producer X")
+        self.buyer = Buyer.objects.create(full_name="Buyer Y", email="b@example.com")
+        for name, minimum, current, price, location in [
+            ("Short", 10, 4, Decimal("2.50"), self.location),
+            ("Stocked", 5, 9, Decimal("100.00"), self.location),
+            ("Unpriced", 8, 0, None, self.location),
+            ("Elsewhere", 3, 1, Decimal("7.25"), self.other_location),
+        ]:
+            BackupEquipment.objects.create(
+                name=name,
+                minimum_quantity=minimum,
+                current_quantity=current,
+                price=price,
+                location=location,
+                producer=self.producer,
+                buyer=self.buyer,
+            )
+
+    def test_investment_required_annotation(self):
+        investments = dict(
+            BackupEquipment.objects.with_investment_required().values_list(
+                "name", "investment_required"
+            )
+        )
+        self.assertEqual(
+            investments,
+            {
+                "Short": Decimal("15.00"),
+                "Stocked": Decimal("0.00"),
+                "Unpriced": Decimal("0.00"),
+                "Elsewhere": Decimal("14.50"),
+            },
+        )
+        self.assertEqual(
+            BackupEquipment.objects.total_investment_required(), Decimal("29.50")
+        )
+        self.assertEqual(
+            BackupEquipment.objects.none().total_investment_required(),
+            Decimal("0.00"),
+        )
+
+    def test_changelist_banner_respects_filters(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        url = reverse("admin:spare_parts_management_backupequipment_changelist")
+
+        response = self.client.get(url)
+        self.assertContains(response, "29.50 €")
+
+        response = self.client.get(url, {"location__id__exact": self.location.pk})
+        self.assertContains(response, "15.00 €")
+        self.assertNotContains(response, "29.50 €")
+
+        response = self.client.get(url, {"o": "7"})
+        names = [obj.name for obj in response.context["cl"].result_list]
+        self.assertEqual(set(names[:2]), {"Stocked", "Unpriced"})
+        self.assertEqual(names[-1], "Short")
+
+    def test_changelist_query_count_does_not_grow_with_rows(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        url = reverse("admin:spare_parts_management_backupequipment_changelist")
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        for index in range(10):
+            BackupEquipment.objects.create(
+                name=f"Extra {index}",
+                minimum_quantity=5,
+                current_quantity=1,
+                price=Decimal("1.00"),
+                location=self.other_location,
+                producer=self.producer,
+                buyer=self.buyer,
+            )
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(url)
+        self.assertEqual(len(small), len(large))
+
+
+class BackupEquipmentBulkStockTests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(country="DE", supplier_name="Sup A")
+        self.items = [
+            BackupEquipment.objects.create(
+                name=f"Part {index}",
+                minimum_quantity=5,
+                current_quantity=10,
+                location=self.location,
+            )
+            for index in range(4)
+        ]
+
+    def statuses(self):
+        return list(
+            BackupEquipment.objects.order_by("pk").values_list(
+                "current_quantity", "status"
+            )
+        )
+
+    def test_queryset_update_recomputes_status(self):
+        BackupEquipment.objects.filter(pk=self.items[0].pk).update(current_quantity=0)
+        BackupEquipment.objects.filter(pk=self.items[1].pk).update(current_quantity=3)
+        BackupEquipment.objects.filter(pk=self.items[2].pk).update(minimum_quantity=20)
+        self.assertEqual(
+            [status for _, status in self.statuses()],
+            ["Critical", "Low", "Low", "Stable"],
+        )
+
+    def test_bulk_update_recomputes_status(self):
+        for item, quantity in zip(self.items, [0, 2, 5, 9]):
+            item.current_quantity = quantity
+        with self.assertNumQueries(1):
+            BackupEquipment.objects.bulk_update(self.items, ["current_quantity"])
+        self.assertEqual(
+            self.statuses(),
+            [(0, "Critical"), (2, "Low"), (5, "Stable"), (9, "Stable")],
+        )
+        self.assertEqual(self.items[0].status, "Critical")
+
+    def test_set_and_adjust_stock(self):
+        counts = {item.pk: quantity for item, quantity in zip(self.items, [0, 1, 7])}
+        with self.assertNumQueries(2):
+            self.assertEqual(BackupEquipment.objects.set_stock(counts, 2), 3)
+        self.assertEqual(
+            self.statuses(),
+            [(0, "Critical"), (1, "Low"), (7, "Stable"), (10, "Stable")],
+        )
+        BackupEquipment.objects.adjust_stock(-3)
+        self.assertEqual(
+            self.statuses(),
+            [(0, "Critical"), (0, "Critical"), (4, "Low"), (7, "Stable")],
+        )
+
+    def test_refresh_statuses_fixes_drift(self):
+        BackupEquipment.objects.filter(pk=self.items[0].pk).update(status="Critical")
+        self.assertEqual(BackupEquipment.objects.refresh_statuses(), 1)
+        self.assertEqual(BackupEquipment.objects.refresh_statuses(), 0)
+
+    def test_apply_stock_count_file(self):
+        content = (
+            "ID,Name,Current Quantity\n"
+            f"{self.items[0].pk},Part 0,0\n"
+            f"{self.items[1].pk},Part 1,4\n"
+            f"{self.items[1].pk},Part 1,6\n"
+            "999999,Missing,3\n"
+            f"{self.items[2].pk},Part 2,lots\n"
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+
+        out = StringIO()
+        call_command("apply_stock_count", f.name, "--dry-run", stdout=out)
+        self.assertIn("Dry run: 5 rows: 2 would be updated, 3 invalid", out.getvalue())
+        self.assertEqual(self.statuses()[0], (10, "Stable"))
+
+        out = StringIO()
+        call_command("apply_stock_count", f.name, stdout=out)
+        self.assertIn("No backup equipment with this ID.", out.getvalue())
+        self.assertIn("Counted more than once.", out.getvalue())
+        self.assertEqual(self.statuses()[:2], [(0, "Critical"), (4, "Low")])
+
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write("name,quantity\nPart,1\n")
+        self.addCleanup(os.remove, f.name)
+        with self.assertRaisesMessage(CommandError, "Missing column(s)"):
+            call_command("apply_stock_count", f.name, stdout=StringIO())
+
+    def test_apply_stock_count_rejects_unreadable_files(self):
+        cases = [
+            (
+                ".csv",
+                f"id,current_quantity,note\n{self.items[0].pk},0,Lüfter\n".encode(
+                    "cp1252"
+                ),
+                "not UTF-8 encoded",
+            ),
+            (".xlsx", b"not a workbook", "not a valid Excel workbook"),
+        ]
+        for suffix, content, message in cases:
+            with self.subTest(suffix=suffix):
+                with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+                    f.write(content)
+                self.addCleanup(os.remove, f.name)
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command("apply_stock_count", f.name, stdout=StringIO())
+        self.assertEqual(self.statuses()[0], (10, "Stable"))
+
+    def test_admin_adjust_stock_action(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        url = reverse("admin:spare_parts_management_backupequipment_changelist")
+        selected = [self.items[0].pk, self.items[1].pk]
+        data = {"action": "adjust_stock", ACTION_CHECKBOX_NAME: selected}
+
+        response = self.client.post(url, data)
+        self.assertContains(response, "Adjusting the stock of 2 items")
+
+        response = self.client.post(
+            url, {**data, "apply": "Apply", "mode": "set", "quantity": "-1"}
+        )
+        self.assertContains(response, "A stock level cannot be negative.")
+
+        response = self.client.post(
+            url, {**data, "apply": "Apply", "mode": "add", "quantity": "-7"}
+        )
+        self.assertRedirects(response, url)
+        self.assertEqual(
+            self.statuses(),
+            [(3, "Low"), (3, "Low"), (10, "Stable"), (10, "Stable")],
+        )
+
+        self.client.post(
+            url,
+            {
+                "action": "adjust_stock",
+                "select_across": "1",
+                "index": "0",
+                ACTION_CHECKBOX_NAME: [self.items[0].pk],
+                "apply": "Apply",
+                "mode": "set",
+                "quantity": "0",
+            },
+        )
+        self.assertEqual([status for _, status in self.statuses()], ["Critical"] * 4)
+
+
+class StockLedgerTests(TestCase):
+    def setUp(self):
+        self.location = Location.objects.create(country="DE", supplier_name="Sup A")
+        self.other_location = Location.objects.create(
+            country="CN", supplier_name="Sup B"
+        )
+        self.item = BackupEquipment.objects.create(
+            name="Motor",
+            minimum_quantity=5,
+            current_quantity=6,
+            location=self.location,
+        )
+        self.remote = BackupEquipment.objects.create(
+            name="Motor",
+            minimum_quantity=2,
+            current_quantity=0,
+            location=self.other_location,
+        )
+
+    def refreshed(self, item):
+        item.refresh_from_db()
+        return item.current_quantity, item.status
+
+    def test_opening_stock_is_recorded(self):
+        movement = self.item.movements.get()
+        self.assertEqual((movement.kind, movement.quantity), (StockMovement.COUNT, 6))
+        self.assertFalse(self.remote.movements.exists())
+
+    def test_receive_consume_and_transfer(self):
+        ledger.receive(self.item, 4, "PO-1")
+        ledger.consume(self.item, 7)
+        self.assertEqual(self.refreshed(self.item), (3, "Low"))
+        with self.assertRaises(ledger.InsufficientStock):
+            ledger.consume(self.item, 4)
+        self.assertEqual(self.refreshed(self.item), (3, "Low"))
+
+        outgoing, incoming = ledger.transfer(self.item, self.remote, 2)
+        self.assertEqual(incoming.transfer_from, outgoing)
+        self.assertEqual(self.refreshed(self.item), (1, "Low"))
+        self.assertEqual(self.refreshed(self.remote), (2, "Stable"))
+        with self.assertRaises(ValueError):
+            ledger.transfer(self.item, self.item, 1)
+        self.assertEqual(
+            list(self.item.movements.order_by("pk").values_list("quantity", flat=True)),
+            [6, 4, -7, -2],
+        )
+
+    def test_stale_instance_does_not_overwrite_stock(self):
+        stale = BackupEquipment.objects.get(pk=self.item.pk)
+        ledger.receive(self.item, 10)
+        ledger.receive(stale, 1)
+        self.assertEqual(self.refreshed(self.item), (17, "Stable"))
+
+    def test_receive_many_uses_constant_queries(self):
+        extra = [
+            BackupEquipment.objects.create(
+                name=f"Part {index}", minimum_quantity=1, location=self.location
+            )
+            for index in range(20)
+        ]
+        quantities = {item.pk: index + 1 for index, item in enumerate(extra)}
+        with self.assertNumQueries(5):
+            movements = ledger.receive_many(quantities, "scanner-1")
+        self.assertEqual(len(movements), 20)
+        self.assertEqual(self.refreshed(extra[4]), (5, "Stable"))
+        with self.assertRaises(BackupEquipment.DoesNotExist):
+            ledger.receive_many({999999: 1})
+
+    def test_counts_and_adjustments_are_recorded(self):
+        ledger.apply_counts({self.item.pk: 2, self.remote.pk: 0})
+        self.assertEqual(self.refreshed(self.item), (2, "Low"))
+        # Unchanged counts leave no movement behind.
+        self.assertFalse(self.remote.movements.exists())
+
+        ledger.adjust(BackupEquipment.objects.all(), -3)
+        self.assertEqual(self.refreshed(self.item), (0, "Critical"))
+        self.assertEqual(
+            list(self.item.movements.order_by("pk").values_list("quantity", flat=True)),
+            [6, -4, -2],
+        )
+        self.assertFalse(ledger.ledger_drift().exists())
+
+    def test_stock_at_date_uses_latest_snapshot(self):
+        start = timezone.now()
+        ledger.receive(self.item, 4)
+        self.assertEqual(ledger.stock_at(self.item, start), 6)
+        self.assertEqual(ledger.stock_at(self.item, timezone.now()), 10)
+
+        self.assertEqual(ledger.take_snapshots(timezone.now()), 2)
+        snapshot = self.item.snapshots.get()
+        self.assertEqual(snapshot.quantity, 10)
+        ledger.consume(self.item, 1)
+        self.assertEqual(ledger.stock_at(self.item, timezone.now()), 9)
+        self.assertEqual(ledger.stock_at(self.item, snapshot.taken_at), 10)
+
+        # Writes that bypass the ledger show up as drift.
+        BackupEquipment.objects.filter(pk=self.item.pk).update(current_quantity=50)
+        self.assertEqual(list(ledger.ledger_drift()), [self.item])
+        out = StringIO()
+        call_command("snapshot_stock", stdout=out)
+        self.assertIn("current quantity 50, ledger 9", out.getvalue())
+
+    def test_movements_are_append_only(self):
+        movement = self.item.movements.get()
+        with self.assertRaises(ValueError):
+            movement.save()
+        with self.assertRaises(ValueError):
+            movement.delete()
+
+    def test_admin_records_movements(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        change_url = reverse(
+            "admin:spare_parts_management_backupequipment_change",
+            args=[self.item.pk],
+        )
+        url = reverse(
+            "admin:spare_parts_management_backupequipment_movement",
+            args=[self.item.pk],
+        )
+        response = self.client.get(change_url)
+        self.assertContains(response, "Opening stock")
+        self.assertContains(response, url)
+
+        response = self.client.post(url, {"kind": "consumption", "quantity": "9"})
+        self.assertContains(response, "Not enough stock")
+        response = self.client.post(url, {"kind": "transfer_out", "quantity": "1"})
+        self.assertContains(response, "Choose where the stock goes.")
+        response = self.client.post(
+            url,
+            {"kind": "transfer_out", "quantity": "4", "destination": self.remote.pk},
+        )
+        self.assertRedirects(response, change_url)
+        self.assertEqual(self.refreshed(self.remote), (4, "Stable"))
+        self.assertEqual(self.remote.movements.get().created_by.username, "admin")
+
+        # The change form no longer writes current_quantity back.
+        ledger.receive(self.item, 5)
+        response = self.client.post(
+            change_url,
+            {
+                "name": "Motor",
+                "minimum_quantity": "20",
+                "current_quantity": "0",
+                "location": self.location.pk,
+                "category": BackupEquipment.TONIEBOX_2,
+            },
+        )
+        self.assertRedirects(
+            response,
+            reverse("admin:spare_parts_management_backupequipment_changelist"),
+        )
+        self.assertEqual(self.refreshed(self.item), (7, "Low"))
+
+    def test_admin_deletes_stocked_item_and_location(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        ledger.transfer(self.item, self.remote, 2)
+        ledger.take_snapshots()
+
+        url = reverse(
+            "admin:spare_parts_management_backupequipment_delete",
+            args=[self.item.pk],
+        )
+        self.assertEqual(self.client.get(url).status_code, 200)
+        response = self.client.post(url, {"post": "yes"})
+        self.assertRedirects(
+            response,
+            reverse("admin:spare_parts_management_backupequipment_changelist"),
+        )
+        self.assertFalse(BackupEquipment.objects.filter(pk=self.item.pk).exists())
+        self.assertIsNone(self.remote.movements.get(kind="transfer_in").transfer_from)
+
+        url = reverse("admin:tb2_vsm_location_delete", args=[self.other_location.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {"post": "yes"})
+        self.assertFalse(StockMovement.objects.exists())
+
+
+class ReorderPlanTests(TestCase):
+    def setUp(self):
+        self.berlin = Location.objects.create(country="DE", supplier_name="Berlin")
+        self.hanoi = Location.objects.create(country="VN", supplier_name="Hanoi")
+        self.acme = Producer.objects.create(name="Acme")
+        self.bolt = Producer.objects.create(name="Bolt")
+        self.anna = Buyer.objects.create(full_name="Anna", email="anna@example.com")
+        self.ben = Buyer.objects.create(full_name="Ben", email="ben@example.com")
+        for name, location, producer, buyer, minimum, current, price in [
+            ("Motor", self.berlin, self.acme, self.anna, 10, 4, Decimal("12.50")),
+            ("Motor", self.hanoi, self.acme, self.anna, 5, 0, Decimal("12.50")),
+            ("Belt", self.hanoi, self.acme, self.ben, 3, 1, None),
+            ("Sensor", self.berlin, self.bolt, self.anna, 2, 1, Decimal("80.00")),
+            ("Stocked", self.berlin, self.bolt, self.anna, 2, 9, Decimal("5.00")),
+            ("Loose", self.hanoi, None, None, 4, 2, Decimal("1.00")),
+        ]:
+            BackupEquipment.objects.create(
+                name=name,
+                location=location,
+                producer=producer,
+                buyer=buyer,
+                minimum_quantity=minimum,
+                current_quantity=current,
+                price=price,
+            )
+
+    def test_summary_aggregates_in_one_query(self):
+        with self.assertNumQueries(1):
+            groups = list(reorder.plan_summary())
+        summary = {
+            (group["producer__name"], group["buyer__full_name"]): (
+                group["items"],
+                group["units"],
+                group["total"],
+                group["unpriced"],
+            )
+            for group in groups
+        }
+        self.assertEqual(
+            summary,
+            {
+                ("Acme", "Anna"): (2, 11, Decimal("137.50"), 0),
+                ("Acme", "Ben"): (1, 2, Decimal("0.00"), 1),
+                ("Bolt", "Anna"): (1, 1, Decimal("80.00"), 0),
+                (None, None): (1, 2, Decimal("2.00"), 0),
+            },
+        )
+
+    def test_purchase_lists_group_lines(self):
+        with self.assertNumQueries(1):
+            lists = reorder.purchase_lists()
+        by_name = {str(purchase_list): purchase_list for purchase_list in lists}
+        self.assertEqual(
+            sorted(by_name),
+            ["Acme / Anna", "Acme / Ben", "Bolt / Anna", "No producer / no buyer"],
+        )
+        motors = by_name["Acme / Anna"]
+        self.assertEqual(
+            [str(line.location) for line in motors.lines],
+            [str(self.berlin), str(self.hanoi)],
+        )
+        self.assertEqual((motors.units, motors.total), (11, Decimal("137.50")))
+        self.assertEqual(by_name["Acme / Ben"].unpriced, 1)
+
+    def test_command_writes_plan(self):
+        for extension in ("csv", "xlsx"):
+            with tempfile.NamedTemporaryFile(suffix=f".{extension}") as f:
+                out = StringIO()
+                call_command("plan_reorders", "--output", f.name, stdout=out)
+                self.assertIn(
+                    "Acme / Anna: 2 items, 11 units, 137.50 €", out.getvalue()
+                )
+                self.assertIn("4 purchase lists, 219.50 €", out.getvalue())
+                self.assertGreater(os.path.getsize(f.name), 0)
+                if extension == "csv":
+                    with open(f.name, encoding="utf-8") as fileobj:
+                        rows = list(csv.reader(fileobj))
+                    self.assertEqual(rows[0], reorder.HEADER)
+                    self.assertEqual(len(rows), 6)
+
+        with self.assertRaisesMessage(CommandError, "--output must end in"):
+            call_command("plan_reorders", "--output", "plan.txt", stdout=StringIO())
+
+    def test_admin_plan_and_export(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        response = self.client.get(
+            reverse("admin:spare_parts_management_backupequipment_changelist")
+        )
+        self.assertContains(response, reverse("admin:reorder_plan"))
+
+        response = self.client.get(reverse("admin:reorder_plan"))
+        self.assertContains(response, "mailto:anna@example.com")
+        self.assertContains(response, "137.50")
+        self.assertContains(response, "219.50")
+
+        response = self.client.get(reverse("admin:reorder_plan_export", args=["csv"]))
+        rows = list(
+            csv.reader(
+                b"".join(response.streaming_content).decode("utf-8").splitlines()
+            )
+        )
+        self.assertEqual(len(rows), 6)
+        self.assertNotIn("Stocked", [row[5] for row in rows])
+        self.assertEqual(
+            self.client.get(
+                reverse("admin:reorder_plan_export", args=["pdf"])
+            ).status_code,
+            404,
+        )
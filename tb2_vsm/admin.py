@@ -1,9 +1,8 @@
-import os
-import google.generativeai as genai
 from django.contrib import admin
 from django.urls import path
 from django.template.response import TemplateResponse
 from .models import (
+    BackgroundJob,
     EquipmentSerial,
     Step,
     Process,
@@ -16,30 +15,77 @@ from .models import (
 from django.urls import path
 from django.template.response import TemplateResponse
 from .models import Location
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse
-from django.db.models import Prefetch
 from django.contrib.admin import SimpleListFilter
 from tb2_vsm.models import Location
 from django import forms
 from django.shortcuts import redirect, render
 from django.contrib import messages
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from .graph_cache import LINKED_LOCATIONS_KEY, data_version, graph_cache
+from .hierarchy import load_hierarchy
+from .reports import build_production_report
+from .suggestions import (
+    SuggestionError,
+    build_prompt,
+    check_step,
+    get_cached_suggestion,
+    get_suggestion,
+    stream_suggestions,
+)
+from . import jobs, serial_lookup
+from .exports import ExportMixin
+from .serial_import import SerialImportError, import_serials
+from .svg import render_svg
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 admin.site.site_header = "PSM Production Hub"
 admin.site.site_title = "PSM Production Hub"
 admin.site.index_title = "PSM Production Hub"
 
 
+def linked_location_lookups():
+    """Return ``(id, label)`` choices for locations linked to any process.
+
+    Backed by a single distinct join and cached in the shared cache until the
+    next Process/Production/Location or process M2M change. The hour timeout
+    bounds staleness if a refresh races with an invalidation.
+    """
+    lookups = cache.get(LINKED_LOCATIONS_KEY)
+    if lookups is None:
+        locations = Location.objects.filter(
+            toniebox_productions__processes__isnull=False
+        ).distinct()
+        lookups = sorted(((loc.id, str(loc)) for loc in locations), key=lambda x: x[1])
+        cache.set(LINKED_LOCATIONS_KEY, lookups, timeout=3600)
+    return lookups
+
+
+class CascadeDeleteMixin:
+    """Let deleting an object cascade to related rows whose own admin refuses
+    deleting them one by one (``deleted_with_parent = True``), such as the
+    append-only stock ledger."""
+
+    def get_deleted_objects(self, objs, request):
+        deleted, counts, perms_needed, protected = super().get_deleted_objects(
+            objs, request
+        )
+        for model, model_admin in self.admin_site._registry.items():
+            if getattr(model_admin, "deleted_with_parent", False):
+                perms_needed.discard(model._meta.verbose_name)
+        return deleted, counts, perms_needed, protected
+
+
 class ProductionLocationFilter(SimpleListFilter):
     title = "location"
     parameter_name = "location"
 
     def lookups(self, request, model_admin):
-        from tb2_vsm.models import Location
-
-        return [(loc.id, str(loc)) for loc in Location.objects.all()]
+        return linked_location_lookups()
 
     def queryset(self, request, queryset):
         if self.value():
@@ -63,6 +109,19 @@ class StepAdmin(admin.ModelAdmin):
     list_filter = ["process", ProductionLocationFilter]
     exclude = ["output_per_hour"]
 
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("process")
+            .prefetch_related(
+                Prefetch(
+                    "process__toniebox_productions",
+                    queryset=TonieboxProduction.objects.select_related("location"),
+                )
+            )
+        )
+
     @admin.display(description="Location")
     def location(self, obj):
         if obj.process:
@@ -99,13 +158,27 @@ class StepAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
 
-    def build_mermaid_graph(self, location, index):
+    def build_graph_tree(self, location, index):
+        """Build the Location -> Production -> Process -> Step node tree.
+
+        Each node is a dict with a Mermaid ``id``, its ``title`` lines, a
+        ``details`` KPI line, a ``warning`` flag and its ``children``. Returns
+        ``None`` when the location has no active productions.
+        """
+
         def _val(v):
             if callable(v):
                 v = v()
             return v or 0
 
-        lines = ["graph TD"]
+        def _node(node_id, title, details, children=None, warning=False):
+            return {
+                "id": node_id,
+                "title": title,
+                "details": details,
+                "warning": warning,
+                "children": children if children is not None else [],
+            }
 
         active_productions = getattr(
             location,
@@ -114,7 +187,7 @@ class StepAdmin(admin.ModelAdmin):
         )
 
         if not active_productions:
-            return ""
+            return None
 
         total_ops = sum(_val(p.total_operators) for p in active_productions)
         avg_cts = [_val(p.average_cycle_time) for p in active_productions]
@@ -123,60 +196,80 @@ class StepAdmin(admin.ModelAdmin):
             (_val(p.minimum_output_per_hour) for p in active_productions), default=0
         )
 
-        loc_label = (
-            f"🌍 {location.country.name} <br>({location.supplier_name})<br><small>"
-            f"Operators: {total_ops}, CT: {avg_ct}s, Min Out/h: {min_out}"
-            "</small>"
+        root = _node(
+            f"L_{index}",
+            [f"🌍 {location.country.name} ", f"({location.supplier_name})"],
+            f"Operators: {total_ops}, CT: {avg_ct}s, Min Out/h: {min_out}",
         )
-        lines.append(f'L_{index}["{loc_label}"]')
 
         for j, prod in enumerate(active_productions, 1):
             prod_ops = _val(prod.total_operators)
             prod_ct = _val(prod.average_cycle_time)
             prod_min = _val(prod.minimum_output_per_hour)
-            prod_label = (
-                f"📦 {prod.name}<br><small>"
-                f"Operators: {prod_ops}, CT: {prod_ct}s, Min Out/h: {prod_min}"
-                "</small>"
+            prod_node = _node(
+                f"P_{index}_{j}",
+                [f"📦 {prod.name}"],
+                f"Operators: {prod_ops}, CT: {prod_ct}s, Min Out/h: {prod_min}",
             )
-            lines.append(f'P_{index}_{j}["{prod_label}"]')
-            lines.append(f"L_{index} --> P_{index}_{j}")
+            root["children"].append(prod_node)
+
+            processes = getattr(prod, "ordered_processes", None)
+            if processes is None:
+                processes = prod.processes.all().order_by("order")
 
-            for k, proc in enumerate(prod.processes.all().order_by("order"), 1):
+            for k, proc in enumerate(processes, 1):
                 proc_ops = _val(proc.total_operators)
                 proc_ct = _val(proc.average_cycle_time)
                 proc_min = _val(proc.minimum_output_per_hour)
-                proc_label = (
-                    f"⚙️ {proc.name}<br><small>"
-                    f"Operators: {proc_ops}, CT: {proc_ct}s, Min Out/h: {proc_min}"
-                    "</small>"
+                proc_node = _node(
+                    f"C_{index}_{j}_{k}",
+                    [f"⚙️ {proc.name}"],
+                    f"Operators: {proc_ops}, CT: {proc_ct}s, Min Out/h: {proc_min}",
                 )
-                lines.append(f'C_{index}_{j}_{k}["{proc_label}"]')
-                lines.append(f"P_{index}_{j} --> C_{index}_{j}_{k}")
+                prod_node["children"].append(proc_node)
 
-                for m, step in enumerate(proc.steps.all(), 1):
+                steps = getattr(proc, "ordered_steps", None)
+                if steps is None:
+                    steps = proc.steps.all()
+
+                for m, step in enumerate(steps, 1):
                     step_ct = _val(step.cycle_time)
-                    warning = "⚠️ " if step_ct > prod_ct else ""
-                    step_label = (
-                        f"{warning}🔧 {step.name}<br><small>"
-                        f"CT: {step_ct}s, Ops: {step.amount_of_operators}"
-                        "</small>"
+                    warning = step_ct > prod_ct
+                    proc_node["children"].append(
+                        _node(
+                            f"S_{index}_{j}_{k}_{m}",
+                            [f"{'⚠️ ' if warning else ''}🔧 {step.name}"],
+                            f"CT: {step_ct}s, Ops: {step.amount_of_operators}",
+                            warning=warning,
+                        )
                     )
-                    lines.append(f'S_{index}_{j}_{k}_{m}["{step_label}"]')
-                    lines.append(f"C_{index}_{j}_{k} --> S_{index}_{j}_{k}_{m}")
 
+        return root
+
+    def build_mermaid_graph(self, location, index):
+        tree = self.build_graph_tree(location, index)
+        if tree is None:
+            return ""
+
+        lines = ["graph TD"]
+
+        def _emit(node, parent_id=None):
+            label = "<br>".join(node["title"]) + f"<br><small>{node['details']}</small>"
+            lines.append(f'{node["id"]}["{label}"]')
+            if parent_id:
+                lines.append(f"{parent_id} --> {node['id']}")
+            for child in node["children"]:
+                _emit(child, node["id"])
+
+        _emit(tree)
         return "\n".join(lines)
 
+    def build_svg_graph(self, location, index):
+        tree = self.build_graph_tree(location, index)
+        return render_svg(tree) if tree is not None else ""
+
     def step_tree_view(self, request):
-        locations = Location.objects.filter(active=True).prefetch_related(
-            Prefetch(
-                "toniebox_productions",
-                queryset=TonieboxProduction.objects.filter(
-                    active=True
-                ).prefetch_related("processes__steps"),
-                to_attr="filtered_productions",
-            )
-        )
+        locations = load_hierarchy()
 
         context = dict(
             self.admin_site.each_context(request),
@@ -185,66 +278,61 @@ class StepAdmin(admin.ModelAdmin):
         )
         return TemplateResponse(request, "admin/step_tree_view.html", context)
 
+    def get_graph_renderer(self, request):
+        renderer = request.GET.get("render", settings.VSM_GRAPH_RENDERER)
+        return renderer if renderer in ("svg", "mermaid") else "svg"
+
+    def build_graphs(self, view_type, toniebox_productions, renderer="svg"):
+        """Return ``(graph, location)`` pairs, reusing cached graphs per location."""
+        build = self.build_svg_graph if renderer == "svg" else self.build_mermaid_graph
+        version = data_version()
+        locations = list(Location.objects.filter(active=True))
+        keys = {
+            location.pk: (view_type, renderer, location.pk, idx, version)
+            for idx, location in enumerate(locations, 1)
+        }
+        graphs = {pk: graph_cache.get(key) for pk, key in keys.items()}
+
+        missing = [pk for pk, graph in graphs.items() if graph is None]
+        if missing:
+            for location in load_hierarchy(toniebox_productions, location_ids=missing):
+                key = keys[location.pk]
+                graph = build(location, key[3])
+                graph_cache.set(key, graph)
+                graphs[location.pk] = graph
+
+        return [(graphs[loc.pk], loc) for loc in locations if graphs[loc.pk]]
+
     def vsm_lean_view(self, request):
         toniebox_productions = TonieboxProduction.objects.filter(
             active=True, category__in=["Toniebox 1", "Toniebox 2", "Toniebox 2 G2"]
-        ).prefetch_related("processes__steps")
-
-        locations = (
-            Location.objects.filter(active=True)
-            .prefetch_related(
-                Prefetch(
-                    "toniebox_productions",
-                    queryset=toniebox_productions,
-                    to_attr="filtered_productions",
-                )
-            )
-            .distinct()
         )
 
-        mermaid_graphs = []
-        for idx, location in enumerate(locations, 1):
-            graph = self.build_mermaid_graph(location, idx)
-            if graph:
-                mermaid_graphs.append((graph, location))
+        renderer = self.get_graph_renderer(request)
+        graphs = self.build_graphs("toniebox", toniebox_productions, renderer)
 
         context = dict(
             self.admin_site.each_context(request),
-            locations=locations,
-            mermaid_graphs=mermaid_graphs,
+            locations=[location for _, location in graphs],
+            mermaid_graphs=graphs,
+            renderer=renderer,
             title="Production Structure",
         )
         return TemplateResponse(request, "admin/vsm_lean_view.html", context)
 
     def vsm_lean_view_tonies(self, request):
-        toniebox_productions = (
-            TonieboxProduction.objects.filter(active=True)
-            .exclude(category__in=["Toniebox 1", "Toniebox 2", "Toniebox 2 G2"])
-            .prefetch_related("processes__steps")
-        )
-
-        locations = (
-            Location.objects.filter(active=True)
-            .prefetch_related(
-                Prefetch(
-                    "toniebox_productions",
-                    queryset=toniebox_productions,
-                    to_attr="filtered_productions",
-                )
-            )
-            .distinct()
+        toniebox_productions = TonieboxProduction.objects.filter(active=True).exclude(
+            category__in=["Toniebox 1", "Toniebox 2", "Toniebox 2 G2"]
         )
 
-        mermaid_graphs = []
-        for idx, location in enumerate(locations, 1):
-            graph = self.build_mermaid_graph(location, idx)
-            if graph:
-                mermaid_graphs.append((graph, location))
+        renderer = self.get_graph_renderer(request)
+        graphs = self.build_graphs("tonies", toniebox_productions, renderer)
 
         context = dict(
             self.admin_site.each_context(request),
-            locations=locations,
-            mermaid_graphs=mermaid_graphs,
+            locations=[location for _, location in graphs],
+            mermaid_graphs=graphs,
+            renderer=renderer,
             title="Production Structure",
         )
         return TemplateResponse(request, "admin/vsm_lean_view_tonies.html", context)
@@ -260,6 +348,7 @@ class TonieboxProductionAdmin(admin.ModelAdmin):
         "category",
     ]
     list_filter = ["location", "category"]
+    list_select_related = ["location"]
     filter_horizontal = ("processes",)
 
     def get_urls(self):
@@ -275,11 +364,26 @@ class TonieboxProductionAdmin(admin.ModelAdmin):
                 self.admin_site.admin_view(self.production_report_view),
                 name="production_report",
             ),
+            path(
+                "production-report/<int:location_id>/<str:category>/suggestions/",
+                self.admin_site.admin_view(self.production_report_suggestions_view),
+                name="production_report_suggestions",
+            ),
             path(
                 "get-step-suggestion/<int:step_id>/",
                 self.admin_site.admin_view(self.get_step_suggestion_view),
                 name="get_step_suggestion",
             ),
+            path(
+                "enqueue-step-suggestion/<int:step_id>/",
+                self.admin_site.admin_view(self.enqueue_step_suggestion_view),
+                name="enqueue_step_suggestion",
+            ),
+            path(
+                "job-status/<int:job_id>/",
+                self.admin_site.admin_view(self.job_status_view),
+                name="job_status",
+            ),
         ]
         return custom_urls + urls
 
@@ -306,81 +410,103 @@ class TonieboxProductionAdmin(admin.ModelAdmin):
         return render(request, "admin/setup_production.html", context)
 
     def get_step_suggestion_view(self, request, step_id):
-        import google.generativeai as genai
-        import os
         from django.http import JsonResponse
 
         try:
-            api_key = os.getenv("GEMINI_API_KEY")
-            if not api_key:
-                return JsonResponse(
-                    {"error": "Configurarion Error: GEMINI_API_KEY not found .env"},
-                    status=500,
-                )
+            step = Step.objects.get(id=step_id)
+            suggestion, cached = get_suggestion(
+                step, refresh=bool(request.GET.get("refresh"))
+            )
+            response = JsonResponse({"suggestion": suggestion})
+            response["X-Suggestion-Cache"] = "hit" if cached else "miss"
+            return response
 
+        except Step.DoesNotExist:
+            return JsonResponse({"error": "Step not found."}, status=404)
+        except SuggestionError as e:
+            return JsonResponse({"error": e.message}, status=e.status)
+        except Exception as e:
+            print(f"DEBUG GEMINI ERROR: {str(e)}")
+            return JsonResponse({"error": f"Gemini Error: {str(e)}"}, status=500)
+
+    def enqueue_step_suggestion_view(self, request, step_id):
+        """Return a cached suggestion right away or queue a job for the workers."""
+        from django.http import JsonResponse
+
+        try:
             step = Step.objects.get(id=step_id)
+            check_step(step)
+        except Step.DoesNotExist:
+            return JsonResponse({"error": "Step not found."}, status=404)
+        except SuggestionError as e:
+            return JsonResponse({"error": e.message}, status=e.status)
 
-            if not step.description or not step.description.strip():
-                return JsonResponse(
-                    {
-                        "error": "Step description is required to generate AI suggestions."
-                    },
-                    status=400,
-                )
+        refresh = bool(request.GET.get("refresh"))
+        if not refresh:
+            cached = get_cached_suggestion(build_prompt(step))
+            if cached is not None:
+                return JsonResponse({"suggestion": cached})
 
-            genai.configure(api_key=api_key)
+        job = jobs.enqueue(
+            jobs.STEP_SUGGESTION, {"step_id": step.id, "refresh": refresh}
+        )
+        return JsonResponse({"job_id": job.id, "status": job.status}, status=202)
 
-            model = genai.GenerativeModel("models/gemini-2.0-flash")
+    def job_status_view(self, request, job_id):
+        from django.http import JsonResponse
 
-            prompt = (
-                f"Evaluate industrial step '{step.name}' which takes {step.cycle_time}s. "
-                f"Task description: {step.description}. "
-                "Provide a concise, technically specific recommendation in English to reduce cycle time, "
-                "based strictly on globally recognized industrial standards (Lean, Kaizen). "
-                "Analyze if the time spent is consistent with the described movements. "
-                "Focus on measurable actions, ergonomics, or tooling changes. Limit to two sentences."
-            )
+        job = BackgroundJob.objects.filter(id=job_id).first()
+        if job is None:
+            return JsonResponse({"error": "Job not found."}, status=404)
+        return JsonResponse(
+            {
+                "job_id": job.id,
+                "status": job.status,
+                "attempts": job.attempts,
+                "result": job.result,
+                "error": job.error,
+            }
+        )
 
-            response = model.generate_content(prompt)
+    def production_report_suggestions_view(self, request, location_id, category):
+        """Stream Gemini suggestions for every flagged step of a report as NDJSON."""
+        from django.http import JsonResponse, StreamingHttpResponse
 
-            if not response.parts:
-                return JsonResponse(
-                    {"error": "Gemini blocked the response due to safety filters."},
-                    status=500,
-                )
+        report = build_production_report(location_id, category)
+        if not report:
+            return JsonResponse({"error": "Location not found."}, status=404)
 
-            return JsonResponse({"suggestion": response.text})
+        step_ids = {
+            step["id"]
+            for production in report["productions"]
+            for process in production["processes"]
+            for step in process["steps"]
+            if step["above_average"] and step["description"]
+        }
+        steps = Step.objects.filter(pk__in=step_ids).order_by("pk")
+        refresh = bool(request.GET.get("refresh"))
 
-        except Step.DoesNotExist:
-            return JsonResponse({"error": "Step not found."}, status=404)
-        except Exception as e:
-            print(f"DEBUG GEMINI ERROR: {str(e)}")
-            return JsonResponse({"error": f"Gemini Error: {str(e)}"}, status=500)
+        response = StreamingHttpResponse(
+            stream_suggestions(steps, refresh=refresh),
+            content_type="application/x-ndjson",
+        )
+        # Let nginx pass each suggestion through as soon as it is ready.
+        response["X-Accel-Buffering"] = "no"
+        return response
 
     def production_report_view(self, request, location_id, category):
-        location_data = (
-            Location.objects.filter(id=location_id)
-            .prefetch_related(
-                "toniebox_productions",
-                "toniebox_productions__processes",
-                "toniebox_productions__processes__steps",
-            )
-            .first()
-        )
+        report = build_production_report(location_id, category)
 
-        if not location_data:
+        if not report:
             messages.error(request, "Location not found.")
             return redirect("admin:setup_production_tool")
 
-        filtered_productions = location_data.toniebox_productions.filter(
-            category=category, active=True
-        )
-
+        location_data = report["location"]
         context = {
             **self.admin_site.each_context(request),
             "title": f"Production Report: {category} - {location_data.supplier_name}",
             "location": location_data,
-            "productions": filtered_productions,
+            "productions": report["productions"],
             "category_name": category,
             "opts": self.model._meta,
         }
@@ -406,13 +532,7 @@ class LocationFilter(SimpleListFilter):
     parameter_name = "location"
 
     def lookups(self, request, model_admin):
-        locations = set()
-        for process in model_admin.model.objects.all():
-            for prod in process.toniebox_productions.all():
-                loc = prod.location
-                if loc:
-                    locations.add((loc.id, str(loc)))
-        return sorted(locations, key=lambda x: x[1])
+        return linked_location_lookups()
 
     def queryset(self, request, queryset):
         if self.value():
@@ -431,6 +551,18 @@ class ProcessAdmin(admin.ModelAdmin):
     ]
     ordering = ["order"]
 
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .prefetch_related(
+                Prefetch(
+                    "toniebox_productions",
+                    queryset=TonieboxProduction.objects.select_related("location"),
+                )
+            )
+        )
+
     def production_lines(self, obj):
         links = []
         for prod in obj.toniebox_productions.all():
@@ -455,7 +587,7 @@ class ProcessAdmin(admin.ModelAdmin):
 
 
 @admin.register(Location)
-class LocationAdmin(admin.ModelAdmin):
+class LocationAdmin(CascadeDeleteMixin, admin.ModelAdmin):
     list_display = [
         "supplier_name",
         "country",
@@ -468,29 +600,54 @@ class LocationAdmin(admin.ModelAdmin):
     list_filter = ["country"]
     exclude = ["toniebox_production"]
 
-    def production_lines_count(self, obj):
-        return obj.toniebox_productions.count()
+    def get_queryset(self, request):
+        def _count(queryset):
+            return Coalesce(
+                Subquery(
+                    queryset.order_by()
+                    .values("location")
+                    .annotate(total=Count("pk"))
+                    .values("total")
+                ),
+                0,
+            )
 
-    production_lines_count.short_description = "Production Lines"
+        clouds = FactoryCloud.objects.filter(location=OuterRef("pk"))
+
+        return (
+            super()
+            .get_queryset(request)
+            .annotate(
+                production_lines_total=_count(
+                    TonieboxProduction.objects.filter(location=OuterRef("pk"))
+                ),
+                factory_clouds_total=_count(clouds),
+                has_factory_cloud=Exists(clouds),
+                # The location rollup only sums active production lines.
+                active_operators_total=Coalesce(F("kpi_rollup__total_operators"), 0),
+            )
+        )
 
-    def factory_clouds_counts(self, obj):
-        return obj.factory_clouds.count()
+    @admin.display(description="Production Lines", ordering="production_lines_total")
+    def production_lines_count(self, obj):
+        return obj.production_lines_total
 
-    factory_clouds_counts.short_description = "Factory Clouds"
+    @admin.display(description="Factory Clouds", ordering="factory_clouds_total")
+    def factory_clouds_counts(self, obj):
+        return obj.factory_clouds_total
 
+    @admin.display(
+        boolean=True, description="Has Factory Cloud", ordering="has_factory_cloud"
+    )
     def is_there_factory_cloud_count(self, obj):
-        return obj.factory_clouds.exists()
-
-    is_there_factory_cloud_count.boolean = True
-    is_there_factory_cloud_count.short_description = "Has Factory Cloud"
+        return obj.has_factory_cloud
 
+    @admin.display(
+        description="Total Operators (Active Lines Only)",
+        ordering="active_operators_total",
+    )
     def total_operators(self, obj):
-        total = 0
-        for production in obj.toniebox_productions.filter(active=True):
-            total += production.total_operators() or 0
-        return total
-
-    total_operators.short_description = "Total Operators (Active Lines Only)"
+        return obj.active_operators_total
 
 
 @admin.register(FactoryCloud)
@@ -504,9 +661,13 @@ class FactoryCloudAdmin(admin.ModelAdmin):
         "linked_production_lines",
     ]
     list_filter = ["location", "is_backup"]
+    list_select_related = ["location"]
     search_fields = ["fc_id", "name"]
     exclude = ["name"]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related("production_lines")
+
     def url_link(self, obj):
         return format_html(f'<a href="{obj.url}" target="_blank">{obj.url}</a>')
 
@@ -524,7 +685,7 @@ class FactoryCloudAdmin(admin.ModelAdmin):
 
 
 @admin.register(Equipment)
-class EquipmentAdmin(admin.ModelAdmin):
+class EquipmentAdmin(ExportMixin, admin.ModelAdmin):
     list_display = [
         "id",
         "category",
@@ -537,19 +698,77 @@ class EquipmentAdmin(admin.ModelAdmin):
         "serial_numbers_display",
     ]
     list_filter = ["location", "category", "backup", "active", "production_type"]
+    list_select_related = ["location"]
     search_fields = ["name", "active", "production_type"]
     readonly_fields = [
-        "serial_numbers_display",
+        "serial_numbers_panel",
     ]
+    serial_preview_length = 120
+    serial_preview_size = 20
+    serial_panel_size = 50
+    export_fields = [
+        ("ID", "id"),
+        ("Name", "name"),
+        ("Category", "category"),
+        ("Production Type", "production_type"),
+        ("Location", "location"),
+        ("Backup", "backup"),
+        ("Active", "active"),
+        ("Quantity", "quantity"),
+        ("Serial Numbers", "serial_count"),
+    ]
+
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .with_serial_summary(preview_size=self.serial_preview_size)
+        )
+
+    def export_rows(self, queryset):
+        # Only serial_count is exported; skip the preview prefetch.
+        return super().export_rows(queryset.prefetch_related(None))
 
     def serial_numbers_display(self, obj):
-        serials = obj.serials.all()
-        if not serials.exists():
+        if not obj.serial_count:
             return "-"
-        return ", ".join(s.serial_number for s in serials)
+        shown = []
+        length = 0
+        for serial in obj.preview_serials:
+            length += len(serial.serial_number) + (2 if shown else 0)
+            if length > self.serial_preview_length:
+                break
+            shown.append(serial.serial_number)
+        if len(shown) == obj.serial_count:
+            return ", ".join(shown)
+        return ", ".join([*shown, f"… ({obj.serial_count} total)"])
 
     serial_numbers_display.short_description = "Serial Numbers"
 
+    @admin.display(description="Serial Numbers")
+    def serial_numbers_panel(self, obj):
+        if not obj.pk or not obj.serial_count:
+            return "-"
+        serials = obj.serials.order_by("serial_number").values_list(
+            "serial_number", flat=True
+        )[: self.serial_panel_size]
+        panel = format_html(
+            '<ul style="margin:0; padding-left:1.2em;">{}</ul>',
+            format_html_join("", "<li>{}</li>", ((serial,) for serial in serials)),
+        )
+        if obj.serial_count <= self.serial_panel_size:
+            return panel
+        # The serial changelist is paginated and searchable.
+        url = reverse("admin:tb2_vsm_equipmentserialproxy_changelist")
+        return format_html(
+            '{}<a href="{}?equipment__id__exact={}">Showing {} of {} – browse all</a>',
+            panel,
+            url,
+            obj.pk,
+            self.serial_panel_size,
+            obj.serial_count,
+        )
+
 
 class EquipmentSerialProxy(EquipmentSerial):
     class Meta:
@@ -559,7 +778,8 @@ class EquipmentSerialProxy(EquipmentSerial):
 
 
 @admin.register(EquipmentSerialProxy)
-class EquipmentSerialAdmin(admin.ModelAdmin):
+class EquipmentSerialAdmin(ExportMixin, admin.ModelAdmin):
+    change_list_template = "admin/tb2_vsm/equipmentserialproxy/change_list.html"
     list_display = [
         "serial_number",
         "equipment",
@@ -573,6 +793,17 @@ class EquipmentSerialAdmin(admin.ModelAdmin):
         "equipment__production_type",
         "equipment__category",
     )
+    list_select_related = ["equipment__location"]
+    export_fields = [
+        ("Serial Number", "serial_number"),
+        ("Equipment ID", "equipment_id"),
+        ("Equipment", "equipment.name"),
+        ("Category", "equipment.category"),
+        ("Location", "equipment.location"),
+        ("Backup", "equipment.backup"),
+        ("Notes", "notes"),
+    ]
+    export_select_related = ["equipment__location"]
 
     @admin.display(description="Location")
     def equipment_location(self, obj):
@@ -584,6 +815,109 @@ class EquipmentSerialAdmin(admin.ModelAdmin):
     def is_backup_equipment(self, obj):
         return obj.equipment.backup if obj.equipment else None
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "lookup/",
+                self.admin_site.admin_view(self.serial_lookup_view),
+                name="serial_lookup",
+            ),
+            path(
+                "import/",
+                self.admin_site.admin_view(self.serial_import_view),
+                name="serial_import",
+            ),
+        ]
+        return custom_urls + urls
+
+    def serial_import_view(self, request):
+        result = None
+        if request.method == "POST":
+            form = SerialImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data["file"]
+                try:
+                    result = import_serials(
+                        upload.file,
+                        upload.name,
+                        dry_run=form.cleaned_data["dry_run"],
+                    )
+                except SerialImportError as e:
+                    form.add_error("file", str(e))
+                else:
+                    prefix = "Dry run: " if result.dry_run else ""
+                    messages.success(request, f"{prefix}{result}")
+        else:
+            form = SerialImportForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Import Serial Numbers",
+            "form": form,
+            "result": result,
+            "opts": self.model._meta,
+        }
+        return render(request, "admin/serial_import.html", context)
+
+    def serial_lookup_view(self, request):
+        """Resolve ``?q=<serial>`` for line scanners; ``mode`` is one of
+        auto, exact, prefix or fuzzy."""
+        from django.http import JsonResponse
+
+        mode = request.GET.get("mode", serial_lookup.AUTO)
+        if mode not in serial_lookup.MODES:
+            return JsonResponse({"error": f"Unknown mode: {mode}"}, status=400)
+        try:
+            limit = min(max(int(request.GET.get("limit", 10)), 1), 100)
+        except ValueError:
+            return JsonResponse({"error": "limit must be an integer."}, status=400)
+
+        term = request.GET.get("q", "")
+        used, results, cached = serial_lookup.lookup_serial(term, mode, limit)
+        response = JsonResponse(
+            {"query": term.strip(), "mode": used, "results": results}
+        )
+        response["X-Serial-Cache"] = "HIT" if cached else "MISS"
+        return response
+
+
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "kind",
+        "status",
+        "attempts",
+        "max_attempts",
+        "run_after",
+        "created_at",
+        "updated_at",
+    ]
+    list_filter = ["status", "kind"]
+    readonly_fields = [
+        "kind",
+        "payload",
+        "result",
+        "error",
+        "attempts",
+        "locked_at",
+        "created_at",
+        "updated_at",
+    ]
+    actions = ["retry_jobs"]
+
+    @admin.action(description="Retry selected jobs")
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status=BackgroundJob.RUNNING).update(
+            status=BackgroundJob.PENDING,
+            attempts=0,
+            error="",
+            run_after=timezone.now(),
+            locked_at=None,
+        )
+        messages.success(request, f"{count} job(s) queued for retry.")
+
 
 class ProductionSetupForm(forms.Form):
     """
@@ -601,3 +935,18 @@ class ProductionSetupForm(forms.Form):
         empty_label="--- Select a Location ---",
         widget=forms.Select(attrs={"style": "width: 300px;"}),
     )
+
+
+class SerialImportForm(forms.Form):
+    """Upload form for streaming serial number imports."""
+
+    file = forms.FileField(
+        label="CSV or XLSX file",
+        help_text=(
+            "Columns: serial_number, equipment, location and optionally "
+            "category, country and notes."
+        ),
+    )
+    dry_run = forms.BooleanField(
+        label="Dry run (validate only)", required=False, initial=True
+    )
@@ -5,3 +5,6 @@ class Tb2VsmConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tb2_vsm"
     verbose_name = "Production"
+
+    def ready(self):
+        from . import signals  # noqa: F401
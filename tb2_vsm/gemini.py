@@ -0,0 +1,23 @@
+"""Gemini provider.
+
+Importing ``google.generativeai`` pulls in grpc, protobuf and google-api-core,
+so this module must only be imported when a suggestion is actually requested
+(see ``tb2_vsm.suggestions.request_suggestion``).
+"""
+
+import threading
+
+import google.generativeai as genai
+
+_configured_key = None
+_lock = threading.Lock()
+
+
+def generate_content(prompt, api_key, model_name):
+    global _configured_key
+    with _lock:
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+    model = genai.GenerativeModel(model_name)
+    return model.generate_content(prompt)
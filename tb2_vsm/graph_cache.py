@@ -0,0 +1,80 @@
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import Step
+
+VERSION_KEY = "tb2_vsm:graph_version"
+# A single key, overwritten on refresh and deleted by bump_version(), so the
+# location filter choices never pile up rows in the database cache.
+LINKED_LOCATIONS_KEY = "tb2_vsm:linked_locations"
+
+
+class GraphCache:
+    """Small in-process LRU cache for rendered VSM graphs with hit/miss counters."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+graph_cache = GraphCache(getattr(settings, "VSM_GRAPH_CACHE_SIZE", 256))
+
+
+def bump_version():
+    """Invalidate every cached graph after a Process/Production/Location change."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        if not cache.add(VERSION_KEY, 1, timeout=None):
+            cache.incr(VERSION_KEY)
+    cache.delete(LINKED_LOCATIONS_KEY)
+
+
+def structure_version():
+    """Counter bumped on every Process/Production/Location or process M2M change."""
+    return cache.get(VERSION_KEY, 0)
+
+
+def data_version():
+    """Return a token that changes whenever the data behind the graphs changes."""
+    steps = Step.objects.aggregate(updated=Max("updated_at"), count=Count("id"))
+    updated = steps["updated"].isoformat() if steps["updated"] else ""
+    return f"{structure_version()}:{steps['count']}:{updated}"
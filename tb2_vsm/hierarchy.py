@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.db.models import F
+
+from .models import Location, Process, Step, TonieboxProduction
+
+
+def load_hierarchy(productions=None, location_ids=None):
+    """Load Location -> Production -> Process -> Step trees in four queries.
+
+    ``productions`` narrows the productions shown (defaults to every active
+    production) and ``location_ids`` loads exactly those locations instead of
+    every active one. Each location gets a ``filtered_productions`` list, each
+    production an ``ordered_processes`` list and each process an
+    ``ordered_steps`` list.
+    Productions and processes carry the ``with_kpis()`` annotations, so their
+    KPI methods do not hit the database.
+    """
+    if location_ids is None:
+        locations = Location.objects.filter(active=True)
+    else:
+        locations = Location.objects.filter(pk__in=location_ids)
+    locations = list(locations.order_by("pk"))
+
+    if productions is None:
+        productions = TonieboxProduction.objects.filter(active=True)
+    productions = list(
+        productions.filter(location__in=[location.pk for location in locations])
+        .with_kpis()
+        .order_by("name", "pk")
+    )
+
+    processes = list(
+        Process.objects.filter(
+            toniebox_productions__in=[production.pk for production in productions]
+        )
+        .with_kpis()
+        .annotate(production_id=F("toniebox_productions"))
+        .order_by("order", "pk")
+    )
+
+    steps_by_process = defaultdict(list)
+    for step in Step.objects.filter(
+        process__in={process.pk for process in processes}
+    ).order_by("order", "pk"):
+        steps_by_process[step.process_id].append(step)
+
+    processes_by_production = defaultdict(list)
+    for process in processes:
+        process.ordered_steps = steps_by_process[process.pk]
+        processes_by_production[process.production_id].append(process)
+
+    productions_by_location = defaultdict(list)
+    for production in productions:
+        production.ordered_processes = processes_by_production[production.pk]
+        productions_by_location[production.location_id].append(production)
+
+    for location in locations:
+        location.filtered_productions = productions_by_location[location.pk]
+
+    return locations
@@ -0,0 +1,124 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BackgroundJob, Step
+from .suggestions import SuggestionError, get_suggestion
+
+STEP_SUGGESTION = "step_suggestion"
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed."""
+
+
+def _run_step_suggestion(payload):
+    try:
+        step = Step.objects.get(pk=payload["step_id"])
+        suggestion, cached = get_suggestion(step, refresh=payload.get("refresh", False))
+    except Step.DoesNotExist:
+        raise PermanentJobError("Step not found.")
+    except SuggestionError as e:
+        if e.status < 500:
+            raise PermanentJobError(e.message)
+        raise
+    return {"suggestion": suggestion, "cached": cached}
+
+
+HANDLERS = {
+    STEP_SUGGESTION: _run_step_suggestion,
+}
+
+
+def enqueue(kind, payload, dedupe=True):
+    """Queue a job, reusing an identical pending or running one when ``dedupe``."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    if dedupe:
+        existing = (
+            BackgroundJob.objects.filter(
+                kind=kind,
+                payload=payload,
+                status__in=[BackgroundJob.PENDING, BackgroundJob.RUNNING],
+            )
+            .order_by("created_at")
+            .first()
+        )
+        if existing:
+            return existing
+    return BackgroundJob.objects.create(kind=kind, payload=payload)
+
+
+def release_stale_jobs():
+    """Put jobs whose worker died back in the queue."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return BackgroundJob.objects.filter(
+        status=BackgroundJob.RUNNING, locked_at__lt=cutoff
+    ).update(status=BackgroundJob.PENDING, locked_at=None)
+
+
+def prune_finished_jobs(now=None):
+    """Delete succeeded and failed jobs older than ``JOB_RETENTION`` seconds.
+    Returns the number of jobs deleted."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=settings.JOB_RETENTION)
+    deleted, _ = BackgroundJob.objects.filter(
+        status__in=[BackgroundJob.SUCCEEDED, BackgroundJob.FAILED],
+        updated_at__lt=cutoff,
+    ).delete()
+    return deleted
+
+
+def claim_jobs(limit):
+    """Atomically mark up to ``limit`` due jobs as running and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            BackgroundJob.objects.select_for_update(skip_locked=True)
+            .filter(status=BackgroundJob.PENDING, run_after__lte=now)
+            .order_by("run_after", "pk")[:limit]
+        )
+        if jobs:
+            BackgroundJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                status=BackgroundJob.RUNNING, locked_at=now
+            )
+    for job in jobs:
+        job.status = BackgroundJob.RUNNING
+        job.locked_at = now
+    return jobs
+
+
+def run_job(job):
+    """Execute one claimed job and record its outcome, scheduling retries."""
+    job.attempts += 1
+    try:
+        job.result = HANDLERS[job.kind](job.payload)
+    except PermanentJobError as e:
+        job.status = BackgroundJob.FAILED
+        job.error = str(e)
+    except Exception as e:
+        job.error = str(e)
+        if job.attempts < job.max_attempts:
+            job.status = BackgroundJob.PENDING
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        else:
+            job.status = BackgroundJob.FAILED
+    else:
+        job.status = BackgroundJob.SUCCEEDED
+        job.error = ""
+    job.locked_at = None
+    job.save(
+        update_fields=[
+            "attempts",
+            "result",
+            "status",
+            "error",
+            "run_after",
+            "locked_at",
+            "updated_at",
+        ]
+    )
+    return job
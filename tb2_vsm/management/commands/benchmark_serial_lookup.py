@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from tb2_vsm import serial_lookup
+from tb2_vsm.models import EquipmentSerial
+
+
+def _percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(percent / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def _mutate(serial, rng):
+    # Simulate a misread character for fuzzy matching.
+    index = rng.randrange(len(serial))
+    return serial[:index] + rng.choice("0123456789ABCDEF") + serial[index + 1 :]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure serial number lookup latency (p50/p95/p99) for exact, cached, "
+        "prefix and fuzzy matching. Seed data first, e.g. "
+        "`manage.py seed_vsm --scale 100` for 1M serials."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=500)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--max-p99-ms",
+            type=float,
+            default=None,
+            help="Fail if the p99 of an uncached exact lookup exceeds this budget.",
+        )
+
+    def sample_serials(self, count, rng):
+        bounds = EquipmentSerial.objects.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            raise CommandError("No serial numbers found; run seed_vsm first.")
+        pks = [rng.randint(bounds["low"], bounds["high"]) for _ in range(count * 2)]
+        serials = list(
+            EquipmentSerial.objects.filter(pk__in=pks).values_list(
+                "serial_number", flat=True
+            )
+        )
+        if not serials:
+            raise CommandError("Could not sample serial numbers.")
+        return [rng.choice(serials) for _ in range(count)]
+
+    def measure(self, label, terms, mode, clear_cache=False):
+        timings = []
+        for term in terms:
+            if clear_cache:
+                serial_lookup.serial_cache.clear()
+            start = time.perf_counter()
+            serial_lookup.lookup_serial(term, mode)
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f"{label:<14} p50 {statistics.median(timings):7.3f} ms  "
+            f"p95 {_percentile(timings, 95):7.3f} ms  "
+            f"p99 {_percentile(timings, 99):7.3f} ms  "
+            f"max {max(timings):7.3f} ms"
+        )
+        return timings
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        iterations = max(options["iterations"], 1)
+        serials = self.sample_serials(iterations, rng)
+        self.stdout.write(
+            f"Serials: {EquipmentSerial.objects.count()}, iterations: {iterations}"
+        )
+
+        exact = self.measure("exact", serials, serial_lookup.EXACT, clear_cache=True)
+        serial_lookup.serial_cache.clear()
+        hot = serials[:20]
+        self.measure(
+            "exact cached", [rng.choice(hot) for _ in serials], serial_lookup.EXACT
+        )
+        self.measure(
+            "prefix", [serial[:-2] for serial in serials], serial_lookup.PREFIX
+        )
+        self.measure(
+            "fuzzy",
+            [_mutate(serial, rng) for serial in serials[: max(iterations // 5, 1)]],
+            serial_lookup.FUZZY,
+        )
+
+        budget = options["max_p99_ms"]
+        if budget and _percentile(exact, 99) > budget:
+            raise CommandError(
+                f"exact lookup p99 {_percentile(exact, 99):.3f} ms exceeds "
+                f"{budget} ms"
+            )
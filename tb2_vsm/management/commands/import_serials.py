@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tb2_vsm.serial_import import SerialImportError, import_serials
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or XLSX file of equipment serial numbers (columns: "
+        "serial_number, equipment, location, optional category, country, notes) "
+        "into the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and report without writing anything.",
+        )
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(f"... {result}")
+
+        try:
+            with open(options["path"], "rb") as fileobj:
+                result = import_serials(
+                    fileobj,
+                    options["path"],
+                    dry_run=options["dry_run"],
+                    chunk_size=max(options["chunk_size"], 1),
+                    progress=progress,
+                )
+        except (OSError, SerialImportError) as e:
+            raise CommandError(str(e))
+
+        for issue in result.issues:
+            self.stdout.write(
+                f"line {issue['line']}: {issue['serial_number'] or '-'}: "
+                f"{issue['message']}"
+            )
+        hidden = result.duplicates + result.invalid - len(result.issues)
+        if hidden > 0:
+            self.stdout.write(f"... and {hidden} more issue(s)")
+        prefix = "Dry run: " if result.dry_run else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{result}"))
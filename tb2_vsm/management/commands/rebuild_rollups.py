@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tb2_vsm.rollups import rebuild_all
+
+
+class Command(BaseCommand):
+    help = "Recompute every KPI rollup row for processes, productions and locations."
+
+    def handle(self, *args, **options):
+        count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} KPI rollups."))
@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from tb2_vsm.jobs import claim_jobs, prune_finished_jobs, release_stale_jobs, run_job
+
+# Seconds between sweeps for finished jobs past their retention.
+PRUNE_INTERVAL = 3600
+
+
+def _run_in_thread(job):
+    try:
+        return run_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued background jobs (e.g. Gemini suggestions) with a worker pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process every job that is currently due, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        workers = max(options["workers"], 1)
+        processed = 0
+        last_prune = None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                close_old_connections()
+                if (
+                    last_prune is None
+                    or time.monotonic() - last_prune >= PRUNE_INTERVAL
+                ):
+                    pruned = prune_finished_jobs()
+                    last_prune = time.monotonic()
+                    if pruned:
+                        self.stdout.write(f"Pruned {pruned} finished job(s).")
+                release_stale_jobs()
+                jobs = claim_jobs(workers)
+                if not jobs:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+
+                for job in executor.map(_run_in_thread, jobs):
+                    processed += 1
+                    self.stdout.write(f"{job} after {job.attempts} attempt(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)."))
@@ -0,0 +1,338 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from maintenance import summary
+from maintenance.models import Maintenance
+from spare_parts_management.models import (
+    BackupEquipment,
+    Buyer,
+    Producer,
+    StockSnapshot,
+    stock_status,
+)
+from tb2_vsm.graph_cache import bump_version
+from tb2_vsm.models import (
+    Equipment,
+    EquipmentSerial,
+    FactoryCloud,
+    Location,
+    Process,
+    Step,
+    TonieboxProduction,
+)
+from tb2_vsm.rollups import rebuild_all
+
+# Volumes at --scale 1. Locations and processes grow with the scale factor;
+# the per-location and per-process volumes are fixed.
+LOCATIONS = 2
+PRODUCTIONS_PER_LOCATION = 5
+PROCESSES = 50
+STEPS_PER_PROCESS = 20
+PROCESSES_PER_PRODUCTION = 8
+EQUIPMENT_PER_LOCATION = 500
+SERIALS_PER_EQUIPMENT = 10
+BACKUP_EQUIPMENT_PER_LOCATION = 50
+
+COUNTRIES = ["DE", "CN", "VN", "PL", "CZ", "HU", "MX", "TR"]
+
+
+def _scaled(value, scale):
+    return max(1, round(value * scale))
+
+
+def _batches(objects, size):
+    iterator = iter(objects)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic locations, productions, processes, steps, factory "
+        "clouds, equipment, serials, maintenance and backup equipment for load "
+        "testing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale",
+            type=float,
+            default=1.0,
+            help=(
+                "Multiplier for the number of locations and processes. At 1 "
+                f"this creates {PROCESSES * STEPS_PER_PROCESS} steps and "
+                f"{LOCATIONS * EQUIPMENT_PER_LOCATION * SERIALS_PER_EQUIPMENT} "
+                "serials; use 100 for 100k steps and 1M serials."
+            ),
+        )
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Random seed for repeatable data."
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options["scale"] <= 0:
+            raise CommandError("--scale must be positive.")
+        self.scale = options["scale"]
+        self.batch_size = max(options["batch_size"], 1)
+        self.random = random.Random(options["seed"])
+        self.today = date.today()
+        # Unique fields are offset so repeated runs do not collide.
+        self.run_tag = f"SIM{options['seed']}-{EquipmentSerial.objects.count()}"
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            locations = self.create_locations()
+            processes = self.create_processes()
+            steps = self.create_steps(processes)
+            productions = self.create_productions(locations, processes)
+            clouds = self.create_factory_clouds(locations, productions)
+            equipment = self.create_equipment(locations)
+            serials = self.create_serials(equipment)
+            maintenance = self.create_maintenance(equipment)
+            backups = self.create_backup_equipment(locations)
+            # bulk_create skips the signals that keep these up to date. Graph
+            # keys follow the step count, but the location filter choices
+            # and the maintenance banner are only dropped by an explicit bump.
+            rebuild_all()
+            transaction.on_commit(bump_version)
+            transaction.on_commit(summary.bump_version)
+
+        for label, count in [
+            ("locations", len(locations)),
+            ("productions", len(productions)),
+            ("processes", len(processes)),
+            ("steps", steps),
+            ("factory clouds", clouds),
+            ("equipment", len(equipment)),
+            ("serials", serials),
+            ("maintenance records", maintenance),
+            ("backup equipment", backups),
+        ]:
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Seeded in {time.perf_counter() - start:.1f}s.")
+        )
+
+    def bulk_create(self, model, objects):
+        """Insert ``objects`` in batches; return the created instances' pks."""
+        pks = []
+        for batch in _batches(objects, self.batch_size):
+            pks.extend(obj.pk for obj in model.objects.bulk_create(batch))
+        return pks
+
+    def cycle_time(self):
+        # Most steps take 20-60s with a long tail of slow bottleneck steps.
+        if self.random.random() < 0.02:
+            return None
+        seconds = min(max(self.random.lognormvariate(3.4, 0.5), 2), 900)
+        return Decimal(f"{seconds:.2f}")
+
+    def create_locations(self):
+        count = _scaled(LOCATIONS, self.scale)
+        return self.bulk_create(
+            Location,
+            (
+                Location(
+                    country=self.random.choice(COUNTRIES),
+                    supplier_name=f"{self.run_tag} Supplier {index}",
+                    active=self.random.random() < 0.9,
+                )
+                for index in range(count)
+            ),
+        )
+
+    def create_processes(self):
+        count = _scaled(PROCESSES, self.scale)
+        return self.bulk_create(
+            Process,
+            (
+                Process(name=f"Process {index}", order=index % 20)
+                for index in range(count)
+            ),
+        )
+
+    def create_steps(self, processes):
+        def steps():
+            for process_id in processes:
+                for order in range(STEPS_PER_PROCESS):
+                    cycle_time = self.cycle_time()
+                    yield Step(
+                        process_id=process_id,
+                        name=f"Step {order}",
+                        order=order,
+                        cycle_time=cycle_time,
+                        output_per_hour=(
+                            round(3600 / cycle_time, 2) if cycle_time else 0
+                        ),
+                        amount_of_operators=self.random.choices(
+                            [0, 1, 2, 3, 4], weights=[5, 60, 22, 9, 4]
+                        )[0],
+                    )
+
+        return len(self.bulk_create(Step, steps()))
+
+    def create_productions(self, locations, processes):
+        categories = [value for value, _ in TonieboxProduction.CATEGORY_CHOICES]
+        productions = self.bulk_create(
+            TonieboxProduction,
+            (
+                TonieboxProduction(
+                    name=f"Line {location_id}.{index}",
+                    location_id=location_id,
+                    category=self.random.choice(categories),
+                    active=self.random.random() < 0.85,
+                )
+                for location_id in locations
+                for index in range(PRODUCTIONS_PER_LOCATION)
+            ),
+        )
+        # Processes are shared between productions, as they are in practice.
+        through = TonieboxProduction.processes.through
+        per_production = min(PROCESSES_PER_PRODUCTION, len(processes))
+        self.bulk_create(
+            through,
+            (
+                through(tonieboxproduction_id=production_id, process_id=process_id)
+                for production_id in productions
+                for process_id in self.random.sample(processes, per_production)
+            ),
+        )
+        return productions
+
+    def create_factory_clouds(self, locations, productions):
+        first_id = (FactoryCloud.objects.aggregate(last=Max("fc_id"))["last"] or 0) + 1
+        clouds = self.bulk_create(
+            FactoryCloud,
+            (
+                FactoryCloud(
+                    fc_id=first_id + index,
+                    name=f"Factory Cloud {first_id + index}",
+                    url=f"https://fc-{first_id + index}.example.com",
+                    location_id=location_id,
+                    is_backup=index % 4 == 3,
+                )
+                for index, location_id in enumerate(locations)
+            ),
+        )
+        through = FactoryCloud.production_lines.through
+        self.bulk_create(
+            through,
+            (
+                through(
+                    factorycloud_id=clouds[index // PRODUCTIONS_PER_LOCATION],
+                    tonieboxproduction_id=production_id,
+                )
+                for index, production_id in enumerate(productions)
+            ),
+        )
+        return len(clouds)
+
+    def create_equipment(self, locations):
+        categories = [value for value, _ in Equipment.CATEGORY_CHOICES]
+        production_types = [value for value, _ in Equipment.PRODUCTION_CHOICES]
+
+        def equipment():
+            for location_id in locations:
+                for index in range(EQUIPMENT_PER_LOCATION):
+                    backup = self.random.random() < 0.15
+                    yield Equipment(
+                        name=f"Equipment {location_id}.{index}",
+                        category=self.random.choice(categories),
+                        production_type=self.random.choice(production_types),
+                        location_id=location_id,
+                        backup=backup,
+                        active=not backup,
+                        quantity=self.random.randint(1, 5),
+                    )
+
+        return self.bulk_create(Equipment, equipment())
+
+    def create_serials(self, equipment):
+        return len(
+            self.bulk_create(
+                EquipmentSerial,
+                (
+                    EquipmentSerial(
+                        equipment_id=equipment_id,
+                        serial_number=f"{self.run_tag}-{equipment_id}-{index:03d}",
+                    )
+                    for equipment_id in equipment
+                    for index in range(SERIALS_PER_EQUIPMENT)
+                ),
+            )
+        )
+
+    def create_maintenance(self, equipment):
+        def records():
+            for equipment_id in equipment:
+                if self.random.random() < 0.4:
+                    continue
+                next_day = self.today + timedelta(days=self.random.randint(-30, 180))
+                yield Maintenance(
+                    equipment_id=equipment_id,
+                    last_maintenance_day=next_day - timedelta(days=90),
+                    next_maintenance_day=next_day,
+                    status="expired" if next_day < self.today else "on_track",
+                )
+
+        return len(self.bulk_create(Maintenance, records()))
+
+    def create_backup_equipment(self, locations):
+        producers = self.bulk_create(
+            Producer,
+            (Producer(name=f"{self.run_tag} Producer {index}") for index in range(5)),
+        )
+        buyers = self.bulk_create(
+            Buyer,
+            (
+                Buyer(
+                    full_name=f"{self.run_tag} Buyer {index}",
+                    email=f"buyer{index}@example.com",
+                )
+                for index in range(3)
+            ),
+        )
+        categories = [value for value, _ in BackupEquipment.CATEGORY_CHOICES]
+
+        def backups():
+            for location_id in locations:
+                for index in range(BACKUP_EQUIPMENT_PER_LOCATION):
+                    minimum = self.random.randint(1, 20)
+                    current = self.random.randint(0, 30)
+                    yield BackupEquipment(
+                        name=f"Spare {location_id}.{index}",
+                        minimum_quantity=minimum,
+                        current_quantity=current,
+                        price=Decimal(self.random.randint(500, 500000)) / 100,
+                        status=stock_status(current, minimum),
+                        location_id=location_id,
+                        producer_id=self.random.choice(producers),
+                        buyer_id=self.random.choice(buyers),
+                        category=self.random.choice(categories),
+                    )
+
+        items = list(backups())
+        self.bulk_create(BackupEquipment, items)
+        # Opening snapshots give the seeded stock a ledger baseline.
+        now = timezone.now()
+        self.bulk_create(
+            StockSnapshot,
+            (
+                StockSnapshot(
+                    backup_equipment_id=item.pk,
+                    taken_at=now,
+                    quantity=item.current_quantity,
+                )
+                for item in items
+            ),
+        )
+        return len(items)
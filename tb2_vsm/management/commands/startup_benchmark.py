@@ -0,0 +1,109 @@
+import json
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so already-imported modules do not skew the numbers.
+PROBE = """
+import json, os, resource, sys, time
+
+def rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vsm_tb.settings")
+start = time.perf_counter()
+import django
+django.setup()
+startup = time.perf_counter() - start
+startup_rss = rss_mb()
+ai_at_startup = "google.generativeai" in sys.modules
+
+start = time.perf_counter()
+import tb2_vsm.gemini
+ai_import = time.perf_counter() - start
+
+print(json.dumps({
+    "startup_ms": startup * 1000,
+    "startup_rss_mb": startup_rss,
+    "ai_at_startup": ai_at_startup,
+    "ai_import_ms": ai_import * 1000,
+    "ai_rss_mb": rss_mb(),
+}))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure Django startup time and RSS before and after loading the AI "
+        "provider, optionally failing when a budget is exceeded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5)
+        parser.add_argument(
+            "--max-startup-ms",
+            type=float,
+            default=None,
+            help="Fail if the median startup time exceeds this budget.",
+        )
+        parser.add_argument(
+            "--max-startup-rss-mb",
+            type=float,
+            default=None,
+            help="Fail if the median startup RSS exceeds this budget.",
+        )
+
+    def probe(self):
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup probe failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        samples = [self.probe() for _ in range(max(options["runs"], 1))]
+
+        def median(key):
+            return statistics.median(sample[key] for sample in samples)
+
+        startup_ms = median("startup_ms")
+        startup_rss = median("startup_rss_mb")
+        ai_at_startup = any(sample["ai_at_startup"] for sample in samples)
+
+        self.stdout.write(f"Runs: {len(samples)}")
+        self.stdout.write(
+            f"Startup (django.setup): {startup_ms:.1f} ms, {startup_rss:.1f} MB RSS"
+        )
+        self.stdout.write(
+            f"After loading AI provider: +{median('ai_import_ms'):.1f} ms, "
+            f"{median('ai_rss_mb'):.1f} MB RSS"
+        )
+        self.stdout.write(
+            f"AI provider loaded at startup: {'yes' if ai_at_startup else 'no'}"
+        )
+
+        failures = []
+        if ai_at_startup:
+            failures.append("google.generativeai is imported during startup")
+        if options["max_startup_ms"] and startup_ms > options["max_startup_ms"]:
+            failures.append(
+                f"startup {startup_ms:.1f} ms exceeds {options['max_startup_ms']} ms"
+            )
+        if (
+            options["max_startup_rss_mb"]
+            and startup_rss > options["max_startup_rss_mb"]
+        ):
+            failures.append(
+                f"startup RSS {startup_rss:.1f} MB exceeds "
+                f"{options['max_startup_rss_mb']} MB"
+            )
+        if failures:
+            raise CommandError("; ".join(failures))
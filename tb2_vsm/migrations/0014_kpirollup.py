@@ -0,0 +1,89 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:09
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tb2_vsm", "0013_alter_equipment_production_type_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KpiRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total_operators", models.IntegerField(default=0)),
+                ("step_count", models.IntegerField(default=0)),
+                ("cycle_time_count", models.IntegerField(default=0)),
+                (
+                    "cycle_time_sum",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=14
+                    ),
+                ),
+                (
+                    "average_cycle_time",
+                    models.DecimalField(
+                        decimal_places=2, default=Decimal("0.00"), max_digits=8
+                    ),
+                ),
+                (
+                    "minimum_output_per_hour",
+                    models.DecimalField(
+                        blank=True,
+                        decimal_places=2,
+                        default=None,
+                        max_digits=8,
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "location",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="kpi_rollup",
+                        to="tb2_vsm.location",
+                    ),
+                ),
+                (
+                    "process",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="kpi_rollup",
+                        to="tb2_vsm.process",
+                    ),
+                ),
+                (
+                    "production",
+                    models.OneToOneField(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="kpi_rollup",
+                        to="tb2_vsm.tonieboxproduction",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "KPI Rollup",
+                "verbose_name_plural": "KPI Rollups",
+            },
+        ),
+    ]
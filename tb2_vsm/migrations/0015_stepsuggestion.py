@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tb2_vsm", "0014_kpirollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StepSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prompt_hash", models.CharField(max_length=64, unique=True)),
+                ("suggestion", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_used_at", models.DateTimeField(auto_now=True, db_index=True)),
+                (
+                    "step",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="suggestions",
+                        to="tb2_vsm.step",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Step Suggestion",
+                "verbose_name_plural": "Step Suggestions",
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:34
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+TRIGRAM_INDEX = "serial_number_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    # GIN trigram indexes only exist on PostgreSQL; other backends fall back
+    # to ``icontains`` for fuzzy lookups.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON tb2_vsm_equipmentserial "
+        "USING gin (serial_number gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tb2_vsm", "0016_backgroundjob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="equipmentserial",
+            index=models.Index(
+                fields=["serial_number"],
+                name="serial_number_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
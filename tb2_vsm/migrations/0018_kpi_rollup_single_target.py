@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tb2_vsm", "0017_serial_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="kpirollup",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    models.Q(
+                        ("location__isnull", True),
+                        ("process__isnull", False),
+                        ("production__isnull", True),
+                    ),
+                    models.Q(
+                        ("location__isnull", True),
+                        ("process__isnull", True),
+                        ("production__isnull", False),
+                    ),
+                    models.Q(
+                        ("location__isnull", False),
+                        ("process__isnull", True),
+                        ("production__isnull", True),
+                    ),
+                    _connector="OR",
+                ),
+                name="kpi_rollup_single_target",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def backfill_rollups(apps, schema_editor):
+    # KPIs are read from the rollups only, so existing data needs its rows.
+    from tb2_vsm.rollups import rebuild_all
+
+    rebuild_all(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tb2_vsm", "0018_kpi_rollup_single_target"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
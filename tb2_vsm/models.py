@@ -1,9 +1,59 @@
 from django.db import models
+from django.utils import timezone
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from django_countries.fields import CountryField
 from decimal import Decimal
 from django.contrib.postgres.fields import ArrayField
 
 
+def _rollup_kpis():
+    """Read the KPI annotations from the object's KpiRollup row (one join)."""
+    return {
+        "kpi_total_operators": Coalesce(F("kpi_rollup__total_operators"), 0),
+        "kpi_average_cycle_time": F("kpi_rollup__average_cycle_time"),
+        "kpi_minimum_output_per_hour": F("kpi_rollup__minimum_output_per_hour"),
+    }
+
+
+class TonieboxProductionQuerySet(models.QuerySet):
+    def with_kpis(self):
+        """Annotate operator sum, average cycle time and minimum output/h from
+        the precomputed KpiRollup."""
+        return self.annotate(**_rollup_kpis())
+
+
+class EquipmentQuerySet(models.QuerySet):
+    def with_serial_summary(self, preview_size=20):
+        """Annotate ``serial_count`` in SQL and prefetch the first
+        ``preview_size`` serial numbers, in order, as ``preview_serials``."""
+        serials = (
+            EquipmentSerial.objects.filter(equipment=OuterRef("pk"))
+            .order_by()
+            .values("equipment")
+        )
+        return self.annotate(
+            serial_count=Coalesce(
+                Subquery(serials.annotate(value=Count("pk")).values("value")), 0
+            ),
+        ).prefetch_related(
+            models.Prefetch(
+                "serials",
+                queryset=EquipmentSerial.objects.only(
+                    "equipment_id", "serial_number"
+                ).order_by("serial_number")[:preview_size],
+                to_attr="preview_serials",
+            )
+        )
+
+
+class ProcessQuerySet(models.QuerySet):
+    def with_kpis(self):
+        """Annotate operator sum, average cycle time and minimum output/h from
+        the precomputed KpiRollup."""
+        return self.annotate(**_rollup_kpis())
+
+
 class TonieboxProduction(models.Model):
     """Represents a production batch of Tonieboxes."""
 
@@ -55,16 +105,23 @@ class TonieboxProduction(models.Model):
     )
     active = models.BooleanField(default=True)
 
+    objects = TonieboxProductionQuerySet.as_manager()
+
     def __str__(self):
         return self.name or f"Toniebox Production {self.id}"
 
     def total_operators(self):
+        if hasattr(self, "kpi_total_operators"):
+            return self.kpi_total_operators
         total = 0
         for process in self.processes.all():
             total += process.total_operators() or 0
         return total
 
     def average_cycle_time(self):
+        if hasattr(self, "kpi_average_cycle_time"):
+            value = self.kpi_average_cycle_time
+            return round(Decimal(value), 2) if value is not None else 0
         steps = [
             step for process in self.processes.all() for step in process.steps.all()
         ]
@@ -72,6 +129,8 @@ class TonieboxProduction(models.Model):
         return round(sum(cycle_times) / len(cycle_times), 2) if cycle_times else 0
 
     def minimum_output_per_hour(self):
+        if hasattr(self, "kpi_minimum_output_per_hour"):
+            return self.kpi_minimum_output_per_hour or 0
         steps = [
             step for process in self.processes.all() for step in process.steps.all()
         ]
@@ -91,20 +150,30 @@ class Process(models.Model):
     name = models.CharField(max_length=100, null=True, blank=True, default=None)
     order = models.IntegerField(null=True, blank=True, default=None)
 
+    objects = ProcessQuerySet.as_manager()
+
     def __str__(self):
         return self.name or "Unnamed Process"
 
     def total_operators(self):
+        if hasattr(self, "kpi_total_operators"):
+            return self.kpi_total_operators
         return sum((step.amount_of_operators or 0) for step in self.steps.all())
 
     def average_cycle_time(self):
         """Calculates the average cycle time across all steps in the process."""
+        if hasattr(self, "kpi_average_cycle_time"):
+            value = self.kpi_average_cycle_time
+            return round(Decimal(value), 2) if value is not None else 0
         steps = self.steps.all()
         cycle_times = [step.cycle_time for step in steps if step.cycle_time is not None]
         return round(sum(cycle_times) / len(cycle_times), 2) if cycle_times else 0
 
     def minimum_output_per_hour(self):
         """Calculates the minimum output per hour across all steps in the process."""
+        if hasattr(self, "kpi_minimum_output_per_hour"):
+            value = self.kpi_minimum_output_per_hour
+            return value if value is not None else Decimal("0.00")
         steps = self.steps.all()
         output_per_hour = [
             step.output_per_hour for step in steps if step.output_per_hour is not None
@@ -280,6 +349,8 @@ class Equipment(models.Model):
     active = models.BooleanField(default=True, editable=False)
     quantity = models.PositiveIntegerField(default=0)
 
+    objects = EquipmentQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         self.active = not self.backup
         super().save(*args, **kwargs)
@@ -295,5 +366,147 @@ class EquipmentSerial(models.Model):
     serial_number = models.CharField(max_length=100, unique=True)
     notes = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Serves ``startswith`` lookups on PostgreSQL regardless of collation.
+            models.Index(
+                fields=["serial_number"],
+                name="serial_number_prefix_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ]
+
     def __str__(self):
         return self.serial_number
+
+
+class KpiRollup(models.Model):
+    """Precomputed step KPIs for a single Process, TonieboxProduction or Location.
+
+    Exactly one of ``process``, ``production`` or ``location`` is set. Rows are
+    kept current by the handlers in ``tb2_vsm.signals`` and can be rebuilt in
+    bulk with the ``rebuild_rollups`` management command.
+    """
+
+    process = models.OneToOneField(
+        Process,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="kpi_rollup",
+    )
+    production = models.OneToOneField(
+        TonieboxProduction,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="kpi_rollup",
+    )
+    location = models.OneToOneField(
+        Location,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="kpi_rollup",
+    )
+    total_operators = models.IntegerField(default=0)
+    step_count = models.IntegerField(default=0)
+    cycle_time_count = models.IntegerField(default=0)
+    cycle_time_sum = models.DecimalField(
+        max_digits=14, decimal_places=2, default=Decimal("0.00")
+    )
+    average_cycle_time = models.DecimalField(
+        max_digits=8, decimal_places=2, default=Decimal("0.00")
+    )
+    minimum_output_per_hour = models.DecimalField(
+        max_digits=8, decimal_places=2, null=True, blank=True, default=None
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "KPI Rollup"
+        verbose_name_plural = "KPI Rollups"
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    Q(
+                        process__isnull=False,
+                        production__isnull=True,
+                        location__isnull=True,
+                    )
+                    | Q(
+                        process__isnull=True,
+                        production__isnull=False,
+                        location__isnull=True,
+                    )
+                    | Q(
+                        process__isnull=True,
+                        production__isnull=True,
+                        location__isnull=False,
+                    )
+                ),
+                name="kpi_rollup_single_target",
+            )
+        ]
+
+    def __str__(self):
+        target = self.process or self.production or self.location
+        return f"KPI Rollup for {target}"
+
+
+class StepSuggestion(models.Model):
+    """Cached Gemini suggestion, keyed by a hash of the prompt it answers."""
+
+    prompt_hash = models.CharField(max_length=64, unique=True)
+    step = models.ForeignKey(
+        Step,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="suggestions",
+    )
+    suggestion = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name = "Step Suggestion"
+        verbose_name_plural = "Step Suggestions"
+
+    def __str__(self):
+        return f"Suggestion for {self.step or 'deleted step'}"
+
+
+class BackgroundJob(models.Model):
+    """A unit of slow work (e.g. a Gemini call) processed by ``run_workers``."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    result = models.JSONField(null=True, blank=True, default=None)
+    error = models.TextField(blank=True, default="")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True, default=None)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,59 @@
+from .hierarchy import load_hierarchy
+from .models import TonieboxProduction
+
+
+def _step_row(step, process_average):
+    return {
+        "id": step.id,
+        "name": step.name,
+        "description": step.description,
+        "cycle_time": step.cycle_time,
+        "amount_of_operators": step.amount_of_operators,
+        "output_per_hour": step.output_per_hour,
+        "above_average": step.cycle_time is not None
+        and step.cycle_time > process_average,
+    }
+
+
+def _process_row(process):
+    average = process.average_cycle_time()
+    return {
+        "id": process.id,
+        "name": process.name,
+        "order": process.order,
+        "total_operators": process.total_operators(),
+        "average_cycle_time": average,
+        "steps": [_step_row(step, average) for step in process.ordered_steps],
+    }
+
+
+def build_production_report(location_id, category):
+    """Build the production report for one location and category.
+
+    Returns ``None`` when the location does not exist. Otherwise a plain dict
+    holding the location and its active productions of ``category`` with
+    their processes, steps, KPIs and above-average flags, loaded in a fixed
+    number of queries so the template never touches the database.
+    """
+    productions = TonieboxProduction.objects.filter(category=category, active=True)
+    locations = load_hierarchy(productions, location_ids=[location_id])
+    if not locations:
+        return None
+
+    location = locations[0]
+    return {
+        "location": location,
+        "category": category,
+        "productions": [
+            {
+                "id": production.id,
+                "name": production.name,
+                "total_operators": production.total_operators(),
+                "average_cycle_time": production.average_cycle_time(),
+                "processes": [
+                    _process_row(process) for process in production.ordered_processes
+                ],
+            }
+            for production in location.filtered_productions
+        ],
+    }
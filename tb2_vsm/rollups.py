@@ -0,0 +1,178 @@
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from .models import KpiRollup, Location, Process, Step, TonieboxProduction
+
+
+def _average(cycle_time_sum, cycle_time_count):
+    if not cycle_time_count:
+        return Decimal("0.00")
+    return round(Decimal(cycle_time_sum) / cycle_time_count, 2)
+
+
+def _combine(rollups):
+    """Merge child rollup rows into the totals of their parent."""
+    totals = rollups.aggregate(
+        total_operators=Sum("total_operators"),
+        step_count=Sum("step_count"),
+        cycle_time_count=Sum("cycle_time_count"),
+        cycle_time_sum=Sum("cycle_time_sum"),
+        minimum_output_per_hour=Min("minimum_output_per_hour"),
+    )
+    return _values(**totals)
+
+
+def _values(
+    total_operators,
+    step_count,
+    cycle_time_count,
+    cycle_time_sum,
+    minimum_output_per_hour,
+):
+    cycle_time_sum = Decimal(cycle_time_sum or 0)
+    return {
+        "total_operators": total_operators or 0,
+        "step_count": step_count or 0,
+        "cycle_time_count": cycle_time_count or 0,
+        "cycle_time_sum": cycle_time_sum,
+        "average_cycle_time": _average(cycle_time_sum, cycle_time_count),
+        "minimum_output_per_hour": minimum_output_per_hour,
+    }
+
+
+def _step_aggregates(steps, *group_by):
+    return (
+        steps.order_by()
+        .values(*group_by)
+        .annotate(
+            total_operators=Sum("amount_of_operators"),
+            step_count=Count("id"),
+            cycle_time_count=Count("cycle_time"),
+            cycle_time_sum=Sum("cycle_time"),
+            minimum_output_per_hour=Min("output_per_hour"),
+        )
+    )
+
+
+def refresh_process(process_id):
+    """Recompute the rollup of one process from its own steps."""
+    if not Process.objects.filter(pk=process_id).exists():
+        return
+    values = _values(0, 0, 0, 0, None)
+    for row in _step_aggregates(Step.objects.filter(process_id=process_id), "process"):
+        row.pop("process")
+        values = _values(**row)
+    KpiRollup.objects.update_or_create(process_id=process_id, defaults=values)
+
+
+def refresh_production(production_id):
+    """Recompute the rollup of one production from its process rollups."""
+    if not TonieboxProduction.objects.filter(pk=production_id).exists():
+        return
+    values = _combine(
+        KpiRollup.objects.filter(process__toniebox_productions=production_id)
+    )
+    KpiRollup.objects.update_or_create(production_id=production_id, defaults=values)
+
+
+def refresh_location(location_id):
+    """Recompute the rollup of one location from its active production rollups."""
+    if not Location.objects.filter(pk=location_id).exists():
+        return
+    values = _combine(
+        KpiRollup.objects.filter(
+            production__location_id=location_id, production__active=True
+        )
+    )
+    KpiRollup.objects.update_or_create(location_id=location_id, defaults=values)
+
+
+def refresh_productions(production_ids):
+    """Recompute the given productions and the locations they belong to."""
+    production_ids = {pk for pk in production_ids if pk is not None}
+    for production_id in production_ids:
+        refresh_production(production_id)
+    location_ids = (
+        TonieboxProduction.objects.filter(pk__in=production_ids)
+        .exclude(location__isnull=True)
+        .values_list("location_id", flat=True)
+        .distinct()
+    )
+    for location_id in location_ids:
+        refresh_location(location_id)
+
+
+def refresh_processes(process_ids):
+    """Recompute the given processes and everything that rolls up from them."""
+    process_ids = {pk for pk in process_ids if pk is not None}
+    for process_id in process_ids:
+        refresh_process(process_id)
+    refresh_productions(
+        TonieboxProduction.processes.through.objects.filter(
+            process_id__in=process_ids
+        ).values_list("tonieboxproduction_id", flat=True)
+    )
+
+
+@transaction.atomic
+def rebuild_all(apps=global_apps):
+    """Recompute every rollup row in a handful of grouped queries.
+
+    ``apps`` lets data migrations run this against their historical models.
+    """
+    KpiRollup = apps.get_model("tb2_vsm", "KpiRollup")
+    Location = apps.get_model("tb2_vsm", "Location")
+    Process = apps.get_model("tb2_vsm", "Process")
+    Step = apps.get_model("tb2_vsm", "Step")
+    TonieboxProduction = apps.get_model("tb2_vsm", "TonieboxProduction")
+    rollups = []
+
+    for row in _step_aggregates(Step.objects.filter(process__isnull=False), "process"):
+        rollups.append(KpiRollup(process_id=row.pop("process"), **_values(**row)))
+    covered = {rollup.process_id for rollup in rollups}
+    rollups.extend(
+        KpiRollup(process_id=pk, **_values(0, 0, 0, 0, None))
+        for pk in Process.objects.exclude(pk__in=covered).values_list("pk", flat=True)
+    )
+
+    production_rollups = []
+    for row in _step_aggregates(
+        Step.objects.filter(process__toniebox_productions__isnull=False),
+        "process__toniebox_productions",
+    ):
+        production_id = row.pop("process__toniebox_productions")
+        production_rollups.append(
+            KpiRollup(production_id=production_id, **_values(**row))
+        )
+    covered = {rollup.production_id for rollup in production_rollups}
+    production_rollups.extend(
+        KpiRollup(production_id=pk, **_values(0, 0, 0, 0, None))
+        for pk in TonieboxProduction.objects.exclude(pk__in=covered).values_list(
+            "pk", flat=True
+        )
+    )
+    rollups.extend(production_rollups)
+
+    location_rollups = []
+    for row in _step_aggregates(
+        Step.objects.filter(
+            process__toniebox_productions__location__isnull=False,
+            process__toniebox_productions__active=True,
+        ),
+        "process__toniebox_productions__location",
+    ):
+        location_id = row.pop("process__toniebox_productions__location")
+        location_rollups.append(KpiRollup(location_id=location_id, **_values(**row)))
+    covered = {rollup.location_id for rollup in location_rollups}
+    location_rollups.extend(
+        KpiRollup(location_id=pk, **_values(0, 0, 0, 0, None))
+        for pk in Location.objects.exclude(pk__in=covered).values_list("pk", flat=True)
+    )
+    rollups.extend(location_rollups)
+
+    KpiRollup.objects.all().delete()
+    KpiRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
@@ -0,0 +1,228 @@
+import csv
+import io
+import os
+import zipfile
+
+from django.db import transaction
+
+from .models import Equipment, EquipmentSerial
+
+REQUIRED_COLUMNS = ["serial_number", "equipment", "location"]
+MAX_REPORTED_ISSUES = 500
+SERIAL_MAX_LENGTH = EquipmentSerial._meta.get_field("serial_number").max_length
+
+
+class SerialImportError(Exception):
+    """Raised when a file cannot be imported at all (bad type or header)."""
+
+
+class ImportResult:
+    """Running totals of an import; only the first issues are kept in memory."""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.issues = []
+
+    def add_issue(self, line, serial_number, message, duplicate=False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.invalid += 1
+        if len(self.issues) < MAX_REPORTED_ISSUES:
+            self.issues.append(
+                {"line": line, "serial_number": serial_number, "message": message}
+            )
+
+    def __str__(self):
+        verb = "would be created" if self.dry_run else "created"
+        return (
+            f"{self.rows} rows: {self.created} {verb}, "
+            f"{self.duplicates} duplicates, {self.invalid} invalid"
+        )
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store numeric serials as floats.
+        value = int(value)
+    return str(value).strip()
+
+
+def _csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        yield from csv.reader(text)
+    except UnicodeDecodeError:
+        raise SerialImportError(
+            "The CSV file is not UTF-8 encoded. Save it as 'CSV UTF-8' and "
+            "upload it again."
+        )
+    except csv.Error as e:
+        raise SerialImportError(f"The CSV file could not be read: {e}")
+    finally:
+        text.detach()
+
+
+def _xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise SerialImportError("XLSX import requires the openpyxl package.")
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # read_only streams rows instead of building the whole sheet in memory.
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError, ValueError):
+        raise SerialImportError(
+            "The file is not a valid Excel workbook. Open it in Excel and save "
+            "it as .xlsx again."
+        )
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_rows(fileobj, filename, required=REQUIRED_COLUMNS):
+    """Yield ``(line_number, row_dict)`` from a CSV or XLSX file, one at a time.
+
+    Raises SerialImportError if a ``required`` column is missing, a CSV is
+    not UTF-8 or a workbook cannot be opened.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        rows = _csv_rows(fileobj)
+    elif extension in (".xlsx", ".xlsm"):
+        rows = _xlsx_rows(fileobj)
+    else:
+        raise SerialImportError(f"Unsupported file type: {extension or filename}")
+
+    header = [_cell(value).lower().replace(" ", "_") for value in next(rows, [])]
+    missing = [column for column in required if column not in header]
+    if missing:
+        rows.close()
+        raise SerialImportError(f"Missing column(s): {', '.join(missing)}")
+
+    for line, values in enumerate(rows, start=2):
+        row = dict.fromkeys(header, "")
+        row.update(zip(header, (_cell(value) for value in values)))
+        if any(row.values()):
+            yield line, row
+
+
+class EquipmentMatcher:
+    """Resolve (name, location, category, country) to an Equipment id, one
+    query per distinct combination."""
+
+    def __init__(self):
+        self._cache = {}
+
+    def match(self, row):
+        key = (
+            row["equipment"].lower(),
+            row["location"].lower(),
+            row.get("category", ""),
+            row.get("country", "").upper(),
+        )
+        if key not in self._cache:
+            self._cache[key] = self._lookup(*key)
+        return self._cache[key]
+
+    def _lookup(self, name, location, category, country):
+        equipment = Equipment.objects.filter(
+            name__iexact=name, location__supplier_name__iexact=location
+        )
+        if category:
+            equipment = equipment.filter(category=category)
+        if country:
+            equipment = equipment.filter(location__country=country)
+        ids = list(equipment.values_list("pk", flat=True)[:2])
+        if not ids:
+            return None, "No matching equipment."
+        if len(ids) > 1:
+            return None, "Several equipment match; add a category or country."
+        return ids[0], None
+
+
+def _flush(chunk, result):
+    serial_numbers = [serial.serial_number for _, serial in chunk]
+    existing = set(
+        EquipmentSerial.objects.filter(serial_number__in=serial_numbers).values_list(
+            "serial_number", flat=True
+        )
+    )
+    new = []
+    for line, serial in chunk:
+        if serial.serial_number in existing:
+            result.add_issue(
+                line, serial.serial_number, "Serial number already exists.", True
+            )
+        else:
+            new.append(serial)
+    if new and not result.dry_run:
+        with transaction.atomic():
+            EquipmentSerial.objects.bulk_create(new, ignore_conflicts=True)
+    result.created += len(new)
+
+
+def import_serials(fileobj, filename, dry_run=False, chunk_size=1000, progress=None):
+    """Stream ``fileobj`` and create an EquipmentSerial for every valid row.
+
+    Rows are validated, matched to equipment by name/location (and optional
+    category/country) and inserted with ``bulk_create`` in chunks. Serials that
+    already exist or repeat within the file are reported as duplicates. With
+    ``dry_run`` nothing is written. ``progress`` is called with the running
+    ImportResult after every chunk.
+    """
+    result = ImportResult(dry_run=dry_run)
+    matcher = EquipmentMatcher()
+    seen = set()
+    chunk = []
+
+    for line, row in iter_rows(fileobj, filename):
+        result.rows += 1
+        serial_number = row["serial_number"]
+        if not serial_number:
+            result.add_issue(line, "", "Serial number is empty.")
+            continue
+        if len(serial_number) > SERIAL_MAX_LENGTH:
+            result.add_issue(line, serial_number, "Serial number is too long.")
+            continue
+        if serial_number in seen:
+            result.add_issue(line, serial_number, "Repeated within the file.", True)
+            continue
+        seen.add(serial_number)
+
+        equipment_id, error = matcher.match(row)
+        if error:
+            result.add_issue(line, serial_number, error)
+            continue
+
+        chunk.append(
+            (
+                line,
+                EquipmentSerial(
+                    equipment_id=equipment_id,
+                    serial_number=serial_number,
+                    notes=row.get("notes") or None,
+                ),
+            )
+        )
+        if len(chunk) >= chunk_size:
+            _flush(chunk, result)
+            chunk = []
+            if progress:
+                progress(result)
+
+    if chunk:
+        _flush(chunk, result)
+    if progress:
+        progress(result)
+    return result
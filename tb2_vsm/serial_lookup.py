@@ -0,0 +1,152 @@
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .graph_cache import GraphCache
+from .models import EquipmentSerial
+
+EXACT = "exact"
+PREFIX = "prefix"
+FUZZY = "fuzzy"
+AUTO = "auto"
+MODES = [AUTO, EXACT, PREFIX, FUZZY]
+
+VERSION_KEY = "tb2_vsm:serial_version"
+# Seconds a process trusts its copy of the shared version, so hot scans do not
+# query the cache backend; changes from other processes show up after this.
+VERSION_TTL = 1.0
+FUZZY_MIN_LENGTH = 3
+
+serial_cache = GraphCache(getattr(settings, "SERIAL_LOOKUP_CACHE_SIZE", 4096))
+_version = {"value": 0, "read_at": None}
+_version_lock = threading.Lock()
+
+
+def bump_version():
+    """Invalidate cached lookups after an equipment, serial or maintenance change."""
+    try:
+        value = cache.incr(VERSION_KEY)
+    except ValueError:
+        if cache.add(VERSION_KEY, 1, timeout=None):
+            value = 1
+        else:
+            value = cache.incr(VERSION_KEY)
+    with _version_lock:
+        _version.update(value=value, read_at=time.monotonic())
+
+
+def current_version():
+    """The shared lookup version, re-read at most once per ``VERSION_TTL``."""
+    now = time.monotonic()
+    with _version_lock:
+        if _version["read_at"] is None or now - _version["read_at"] >= VERSION_TTL:
+            _version.update(value=cache.get(VERSION_KEY, 0), read_at=now)
+        return _version["value"]
+
+
+def _serials():
+    return EquipmentSerial.objects.select_related(
+        "equipment__location", "equipment__maintenance"
+    ).order_by("serial_number")
+
+
+def _row(serial):
+    equipment = serial.equipment
+    maintenance = getattr(equipment, "maintenance", None)
+    return {
+        "serial_number": serial.serial_number,
+        "equipment": {
+            "id": equipment.id,
+            "name": str(equipment),
+            "category": equipment.category,
+            "production_type": equipment.production_type,
+        },
+        "location": {"id": equipment.location_id, "name": str(equipment.location)},
+        "backup": equipment.backup,
+        "next_maintenance_day": (
+            maintenance.next_maintenance_day if maintenance else None
+        ),
+        "has_maintenance": maintenance is not None,
+    }
+
+
+def _with_maintenance_state(row, today):
+    # Maintenance state depends on the date, so it is derived on every read.
+    row = dict(row)
+    next_day = row.pop("next_maintenance_day")
+    if not row.pop("has_maintenance"):
+        row["maintenance"] = None
+        return row
+    row["maintenance"] = {
+        "next_maintenance_day": next_day.isoformat() if next_day else None,
+        "days_until": (next_day - today).days if next_day else None,
+        "status": "expired" if next_day and next_day < today else "on_track",
+    }
+    return row
+
+
+def _exact(term):
+    key = (current_version(), term)
+    row = serial_cache.get(key)
+    if row is not None:
+        return [row], True
+    serial = _serials().filter(serial_number=term).first()
+    if serial is None:
+        return [], False
+    row = _row(serial)
+    serial_cache.set(key, row)
+    return [row], False
+
+
+def _prefix(term, limit):
+    return [
+        _row(serial)
+        for serial in _serials().filter(serial_number__startswith=term)[:limit]
+    ]
+
+
+def _fuzzy(term, limit):
+    if len(term) < FUZZY_MIN_LENGTH:
+        return []
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        serials = (
+            _serials()
+            .filter(serial_number__trigram_similar=term)
+            .annotate(similarity=TrigramSimilarity("serial_number", term))
+            .order_by("-similarity", "serial_number")
+        )
+    else:
+        serials = _serials().filter(serial_number__icontains=term)
+    return [_row(serial) for serial in serials[:limit]]
+
+
+def lookup_serial(term, mode=AUTO, limit=10):
+    """Resolve a scanned serial number to its equipment, location and maintenance.
+
+    ``auto`` tries an exact match, then a prefix match, then trigram
+    similarity. Exact hits are served from an in-process LRU. Returns
+    ``(mode_used, results, cached)``.
+    """
+    term = term.strip()
+    if mode not in MODES:
+        raise ValueError(f"Unknown lookup mode: {mode}")
+    if not term:
+        return mode, [], False
+
+    cached = False
+    if mode in (AUTO, EXACT):
+        results, cached = _exact(term)
+        used = EXACT
+    if mode == PREFIX or (mode == AUTO and not results):
+        results, used = _prefix(term, limit), PREFIX
+    if mode == FUZZY or (mode == AUTO and not results):
+        results, used = _fuzzy(term, limit), FUZZY
+
+    today = date.today()
+    return used, [_with_maintenance_state(row, today) for row in results], cached
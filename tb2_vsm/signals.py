@@ -0,0 +1,133 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from . import rollups, serial_lookup
+from .graph_cache import bump_version
+from .models import (
+    Equipment,
+    EquipmentSerial,
+    Location,
+    Process,
+    Step,
+    TonieboxProduction,
+)
+
+
+def _previous_value(sender, instance, field):
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first()
+
+
+@receiver(pre_save, sender=Step)
+def remember_step_process(sender, instance, **kwargs):
+    instance._previous_process_id = _previous_value(sender, instance, "process_id")
+
+
+@receiver(post_save, sender=Step)
+def update_rollups_on_step_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_process_id", None)
+    rollups.refresh_processes({instance.process_id, previous})
+
+
+@receiver(post_delete, sender=Step)
+def update_rollups_on_step_delete(sender, instance, **kwargs):
+    rollups.refresh_processes({instance.process_id})
+
+
+@receiver(post_save, sender=Process)
+def create_process_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.refresh_process(instance.pk)
+
+
+@receiver(pre_delete, sender=Process)
+def remember_process_productions(sender, instance, **kwargs):
+    instance._production_ids = list(
+        instance.toniebox_productions.values_list("pk", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Process)
+def update_rollups_on_process_delete(sender, instance, **kwargs):
+    rollups.refresh_productions(getattr(instance, "_production_ids", []))
+
+
+@receiver(pre_save, sender=TonieboxProduction)
+def remember_production_location(sender, instance, **kwargs):
+    instance._previous_location_id = _previous_value(sender, instance, "location_id")
+
+
+@receiver(post_save, sender=TonieboxProduction)
+def update_rollups_on_production_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    rollups.refresh_productions({instance.pk})
+    previous = getattr(instance, "_previous_location_id", None)
+    if previous and previous != instance.location_id:
+        rollups.refresh_location(previous)
+
+
+@receiver(post_delete, sender=TonieboxProduction)
+def update_rollups_on_production_delete(sender, instance, **kwargs):
+    if instance.location_id:
+        rollups.refresh_location(instance.location_id)
+
+
+@receiver(post_save, sender=Location)
+def create_location_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.refresh_location(instance.pk)
+
+
+@receiver(m2m_changed, sender=TonieboxProduction.processes.through)
+def update_rollups_on_processes_change(sender, instance, action, reverse, **kwargs):
+    if action == "pre_clear" and reverse:
+        instance._cleared_production_ids = list(
+            instance.toniebox_productions.values_list("pk", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        rollups.refresh_productions({instance.pk})
+    elif action == "post_clear":
+        rollups.refresh_productions(getattr(instance, "_cleared_production_ids", []))
+    else:
+        rollups.refresh_productions(kwargs.get("pk_set") or [])
+
+
+@receiver(post_save, sender=Process)
+@receiver(post_delete, sender=Process)
+@receiver(post_save, sender=TonieboxProduction)
+@receiver(post_delete, sender=TonieboxProduction)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(m2m_changed, sender=TonieboxProduction.processes.through)
+def invalidate_graph_cache(sender, **kwargs):
+    if kwargs.get("raw"):
+        return
+    if kwargs.get("action", "post_").startswith("post_"):
+        bump_version()
+
+
+@receiver(post_save, sender=EquipmentSerial)
+@receiver(post_delete, sender=EquipmentSerial)
+@receiver(post_save, sender=Equipment)
+@receiver(post_delete, sender=Equipment)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender="maintenance.Maintenance")
+@receiver(post_delete, sender="maintenance.Maintenance")
+def invalidate_serial_lookups(sender, raw=False, **kwargs):
+    if not raw:
+        serial_lookup.bump_version()
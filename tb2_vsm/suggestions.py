@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import StepSuggestion
+
+GEMINI_MODEL = "models/gemini-2.0-flash"
+
+
+class SuggestionError(Exception):
+    """A suggestion could not be produced; ``status`` is the HTTP status to report."""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def build_prompt(step):
+    return (
+        f"Evaluate industrial step '{step.name}' which takes {step.cycle_time}s. "
+        f"Task description: {step.description}. "
+        "Provide a concise, technically specific recommendation in English to reduce cycle time, "
+        "based strictly on globally recognized industrial standards (Lean, Kaizen). "
+        "Analyze if the time spent is consistent with the described movements. "
+        "Focus on measurable actions, ergonomics, or tooling changes. Limit to two sentences."
+    )
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(f"{GEMINI_MODEL}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _expiry_cutoff():
+    return timezone.now() - timedelta(seconds=settings.GEMINI_SUGGESTION_TTL)
+
+
+def get_cached_suggestion(prompt):
+    """Return the cached suggestion for ``prompt`` or ``None`` if missing or expired."""
+    entry = (
+        StepSuggestion.objects.filter(
+            prompt_hash=prompt_hash(prompt), created_at__gte=_expiry_cutoff()
+        )
+        .only("pk", "suggestion")
+        .first()
+    )
+    if entry is None:
+        return None
+    StepSuggestion.objects.filter(pk=entry.pk).update(last_used_at=timezone.now())
+    return entry.suggestion
+
+
+def store_suggestion(step, prompt, suggestion):
+    """Store a fresh suggestion and trim the cache to its configured size."""
+    StepSuggestion.objects.update_or_create(
+        prompt_hash=prompt_hash(prompt),
+        defaults={
+            "step": step,
+            "suggestion": suggestion,
+            "created_at": timezone.now(),
+        },
+    )
+    StepSuggestion.objects.filter(created_at__lt=_expiry_cutoff()).delete()
+    overflow = list(
+        StepSuggestion.objects.order_by("-last_used_at").values_list("pk", flat=True)[
+            settings.GEMINI_SUGGESTION_CACHE_SIZE :
+        ]
+    )
+    if overflow:
+        StepSuggestion.objects.filter(pk__in=overflow).delete()
+
+
+def request_suggestion(prompt):
+    """Ask Gemini for a suggestion. Safe to call from worker threads (no DB access)."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise SuggestionError("Configurarion Error: GEMINI_API_KEY not found .env")
+
+    from . import gemini
+
+    response = gemini.generate_content(prompt, api_key, GEMINI_MODEL)
+
+    if not response.parts:
+        raise SuggestionError("Gemini blocked the response due to safety filters.")
+    return response.text
+
+
+def check_step(step):
+    if not step.description or not step.description.strip():
+        raise SuggestionError(
+            "Step description is required to generate AI suggestions.", status=400
+        )
+
+
+def get_suggestion(step, refresh=False):
+    """Return ``(suggestion, cached)`` for ``step``, calling Gemini on a cache miss."""
+    check_step(step)
+    prompt = build_prompt(step)
+    if not refresh:
+        cached = get_cached_suggestion(prompt)
+        if cached is not None:
+            return cached, True
+
+    suggestion = request_suggestion(prompt)
+    store_suggestion(step, prompt, suggestion)
+    return suggestion, False
+
+
+def _ndjson(step_id, **payload):
+    return json.dumps({"step_id": step_id, **payload}) + "\n"
+
+
+def stream_suggestions(steps, refresh=False):
+    """Yield one NDJSON line per step as soon as its suggestion is available.
+
+    Cached suggestions are emitted first. Gemini calls for the remaining steps
+    run on a pool of ``GEMINI_BATCH_CONCURRENCY`` threads; results are stored
+    and emitted from the calling thread in completion order.
+    """
+    pending = {}
+    for step in steps:
+        prompt = build_prompt(step)
+        cached = None if refresh else get_cached_suggestion(prompt)
+        if cached is not None:
+            yield _ndjson(step.pk, suggestion=cached, cached=True)
+        else:
+            pending[step] = prompt
+
+    if not pending:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=settings.GEMINI_BATCH_CONCURRENCY)
+    try:
+        futures = {
+            executor.submit(request_suggestion, prompt): (step, prompt)
+            for step, prompt in pending.items()
+        }
+        for future in as_completed(futures):
+            step, prompt = futures[future]
+            try:
+                suggestion = future.result()
+            except SuggestionError as e:
+                yield _ndjson(step.pk, error=e.message)
+                continue
+            except Exception as e:
+                yield _ndjson(step.pk, error=f"Gemini Error: {str(e)}")
+                continue
+            store_suggestion(step, prompt, suggestion)
+            yield _ndjson(step.pk, suggestion=suggestion, cached=False)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,125 @@
+from textwrap import wrap
+
+from django.utils.html import escape
+
+NODE_WIDTH = 230
+LINE_HEIGHT = 16
+NODE_PADDING = 8
+H_GAP = 20
+V_GAP = 40
+FONT_SIZE = 12
+CHAR_WIDTH = 7
+DETAILS_FONT_SIZE = 10
+DETAILS_CHAR_WIDTH = 6
+
+FILL = "#ECECFF"
+STROKE = "#9370DB"
+WARNING_STROKE = "#E20613"
+
+
+def _wrap(text, char_width):
+    """Split ``text`` into lines that fit the node, keeping comma separated
+    KPIs together where possible; nothing is cut off."""
+    limit = (NODE_WIDTH - 2 * NODE_PADDING) // char_width
+    lines = []
+    for part in text.strip().split(", "):
+        if lines and len(lines[-1]) + len(part) + 2 <= limit:
+            lines[-1] = f"{lines[-1]}, {part}"
+        else:
+            if lines:
+                lines[-1] += ","
+            lines += wrap(part, limit, break_on_hyphens=False) or [""]
+    return lines
+
+
+def _node_lines(node):
+    title = [line for part in node["title"] for line in _wrap(part, CHAR_WIDTH)]
+    return title, _wrap(node["details"], DETAILS_CHAR_WIDTH)
+
+
+def _node_height(node):
+    title, details = _node_lines(node)
+    return (len(title) + len(details)) * LINE_HEIGHT + 2 * NODE_PADDING
+
+
+def _layout(tree):
+    """Place nodes top-down: leaves take consecutive slots, parents are centred."""
+    positions = {}
+    level_heights = {}
+    next_slot = [0]
+
+    def _visit(node, depth):
+        level_heights[depth] = max(level_heights.get(depth, 0), _node_height(node))
+        if node["children"]:
+            slots = [_visit(child, depth + 1) for child in node["children"]]
+            slot = (slots[0] + slots[-1]) / 2
+        else:
+            slot = next_slot[0]
+            next_slot[0] += 1
+        positions[node["id"]] = (slot, depth)
+        return slot
+
+    _visit(tree, 0)
+
+    level_top = {}
+    top = 0
+    for depth in sorted(level_heights):
+        level_top[depth] = top
+        top += level_heights[depth] + V_GAP
+
+    coords = {
+        node_id: (slot * (NODE_WIDTH + H_GAP), level_top[depth])
+        for node_id, (slot, depth) in positions.items()
+    }
+    width = max(next_slot[0], 1) * (NODE_WIDTH + H_GAP) - H_GAP
+    height = top - V_GAP
+    return coords, width, height
+
+
+def render_svg(tree):
+    """Render a graph tree from ``StepAdmin.build_graph_tree`` as a static SVG."""
+    coords, width, height = _layout(tree)
+    edges = []
+    nodes = []
+
+    def _draw(node):
+        x, y = coords[node["id"]]
+        node_height = _node_height(node)
+        stroke = WARNING_STROKE if node["warning"] else STROKE
+        title_lines, detail_lines = _node_lines(node)
+        text = "".join(
+            f'<tspan x="{x + NODE_WIDTH / 2}" dy="{LINE_HEIGHT if i else 0}">'
+            f"{escape(line)}</tspan>"
+            for i, line in enumerate(title_lines)
+        )
+        details = "".join(
+            f'<tspan x="{x + NODE_WIDTH / 2}" dy="{LINE_HEIGHT}" '
+            f'font-size="{DETAILS_FONT_SIZE}" fill="#555">{escape(line)}</tspan>'
+            for line in detail_lines
+        )
+        tooltip = escape(f'{" ".join(node["title"])}\n{node["details"]}')
+        nodes.append(
+            f'<g id="{node["id"]}"><title>{tooltip}</title>'
+            f'<rect x="{x}" y="{y}" width="{NODE_WIDTH}" height="{node_height}" '
+            f'rx="5" fill="{FILL}" stroke="{stroke}"/>'
+            f'<text y="{y + NODE_PADDING + FONT_SIZE}" text-anchor="middle">{text}'
+            f"{details}</text></g>"
+        )
+
+        for child in node["children"]:
+            child_x, child_y = coords[child["id"]]
+            start_x = x + NODE_WIDTH / 2
+            end_x = child_x + NODE_WIDTH / 2
+            mid_y = child_y - V_GAP / 2
+            edges.append(
+                f'<path d="M{start_x},{y + node_height} V{mid_y} H{end_x} '
+                f'V{child_y}" fill="none" stroke="#333"/>'
+            )
+            _draw(child)
+
+    _draw(tree)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" '
+        f'font-size="{FONT_SIZE}">{"".join(edges)}{"".join(nodes)}</svg>'
+    )
@@ -0,0 +1,265 @@
+"""Query-count and latency budgets for every admin changelist and custom view.
+
+Each view is rendered against a small and a larger dataset built by
+``build_dataset``. The number of queries must stay the same as the data grows
+(no N+1) and below the view's ceiling. The wall-clock time of the larger run
+is compared with ``perf_baseline.json``.
+
+Timings depend on the machine, so they only fail the test with
+``VSM_PERF_STRICT=1``; ``VSM_PERF_TOLERANCE`` then sets how much slower than
+the baseline a view may get (default: 5x). ``VSM_PERF_REPORT=1`` (or strict
+mode) prints every view's timing next to its baseline. Set ``VSM_PERF_UPDATE_BASELINE=1``
+to rewrite the baseline from the current run.
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from maintenance.models import Maintenance
+from spare_parts_management.models import (
+    BackupEquipment,
+    Buyer,
+    Producer,
+    StockMovement,
+)
+from tb2_vsm.graph_cache import graph_cache
+from tb2_vsm.models import (
+    Equipment,
+    EquipmentSerial,
+    FactoryCloud,
+    Location,
+    Process,
+    Step,
+    TonieboxProduction,
+)
+
+BASELINE_PATH = Path(__file__).with_name("perf_baseline.json")
+
+SMALL = dict(locations=1, productions=2, processes=1, steps=1, equipment=3)
+LARGE = dict(locations=4, productions=3, processes=3, steps=4, equipment=6)
+
+
+def build_dataset(locations, productions, processes, steps, equipment, prefix="L"):
+    """Create ``locations`` x ``productions`` x ``processes`` x ``steps`` plus
+    ``equipment`` items (with serials, maintenance and backup stock) per location.
+
+    Returns the created locations.
+    """
+    today = timezone.now().date()
+    producer = Producer.objects.create(name=f"{prefix} Producer")
+    buyer = Buyer.objects.create(full_name=f"{prefix} Buyer", email="buyer@test.com")
+    created = []
+    for loc_index in range(locations):
+        location = Location.objects.create(
+            country="DE", supplier_name=f"{prefix} Supplier {loc_index}"
+        )
+        created.append(location)
+        FactoryCloud.objects.create(
+            fc_id=hash((prefix, loc_index)) % 10**9,
+            url="http://example.com",
+            location=location,
+        )
+        for prod_index in range(productions):
+            production = TonieboxProduction.objects.create(
+                name=f"{prefix} Line {loc_index}.{prod_index}",
+                location=location,
+                category=(
+                    TonieboxProduction.TONIEBOX_2
+                    if prod_index % 2 == 0
+                    else TonieboxProduction.TONIES
+                ),
+            )
+            for proc_index in range(processes):
+                process = Process.objects.create(
+                    name=f"{prefix} Process {proc_index}", order=proc_index
+                )
+                production.processes.add(process)
+                for step_index in range(steps):
+                    Step.objects.create(
+                        process=process,
+                        name=f"Step {step_index}",
+                        order=step_index,
+                        cycle_time=10 + step_index,
+                        amount_of_operators=1 + step_index % 3,
+                    )
+        for eq_index in range(equipment):
+            item = Equipment.objects.create(
+                name=f"{prefix} Equipment {loc_index}.{eq_index}",
+                category=Equipment.COMPUTER,
+                location=location,
+                quantity=2,
+                backup=eq_index % 3 == 0,
+            )
+            for serial_index in range(2):
+                EquipmentSerial.objects.create(
+                    equipment=item,
+                    serial_number=f"{prefix}-{loc_index}-{eq_index}-{serial_index}",
+                )
+            Maintenance.objects.create(
+                equipment=item,
+                last_maintenance_day=today - timedelta(days=30),
+                next_maintenance_day=today + timedelta(days=eq_index * 3 - 4),
+            )
+            BackupEquipment.objects.create(
+                name=f"{prefix} Spare {loc_index}.{eq_index}",
+                minimum_quantity=5,
+                current_quantity=eq_index % 7,
+                price=Decimal("12.50"),
+                location=location,
+                producer=producer,
+                buyer=buyer,
+            )
+    return created
+
+
+def _changelist(model):
+    return reverse(f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist")
+
+
+def _adjust_stock_action(loc):
+    """POST data that opens the adjust-stock action's intermediate page."""
+    return {
+        "action": "adjust_stock",
+        "select_across": "1",
+        "index": "0",
+        ACTION_CHECKBOX_NAME: list(
+            BackupEquipment.objects.filter(location=loc).values_list("pk", flat=True)
+        ),
+    }
+
+
+# name -> (url factory, query ceiling[, POST data factory]); ceilings leave two
+# queries of headroom
+VIEWS = {
+    "location_changelist": (lambda loc: _changelist(Location), 7),
+    "production_changelist": (lambda loc: _changelist(TonieboxProduction), 8),
+    "process_changelist": (lambda loc: _changelist(Process), 10),
+    "step_changelist": (lambda loc: _changelist(Step), 10),
+    "factorycloud_changelist": (lambda loc: _changelist(FactoryCloud), 9),
+    "equipment_changelist": (lambda loc: _changelist(Equipment), 9),
+    "equipmentserial_changelist": (
+        lambda loc: reverse("admin:tb2_vsm_equipmentserialproxy_changelist"),
+        8,
+    ),
+    "maintenance_changelist": (lambda loc: _changelist(Maintenance), 12),
+    "backupequipment_changelist": (lambda loc: _changelist(BackupEquipment), 9),
+    "producer_changelist": (lambda loc: _changelist(Producer), 7),
+    "buyer_changelist": (lambda loc: _changelist(Buyer), 7),
+    "step_tree_view": (lambda loc: reverse("admin:step-tree-view"), 8),
+    "vsm_lean_view": (lambda loc: reverse("admin:vsm-lean-view") + "?render=svg", 10),
+    "vsm_lean_tonies_view": (
+        lambda loc: reverse("admin:vsm-lean-tonies-view") + "?render=svg",
+        10,
+    ),
+    "production_report": (
+        lambda loc: reverse(
+            "admin:production_report",
+            args=[loc.pk, TonieboxProduction.TONIEBOX_2],
+        ),
+        8,
+    ),
+    "setup_production_tool": (lambda loc: reverse("admin:setup_production_tool"), 5),
+    "reorder_plan": (lambda loc: reverse("admin:reorder_plan"), 5),
+    "maintenance_calendar": (lambda loc: reverse("admin:maintenance_calendar"), 5),
+    "serial_lookup": (
+        lambda loc: reverse("admin:serial_lookup") + "?q=S-0&mode=prefix",
+        5,
+    ),
+    "serial_import": (lambda loc: reverse("admin:serial_import"), 4),
+    "stockmovement_changelist": (lambda loc: _changelist(StockMovement), 10),
+    "adjust_stock_action": (
+        lambda loc: _changelist(BackupEquipment),
+        10,
+        _adjust_stock_action,
+    ),
+}
+
+
+def _load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+class AdminPerformanceBudgetTests(TestCase):
+    timings = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        report = os.getenv("VSM_PERF_REPORT") == "1"
+        if cls.timings and (report or os.getenv("VSM_PERF_STRICT") == "1"):
+            baseline = _load_baseline()
+            sys.stderr.write("\nAdmin view timings (ms, baseline):\n")
+            for name, ms in sorted(cls.timings.items()):
+                sys.stderr.write(f"  {name:<28} {ms:8.1f} {baseline.get(name, '-')}\n")
+        if os.getenv("VSM_PERF_UPDATE_BASELINE") and cls.timings:
+            baseline = _load_baseline()
+            baseline.update(
+                {name: round(ms, 2) for name, ms in sorted(cls.timings.items())}
+            )
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2) + "\n")
+        super().tearDownClass()
+
+    def setUp(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+
+    def measure(self, url, data=None):
+        def request():
+            if data is None:
+                return self.client.get(url)
+            return self.client.post(url, data)
+
+        graph_cache.clear()
+        # Warm up session, content types and template loading.
+        request()
+        graph_cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - start) * 1000
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx.captured_queries), elapsed
+
+    def test_query_counts_do_not_grow_with_data(self):
+        def measure(view, location):
+            url, _, *data = view
+            return self.measure(url(location), data[0](location) if data else None)
+
+        small = build_dataset(**SMALL, prefix="S")
+        small_counts = {
+            name: measure(view, small[0])[0] for name, view in VIEWS.items()
+        }
+        build_dataset(**LARGE, prefix="B")
+        baseline = _load_baseline()
+        strict = os.getenv("VSM_PERF_STRICT") == "1"
+        tolerance = float(os.getenv("VSM_PERF_TOLERANCE", "5"))
+
+        for name, view in VIEWS.items():
+            with self.subTest(view=name):
+                count, elapsed = measure(view, small[0])
+                self.timings[name] = elapsed
+                self.assertEqual(count, small_counts[name])
+                self.assertLessEqual(count, view[1])
+                if strict and name in baseline:
+                    self.assertLessEqual(
+                        elapsed,
+                        baseline[name] * tolerance,
+                        f"{name} took {elapsed:.1f} ms "
+                        f"(baseline {baseline[name]} ms)",
+                    )
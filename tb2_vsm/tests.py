@@ -1,3 +1,5 @@
+import csv
+import json
 from decimal import Decimal
 from django.forms import ValidationError
 from django.test import TestCase
@@ -8,8 +10,38 @@ from tb2_vsm.models import (
     Location,
     FactoryCloud,
     Equipment,
+    EquipmentSerial,
+    KpiRollup,
+    StepSuggestion,
+    BackgroundJob,
 )
+import os
+import tempfile
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from tb2_vsm.serial_import import SerialImportError, import_serials
+from django.core.management import call_command
 from django_countries.fields import Country
+from tb2_vsm.graph_cache import GraphCache, data_version, graph_cache
+from tb2_vsm.hierarchy import load_hierarchy
+from tb2_vsm.svg import render_svg
+from tb2_vsm.reports import build_production_report
+from tb2_vsm.suggestions import build_prompt, get_cached_suggestion, store_suggestion
+from django.utils import timezone
+from django.test import override_settings
+from django.contrib import admin
+from django.test import RequestFactory
+from tb2_vsm import jobs, serial_lookup
+from maintenance.models import Maintenance
+from maintenance.summary import maintenance_summary
+from spare_parts_management.models import BackupEquipment
+from datetime import timedelta
+from tb2_vsm.admin import linked_location_lookups
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.loader import MigrationLoader
+from importlib import import_module
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
 from unittest.mock import patch, MagicMock
 from django.urls import reverse
 from django.contrib.auth.models import User
@@ -139,6 +171,170 @@ class TonieboxProductionModelTests(TestCase):
         self.assertEqual(self.prod.minimum_output_per_hour(), 180)
 
 
+class KpiAnnotationTests(TestCase):
+    def setUp(self):
+        self.process1 = Process.objects.create(name="Proc1", order=1)
+        self.process2 = Process.objects.create(name="Proc2", order=2)
+        self.empty_process = Process.objects.create(name="Empty", order=3)
+
+        Step.objects.create(
+            process=self.process1, cycle_time=Decimal("10"), amount_of_operators=1
+        )
+        Step.objects.create(
+            process=self.process1, cycle_time=Decimal("20"), amount_of_operators=2
+        )
+        Step.objects.create(
+            process=self.process2, cycle_time=Decimal("15"), amount_of_operators=1
+        )
+        Step.objects.create(process=self.process2, cycle_time=None)
+
+        self.prod = TonieboxProduction.objects.create(name="Batch 1")
+        self.prod.processes.add(self.process1, self.process2)
+        self.empty_prod = TonieboxProduction.objects.create(name="Empty")
+
+    def test_process_with_kpis_matches_python_path(self):
+        for process in Process.objects.with_kpis():
+            fresh = Process.objects.get(pk=process.pk)
+            self.assertEqual(process.total_operators(), fresh.total_operators())
+            self.assertEqual(process.average_cycle_time(), fresh.average_cycle_time())
+            self.assertEqual(
+                process.minimum_output_per_hour(), fresh.minimum_output_per_hour()
+            )
+
+    def test_production_with_kpis_matches_python_path(self):
+        for prod in TonieboxProduction.objects.with_kpis():
+            fresh = TonieboxProduction.objects.get(pk=prod.pk)
+            self.assertEqual(prod.total_operators(), fresh.total_operators())
+            self.assertEqual(prod.average_cycle_time(), fresh.average_cycle_time())
+            self.assertEqual(
+                prod.minimum_output_per_hour(), fresh.minimum_output_per_hour()
+            )
+
+    def test_with_kpis_uses_single_query(self):
+        with self.assertNumQueries(1):
+            prods = list(TonieboxProduction.objects.with_kpis())
+            for prod in prods:
+                prod.total_operators()
+                prod.average_cycle_time()
+                prod.minimum_output_per_hour()
+
+    def test_production_kpi_values(self):
+        prod = TonieboxProduction.objects.with_kpis().get(pk=self.prod.pk)
+        self.assertEqual(prod.total_operators(), 4)
+        self.assertEqual(prod.average_cycle_time(), 15)
+        # the step without cycle time is stored with an output/h of 0
+        self.assertEqual(prod.minimum_output_per_hour(), 0)
+
+
+class KpiRollupTests(TestCase):
+    def setUp(self):
+        self.loc = Location.objects.create(country="DE", supplier_name="Loc1")
+        self.process1 = Process.objects.create(name="Proc1")
+        self.process2 = Process.objects.create(name="Proc2")
+        self.step1 = Step.objects.create(
+            process=self.process1, cycle_time=Decimal("10"), amount_of_operators=1
+        )
+        self.step2 = Step.objects.create(
+            process=self.process1, cycle_time=Decimal("20"), amount_of_operators=2
+        )
+        self.step3 = Step.objects.create(
+            process=self.process2, cycle_time=Decimal("15"), amount_of_operators=1
+        )
+        self.prod = TonieboxProduction.objects.create(name="Line", location=self.loc)
+        self.prod.processes.add(self.process1, self.process2)
+
+    def rollup(self, **kwargs):
+        return KpiRollup.objects.get(**kwargs)
+
+    def test_rollups_follow_step_and_m2m_changes(self):
+        prod_rollup = self.rollup(production=self.prod)
+        self.assertEqual(prod_rollup.total_operators, 4)
+        self.assertEqual(prod_rollup.step_count, 3)
+        self.assertEqual(prod_rollup.average_cycle_time, Decimal("15.00"))
+        self.assertEqual(prod_rollup.minimum_output_per_hour, Decimal("180.00"))
+        self.assertEqual(self.rollup(location=self.loc).total_operators, 4)
+
+        self.step2.amount_of_operators = 5
+        self.step2.save()
+        self.assertEqual(self.rollup(process=self.process1).total_operators, 6)
+        self.assertEqual(self.rollup(location=self.loc).total_operators, 7)
+
+        self.step3.delete()
+        self.assertEqual(self.rollup(production=self.prod).step_count, 2)
+
+        self.prod.processes.remove(self.process1)
+        self.assertEqual(self.rollup(production=self.prod).total_operators, 0)
+        self.assertEqual(self.rollup(location=self.loc).total_operators, 0)
+
+    def test_moving_step_updates_both_processes(self):
+        self.step1.process = self.process2
+        self.step1.save()
+        self.assertEqual(self.rollup(process=self.process1).step_count, 1)
+        self.assertEqual(self.rollup(process=self.process2).step_count, 2)
+
+    def test_inactive_production_excluded_from_location(self):
+        self.prod.active = False
+        self.prod.save()
+        self.assertEqual(self.rollup(location=self.loc).total_operators, 0)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        expected = {
+            (r.process_id, r.production_id, r.location_id): (
+                r.total_operators,
+                r.step_count,
+                r.average_cycle_time,
+                r.minimum_output_per_hour,
+            )
+            for r in KpiRollup.objects.all()
+        }
+        call_command("rebuild_rollups", stdout=StringIO())
+        rebuilt = {
+            (r.process_id, r.production_id, r.location_id): (
+                r.total_operators,
+                r.step_count,
+                r.average_cycle_time,
+                r.minimum_output_per_hour,
+            )
+            for r in KpiRollup.objects.all()
+        }
+        self.assertEqual(rebuilt, expected)
+
+    def test_with_kpis_reads_rollups(self):
+        KpiRollup.objects.filter(production=self.prod).update(
+            total_operators=42, minimum_output_per_hour=Decimal("99.00")
+        )
+        prod = TonieboxProduction.objects.with_kpis().get(pk=self.prod.pk)
+        self.assertEqual(prod.total_operators(), 42)
+        self.assertEqual(prod.minimum_output_per_hour(), Decimal("99.00"))
+
+    def test_location_changelist_reads_rollup(self):
+        KpiRollup.objects.filter(location=self.loc).update(total_operators=42)
+        request = RequestFactory().get("/")
+        location = admin.site._registry[Location].get_queryset(request).get()
+        self.assertEqual(location.active_operators_total, 42)
+
+    def test_migration_backfills_missing_rollups(self):
+        expected = TonieboxProduction.objects.with_kpis().get(pk=self.prod.pk)
+        KpiRollup.objects.all().delete()
+        migration = import_module("tb2_vsm.migrations.0019_backfill_kpi_rollups")
+        state = MigrationLoader(connection).project_state(
+            ("tb2_vsm", "0019_backfill_kpi_rollups")
+        )
+        migration.backfill_rollups(state.apps, None)
+
+        prod = TonieboxProduction.objects.with_kpis().get(pk=self.prod.pk)
+        self.assertEqual(prod.total_operators(), expected.total_operators())
+        self.assertEqual(prod.average_cycle_time(), expected.average_cycle_time())
+        self.assertEqual(self.rollup(location=self.loc).total_operators, 4)
+
+    def test_rollup_needs_exactly_one_target(self):
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                KpiRollup.objects.create(process=self.process1, location=self.loc)
+        with self.assertRaises(IntegrityError):
+            KpiRollup.objects.create()
+
+
 class FactoryCloudModelTests(TestCase):
     def setUp(self):
         self.loc = Location.objects.create(country="FR", supplier_name="Loc2")
@@ -267,6 +463,51 @@ class GeminiIntegrationTests(TestCase):
             {"suggestion": "Suggestion: Use a soldering jig to improve speed."},
         )
 
+    @patch("google.generativeai.GenerativeModel")
+    def test_get_step_suggestion_is_cached(self, mock_model_class):
+        """Repeated requests for an unchanged step are served from the cache."""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text="Use a jig.")
+        mock_model_class.return_value = mock_model
+
+        first = self.client.get(self.url)
+        second = self.client.get(self.url)
+
+        self.assertEqual(first["X-Suggestion-Cache"], "miss")
+        self.assertEqual(second["X-Suggestion-Cache"], "hit")
+        self.assertEqual(second.json(), {"suggestion": "Use a jig."})
+        self.assertEqual(mock_model.generate_content.call_count, 1)
+        self.assertEqual(StepSuggestion.objects.count(), 1)
+
+    @patch("google.generativeai.GenerativeModel")
+    def test_get_step_suggestion_refresh_and_changed_step(self, mock_model_class):
+        """Forced refreshes and edited steps bypass the cached suggestion."""
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text="Use a jig.")
+        mock_model_class.return_value = mock_model
+
+        self.client.get(self.url)
+        self.client.get(self.url, {"refresh": "1"})
+        self.assertEqual(mock_model.generate_content.call_count, 2)
+
+        self.step.cycle_time = Decimal("40.00")
+        self.step.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Suggestion-Cache"], "miss")
+        self.assertEqual(mock_model.generate_content.call_count, 3)
+
+    @override_settings(GEMINI_SUGGESTION_CACHE_SIZE=2)
+    def test_suggestion_cache_is_size_bounded(self):
+        for i in range(4):
+            store_suggestion(self.step, f"prompt {i}", f"answer {i}")
+        self.assertEqual(StepSuggestion.objects.count(), 2)
+        self.assertEqual(get_cached_suggestion("prompt 3"), "answer 3")
+
+    @override_settings(GEMINI_SUGGESTION_TTL=0)
+    def test_expired_suggestion_is_ignored(self):
+        store_suggestion(self.step, "prompt", "answer")
+        self.assertIsNone(get_cached_suggestion("prompt"))
+
     def test_get_step_suggestion_no_description(self):
         """Testa se a view barra chamadas para passos sem descrição."""
         self.step.description = ""
@@ -294,3 +535,1012 @@ class GeminiIntegrationTests(TestCase):
 
         self.assertEqual(response.status_code, 500)
         self.assertIn("API Key Expired", response.json()["error"])
+
+
+class GraphCacheTests(TestCase):
+    def setUp(self):
+        graph_cache.clear()
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+
+        self.loc = Location.objects.create(country="DE", supplier_name="Supplier A")
+        self.process = Process.objects.create(name="Assembly", order=1)
+        Step.objects.create(
+            process=self.process, name="Solder", cycle_time=Decimal("30")
+        )
+        self.prod = TonieboxProduction.objects.create(
+            name="Line 1", location=self.loc, category=TonieboxProduction.TONIEBOX_2
+        )
+        self.prod.processes.add(self.process)
+
+    def test_lru_eviction_and_counters(self):
+        lru = GraphCache(max_entries=2)
+        lru.set("a", "A")
+        lru.set("b", "B")
+        self.assertEqual(lru.get("a"), "A")
+        lru.set("c", "C")
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.stats()["hits"], 1)
+        self.assertEqual(lru.stats()["misses"], 1)
+        self.assertEqual(lru.stats()["size"], 2)
+
+    def test_unchanged_location_is_served_from_cache(self):
+        url = reverse("admin:vsm-lean-view")
+        self.client.get(url)
+        self.assertEqual(graph_cache.stats()["misses"], 1)
+
+        response = self.client.get(url)
+        self.assertEqual(graph_cache.stats()["hits"], 1)
+        self.assertContains(response, "Solder")
+
+    def test_svg_is_default_and_mermaid_is_available(self):
+        url = reverse("admin:vsm-lean-view")
+        response = self.client.get(url)
+        self.assertContains(response, "<svg")
+        self.assertNotContains(response, "graph TD")
+
+        response = self.client.get(url, {"render": "mermaid"})
+        self.assertContains(response, "graph TD")
+        self.assertContains(response, "L_1 --> P_1_1")
+
+    def test_render_svg_escapes_labels(self):
+        tree = {
+            "id": "L_1",
+            "title": ["<Loc>"],
+            "details": "Operators: 1",
+            "warning": False,
+            "children": [
+                {
+                    "id": "P_1_1",
+                    "title": ["Line & Co"],
+                    "details": "CT: 1s",
+                    "warning": True,
+                    "children": [],
+                }
+            ],
+        }
+        svg = render_svg(tree)
+        self.assertTrue(svg.startswith("<svg"))
+        self.assertIn("&lt;Loc&gt;", svg)
+        self.assertIn("Line &amp; Co", svg)
+        self.assertIn("<path", svg)
+
+    def test_render_svg_wraps_instead_of_truncating(self):
+        details = "Operators: 1234, CT: 1234.56s, Min Out/h: 9876.54"
+        title = "📦 A production line with a rather long descriptive name"
+        tree = {
+            "id": "P_1_1",
+            "title": [title],
+            "details": details,
+            "warning": False,
+            "children": [],
+        }
+        svg = render_svg(tree)
+        self.assertIn(details, svg)
+        self.assertIn(title, svg)
+        self.assertNotIn("…", svg)
+        self.assertIn(">Min Out/h: 9876.54</tspan>", svg)
+        self.assertGreater(svg.count("<tspan"), 3)
+
+    def test_version_changes_on_process_rename(self):
+        version = data_version()
+        self.process.name = "Packing"
+        self.process.save()
+        self.assertNotEqual(data_version(), version)
+
+        response = self.client.get(reverse("admin:vsm-lean-view"))
+        self.assertContains(response, "Packing")
+
+
+class HierarchyLoaderTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.counter = 0
+
+    def add_location(self, productions=2, processes=2, steps=3):
+        self.counter += 1
+        loc = Location.objects.create(
+            country="DE", supplier_name=f"Supplier {self.counter}"
+        )
+        for p in range(productions):
+            prod = TonieboxProduction.objects.create(
+                name=f"Line {self.counter}-{p}",
+                location=loc,
+                category=TonieboxProduction.TONIEBOX_2,
+            )
+            for c in range(processes, 0, -1):
+                process = Process.objects.create(name=f"Proc {c}", order=c)
+                prod.processes.add(process)
+                for s in range(steps, 0, -1):
+                    Step.objects.create(
+                        process=process,
+                        name=f"Step {s}",
+                        order=s,
+                        cycle_time=Decimal(10 * s),
+                        amount_of_operators=1,
+                    )
+        return loc
+
+    def count_queries(self, func):
+        with CaptureQueriesContext(connection) as ctx:
+            func()
+        return len(ctx.captured_queries)
+
+    def walk(self):
+        for location in load_hierarchy():
+            for production in location.filtered_productions:
+                production.total_operators()
+                production.average_cycle_time()
+                for process in production.ordered_processes:
+                    process.minimum_output_per_hour()
+                    list(process.ordered_steps)
+
+    def test_tree_is_ordered_and_has_kpis(self):
+        loc = self.add_location(productions=1, processes=2, steps=2)
+        (location,) = load_hierarchy()
+        self.assertEqual(location.pk, loc.pk)
+        (production,) = location.filtered_productions
+        self.assertEqual(production.total_operators(), 4)
+        self.assertEqual(production.average_cycle_time(), 15)
+        self.assertEqual([p.order for p in production.ordered_processes], [1, 2])
+        self.assertEqual(
+            [s.name for s in production.ordered_processes[0].ordered_steps],
+            ["Step 1", "Step 2"],
+        )
+
+    def test_loader_query_count_is_constant(self):
+        self.add_location()
+        baseline = self.count_queries(self.walk)
+        self.add_location(productions=3, processes=3, steps=4)
+        self.add_location()
+        self.assertEqual(self.count_queries(self.walk), baseline)
+        self.assertLessEqual(baseline, 4)
+
+    def test_step_tree_view_query_count_is_constant(self):
+        url = reverse("admin:step-tree-view")
+        self.add_location()
+        baseline = self.count_queries(lambda: self.client.get(url))
+        self.add_location(productions=3, processes=3, steps=4)
+        self.assertEqual(self.count_queries(lambda: self.client.get(url)), baseline)
+
+    def test_vsm_lean_view_query_count_is_constant(self):
+        url = reverse("admin:vsm-lean-view")
+        self.add_location()
+        graph_cache.clear()
+        baseline = self.count_queries(lambda: self.client.get(url))
+        self.add_location(productions=3, processes=3, steps=4)
+        graph_cache.clear()
+        self.assertEqual(self.count_queries(lambda: self.client.get(url)), baseline)
+
+
+class ProductionReportTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.loc = Location.objects.create(country="DE", supplier_name="Supplier A")
+
+    def add_production(self, name, steps=2):
+        prod = TonieboxProduction.objects.create(
+            name=name, location=self.loc, category=TonieboxProduction.TONIES
+        )
+        process = Process.objects.create(name=f"{name} process", order=1)
+        prod.processes.add(process)
+        for s in range(1, steps + 1):
+            Step.objects.create(
+                process=process,
+                name=f"{name} step {s}",
+                order=s,
+                cycle_time=Decimal(10 * s),
+                amount_of_operators=1,
+                description="Manual assembly",
+            )
+        return prod
+
+    def report_url(self):
+        return reverse(
+            "admin:production_report",
+            kwargs={"location_id": self.loc.id, "category": TonieboxProduction.TONIES},
+        )
+
+    def test_report_structure_and_flags(self):
+        self.add_production("Line A", steps=3)
+        report = build_production_report(self.loc.id, TonieboxProduction.TONIES)
+        (production,) = report["productions"]
+        self.assertEqual(production["total_operators"], 3)
+        (process,) = production["processes"]
+        self.assertEqual(process["average_cycle_time"], 20)
+        self.assertEqual(
+            [step["above_average"] for step in process["steps"]],
+            [False, False, True],
+        )
+
+    def test_report_for_unknown_location(self):
+        self.assertIsNone(build_production_report(9999, TonieboxProduction.TONIES))
+
+    def test_report_view_query_count_is_constant(self):
+        self.add_production("Line A")
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.report_url())
+        self.assertContains(response, "Line A step 2")
+        baseline = len(ctx.captured_queries)
+
+        self.add_production("Line B", steps=5)
+        self.add_production("Line C", steps=4)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.report_url())
+        self.assertContains(response, "Line C step 4")
+        self.assertEqual(len(ctx.captured_queries), baseline)
+
+
+class BatchSuggestionTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.loc = Location.objects.create(country="DE", supplier_name="Supplier A")
+        prod = TonieboxProduction.objects.create(
+            name="Line", location=self.loc, category=TonieboxProduction.TONIES
+        )
+        process = Process.objects.create(name="Assembly", order=1)
+        prod.processes.add(process)
+        Step.objects.create(
+            process=process, name="Fast", cycle_time=Decimal("10"), description="a"
+        )
+        self.slow = Step.objects.create(
+            process=process, name="Slow", cycle_time=Decimal("50"), description="b"
+        )
+        self.slower = Step.objects.create(
+            process=process, name="Slower", cycle_time=Decimal("60"), description="c"
+        )
+        Step.objects.create(process=process, name="Undocumented", cycle_time=70)
+        self.url = reverse(
+            "admin:production_report_suggestions",
+            kwargs={"location_id": self.loc.id, "category": TonieboxProduction.TONIES},
+        )
+
+    def read_lines(self, response):
+        body = b"".join(response.streaming_content).decode("utf-8")
+        return [json.loads(line) for line in body.splitlines()]
+
+    @patch("google.generativeai.GenerativeModel")
+    def test_streams_one_line_per_flagged_step(self, mock_model_class):
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = lambda prompt: MagicMock(
+            text=f"Fix: {prompt[:30]}"
+        )
+        mock_model_class.return_value = mock_model
+
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        lines = self.read_lines(response)
+
+        self.assertEqual(
+            {line["step_id"] for line in lines}, {self.slow.id, self.slower.id}
+        )
+        self.assertTrue(all(line["cached"] is False for line in lines))
+        self.assertEqual(StepSuggestion.objects.count(), 2)
+
+        lines = self.read_lines(self.client.get(self.url))
+        self.assertTrue(all(line["cached"] for line in lines))
+        self.assertEqual(mock_model.generate_content.call_count, 2)
+
+    @patch("google.generativeai.GenerativeModel")
+    def test_errors_are_reported_per_step(self, mock_model_class):
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = Exception("Quota exceeded")
+        mock_model_class.return_value = mock_model
+
+        lines = self.read_lines(self.client.get(self.url))
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all("Quota exceeded" in line["error"] for line in lines))
+
+
+class StartupBenchmarkTests(TestCase):
+    def test_ai_provider_is_not_loaded_at_startup(self):
+        out = StringIO()
+        call_command("startup_benchmark", "--runs", "1", stdout=out)
+        self.assertIn("AI provider loaded at startup: no", out.getvalue())
+
+
+class BackgroundJobTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.process = Process.objects.create(name="Assembly")
+        self.step = Step.objects.create(
+            name="Solder Component",
+            description="Use soldering iron to attach the chip.",
+            cycle_time=45.00,
+            process=self.process,
+        )
+        self.url = reverse(
+            "admin:enqueue_step_suggestion", kwargs={"step_id": self.step.id}
+        )
+
+    def test_enqueue_returns_job_id_and_dedupes(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        self.assertEqual(self.client.get(self.url).json()["job_id"], job_id)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_enqueue_serves_cached_suggestion_without_job(self):
+        step = Step.objects.get(pk=self.step.pk)
+        store_suggestion(step, build_prompt(step), "Use a jig.")
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {"suggestion": "Use a jig."})
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    def test_enqueue_requires_description(self):
+        self.step.description = ""
+        self.step.save()
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    @patch("google.generativeai.GenerativeModel")
+    def test_worker_runs_job_and_status_reports_result(self, mock_model_class):
+        mock_model = MagicMock()
+        mock_model.generate_content.return_value = MagicMock(text="Use a jig.")
+        mock_model_class.return_value = mock_model
+
+        job_id = self.client.get(self.url).json()["job_id"]
+        (job,) = jobs.claim_jobs(10)
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(jobs.claim_jobs(10), [])
+        jobs.run_job(job)
+
+        status = self.client.get(
+            reverse("admin:job_status", kwargs={"job_id": job_id})
+        ).json()
+        self.assertEqual(status["status"], BackgroundJob.SUCCEEDED)
+        self.assertEqual(status["result"]["suggestion"], "Use a jig.")
+
+    @patch("google.generativeai.GenerativeModel")
+    def test_failed_job_is_retried_then_failed(self, mock_model_class):
+        mock_model = MagicMock()
+        mock_model.generate_content.side_effect = Exception("API Key Expired")
+        mock_model_class.return_value = mock_model
+
+        job = jobs.enqueue(jobs.STEP_SUGGESTION, {"step_id": self.step.id})
+        job.max_attempts = 2
+        job.save()
+
+        jobs.run_job(jobs.claim_jobs(1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.PENDING)
+        self.assertGreater(job.run_after, timezone.now())
+
+        BackgroundJob.objects.update(run_after=timezone.now())
+        jobs.run_job(jobs.claim_jobs(1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertIn("API Key Expired", job.error)
+
+    def test_missing_step_fails_without_retry(self):
+        job = jobs.enqueue(jobs.STEP_SUGGESTION, {"step_id": 9999})
+        jobs.run_job(jobs.claim_jobs(1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, BackgroundJob.FAILED)
+        self.assertEqual(job.attempts, 1)
+
+    @override_settings(JOB_RETENTION=3600)
+    def test_workers_prune_old_finished_jobs(self):
+        old = timezone.now() - timedelta(hours=2)
+        finished = [
+            BackgroundJob.objects.create(kind=jobs.STEP_SUGGESTION, status=status)
+            for status in [BackgroundJob.SUCCEEDED, BackgroundJob.FAILED]
+        ]
+        stale_pending = BackgroundJob.objects.create(kind=jobs.STEP_SUGGESTION)
+        recent = BackgroundJob.objects.create(
+            kind=jobs.STEP_SUGGESTION, status=BackgroundJob.SUCCEEDED
+        )
+        BackgroundJob.objects.exclude(pk=recent.pk).update(
+            updated_at=old, run_after=timezone.now() + timedelta(days=1)
+        )
+
+        out = StringIO()
+        call_command("run_workers", "--once", stdout=out)
+        self.assertIn("Pruned 2 finished job(s).", out.getvalue())
+        self.assertEqual(
+            set(BackgroundJob.objects.values_list("pk", flat=True)),
+            {stale_pending.pk, recent.pk},
+        )
+        self.assertFalse(BackgroundJob.objects.filter(pk=finished[0].pk).exists())
+
+
+class LocationAdminTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("admin:tb2_vsm_location_changelist")
+        self.counter = 0
+
+    def add_location(self, clouds=1):
+        self.counter += 1
+        loc = Location.objects.create(
+            country="DE", supplier_name=f"Supplier {self.counter}"
+        )
+        process = Process.objects.create(name="Assembly")
+        Step.objects.create(process=process, amount_of_operators=2)
+        Step.objects.create(process=process, amount_of_operators=3)
+        active = TonieboxProduction.objects.create(name="Active", location=loc)
+        inactive = TonieboxProduction.objects.create(
+            name="Inactive", location=loc, active=False
+        )
+        active.processes.add(process)
+        inactive.processes.add(process)
+        for _ in range(clouds):
+            self.counter += 1
+            FactoryCloud.objects.create(
+                fc_id=self.counter, url="http://example.com", location=loc
+            )
+        return loc
+
+    def test_annotated_columns(self):
+        loc = self.add_location(clouds=2)
+        empty = Location.objects.create(country="FR", supplier_name="Empty")
+        admin_obj = admin.site._registry[Location]
+        request = RequestFactory().get(self.url)
+        request.user = self.admin_user
+        rows = {row.pk: row for row in admin_obj.get_queryset(request)}
+        self.assertEqual(admin_obj.production_lines_count(rows[loc.pk]), 2)
+        self.assertEqual(admin_obj.factory_clouds_counts(rows[loc.pk]), 2)
+        self.assertTrue(admin_obj.is_there_factory_cloud_count(rows[loc.pk]))
+        self.assertEqual(admin_obj.total_operators(rows[loc.pk]), 5)
+        self.assertEqual(admin_obj.total_operators(rows[empty.pk]), 0)
+        self.assertFalse(admin_obj.is_there_factory_cloud_count(rows[empty.pk]))
+
+    def test_changelist_query_count_is_constant(self):
+        self.add_location()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        baseline = len(ctx.captured_queries)
+        for _ in range(5):
+            self.add_location(clouds=3)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), baseline)
+
+    def test_annotated_columns_are_sortable(self):
+        self.add_location(clouds=1)
+        self.add_location(clouds=3)
+        for column in range(2, 6):
+            response = self.client.get(self.url, {"o": str(column)})
+            self.assertEqual(response.status_code, 200)
+
+
+class LocationFilterLookupTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.counter = 0
+
+    def add_line(self, steps=2):
+        self.counter += 1
+        loc = Location.objects.create(
+            country="DE", supplier_name=f"Supplier {self.counter}"
+        )
+        process = Process.objects.create(name=f"Process {self.counter}")
+        production = TonieboxProduction.objects.create(
+            name=f"Line {self.counter}", location=loc
+        )
+        production.processes.add(process)
+        for _ in range(steps):
+            Step.objects.create(process=process, cycle_time=10)
+        return loc
+
+    def test_lookups_only_list_linked_locations(self):
+        linked = self.add_line()
+        Location.objects.create(country="FR", supplier_name="Unlinked")
+        self.assertEqual(linked_location_lookups(), [(linked.id, str(linked))])
+
+    def test_lookups_are_cached_until_structure_changes(self):
+        self.add_line()
+        linked_location_lookups()
+        with self.assertNumQueries(1):  # the lookups from the shared cache
+            linked_location_lookups()
+        second = self.add_line()
+        self.assertIn((second.id, str(second)), linked_location_lookups())
+
+    def test_step_edits_reuse_the_single_cache_row(self):
+        self.add_line()
+        linked_location_lookups()
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM django_cache")
+            rows = cursor.fetchone()[0]
+            for step in Step.objects.all():
+                step.cycle_time = 20
+                step.save()
+                linked_location_lookups()
+            cursor.execute("SELECT COUNT(*) FROM django_cache")
+            self.assertEqual(cursor.fetchone()[0], rows)
+
+    def test_changelist_query_counts_are_constant(self):
+        self.add_line()
+        urls = [
+            reverse("admin:tb2_vsm_process_changelist"),
+            reverse("admin:tb2_vsm_step_changelist"),
+        ]
+        baselines = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(url)
+            baselines.append(len(ctx.captured_queries))
+        for _ in range(5):
+            self.add_line(steps=3)
+        for url, baseline in zip(urls, baselines):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(ctx.captured_queries), baseline, url)
+
+
+class SeedVsmCommandTests(TestCase):
+    def seed(self, seed=7):
+        call_command("seed_vsm", scale=0.1, seed=seed, stdout=StringIO())
+
+    def test_seeds_every_model_with_consistent_derived_fields(self):
+        self.seed()
+        self.assertEqual(Location.objects.count(), 1)
+        self.assertEqual(Step.objects.count(), 5 * 20)
+        self.assertEqual(EquipmentSerial.objects.count(), 500 * 10)
+        self.assertTrue(TonieboxProduction.processes.through.objects.exists())
+        for step in Step.objects.exclude(cycle_time=None)[:20]:
+            self.assertAlmostEqual(
+                float(step.output_per_hour), 3600 / float(step.cycle_time), places=1
+            )
+        for equipment in Equipment.objects.all()[:20]:
+            self.assertEqual(equipment.active, not equipment.backup)
+        for process in Process.objects.all():
+            self.assertEqual(
+                process.kpi_rollup.step_count, process.steps.count(), process
+            )
+
+    def test_same_seed_repeats_and_runs_do_not_collide(self):
+        self.seed()
+        first = list(Step.objects.order_by("pk").values_list("cycle_time", flat=True))
+        self.seed()
+        second = list(Step.objects.order_by("pk").values_list("cycle_time", flat=True))
+        self.assertEqual(first, second[len(first) :])
+        self.assertEqual(Location.objects.count(), 2)
+
+    def test_seeding_invalidates_cached_graphs(self):
+        self.seed()
+        version = data_version()
+        self.seed(seed=8)
+        self.assertNotEqual(data_version(), version)
+
+    def test_seeding_refreshes_maintenance_banner(self):
+        before = maintenance_summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed()
+        due = Maintenance.objects.filter(
+            next_maintenance_day__lt=timezone.now().date()
+        ).count()
+        self.assertGreater(due, before["expired"]["count"])
+        self.assertEqual(maintenance_summary()["expired"]["count"], due)
+
+    def test_seeding_refreshes_linked_location_lookups(self):
+        self.seed()
+        linked_location_lookups()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed(seed=8)
+        self.assertEqual(len(linked_location_lookups()), 2)
+
+
+class EquipmentSerialSummaryTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.location = Location.objects.create(country="DE", supplier_name="Sup")
+
+    def add_equipment(self, serials):
+        equipment = Equipment.objects.create(
+            name="PC", category=Equipment.COMPUTER, location=self.location
+        )
+        EquipmentSerial.objects.bulk_create(
+            EquipmentSerial(
+                equipment=equipment, serial_number=f"{equipment.pk}-{i:04d}"
+            )
+            for i in range(serials)
+        )
+        return equipment
+
+    def test_summary_is_annotated_and_truncated(self):
+        few = self.add_equipment(2)
+        many = self.add_equipment(300)
+        empty = self.add_equipment(0)
+        admin_obj = admin.site._registry[Equipment]
+        request = RequestFactory().get("/")
+        request.user = self.admin_user
+        rows = {row.pk: row for row in admin_obj.get_queryset(request)}
+
+        self.assertEqual(rows[few.pk].serial_count, 2)
+        self.assertEqual(
+            admin_obj.serial_numbers_display(rows[few.pk]),
+            f"{few.pk}-0000, {few.pk}-0001",
+        )
+        display = admin_obj.serial_numbers_display(rows[many.pk])
+        self.assertTrue(display.startswith(f"{many.pk}-0000, {many.pk}-0001"))
+        self.assertTrue(display.endswith("(300 total)"))
+        self.assertLess(len(display), 160)
+        self.assertEqual(admin_obj.serial_numbers_display(rows[empty.pk]), "-")
+
+    def test_summary_keeps_a_list_of_exactly_the_preview_length(self):
+        equipment = self.add_equipment(0)
+        # Created out of order: the preview is sorted by serial number.
+        for prefix in ["B", "A"]:
+            EquipmentSerial.objects.create(
+                equipment=equipment, serial_number=prefix * 59
+            )
+        admin_obj = admin.site._registry[Equipment]
+        request = RequestFactory().get("/")
+        row = admin_obj.get_queryset(request).get(pk=equipment.pk)
+        display = admin_obj.serial_numbers_display(row)
+        self.assertEqual(display, f"{'A' * 59}, {'B' * 59}")
+        self.assertEqual(len(display), admin_obj.serial_preview_length)
+
+        EquipmentSerial.objects.create(equipment=equipment, serial_number="C")
+        row = admin_obj.get_queryset(request).get(pk=equipment.pk)
+        self.assertEqual(
+            admin_obj.serial_numbers_display(row),
+            f"{'A' * 59}, {'B' * 59}, … (3 total)",
+        )
+
+    def test_export_skips_the_serial_preview(self):
+        self.add_equipment(3)
+        url = reverse("admin:tb2_vsm_equipment_export", args=["csv"])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            b"".join(response.streaming_content)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if "ROW_NUMBER" in q["sql"].upper()]
+        )
+
+    def test_change_page_shows_paginated_panel(self):
+        equipment = self.add_equipment(120)
+        response = self.client.get(
+            reverse("admin:tb2_vsm_equipment_change", args=[equipment.pk])
+        )
+        self.assertContains(response, f"{equipment.pk}-0049")
+        self.assertNotContains(response, f"{equipment.pk}-0050")
+        self.assertContains(response, "Showing 50 of 120")
+
+        serials_url = reverse("admin:tb2_vsm_equipmentserialproxy_changelist")
+        response = self.client.get(serials_url, {"equipment__id__exact": equipment.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "120 Equipment Serial Numbers")
+
+    def test_changelist_query_count_is_constant(self):
+        url = reverse("admin:tb2_vsm_equipment_changelist")
+        self.add_equipment(3)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        baseline = len(ctx.captured_queries)
+        for _ in range(5):
+            self.add_equipment(40)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(ctx.captured_queries), baseline)
+
+
+class SerialLookupTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.url = reverse("admin:serial_lookup")
+        serial_lookup.serial_cache.clear()
+        location = Location.objects.create(country="DE", supplier_name="Sup")
+        self.equipment = Equipment.objects.create(
+            name="Laser 1",
+            category=Equipment.LASER_MARKER,
+            location=location,
+            backup=True,
+        )
+        for serial in ["LM-000123", "LM-000124", "LM-000200"]:
+            EquipmentSerial.objects.create(
+                equipment=self.equipment, serial_number=serial
+            )
+
+    def lookup(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, response.json()
+
+    def test_exact_match_resolves_equipment_and_is_cached(self):
+        Maintenance.objects.create(
+            equipment=self.equipment,
+            next_maintenance_day=timezone.now().date() - timedelta(days=2),
+        )
+        response, data = self.lookup(q=" LM-000123 ")
+        self.assertEqual(data["mode"], "exact")
+        self.assertEqual(response["X-Serial-Cache"], "MISS")
+        [row] = data["results"]
+        self.assertEqual(row["equipment"]["id"], self.equipment.id)
+        self.assertEqual(row["location"]["name"], "Sup (DE)")
+        self.assertTrue(row["backup"])
+        self.assertEqual(row["maintenance"]["status"], "expired")
+        self.assertEqual(row["maintenance"]["days_until"], -2)
+
+        with self.assertNumQueries(2):  # session + user; no lookup query
+            response, cached = self.lookup(q="LM-000123")
+        self.assertEqual(response["X-Serial-Cache"], "HIT")
+        self.assertEqual(cached["results"], data["results"])
+
+    def test_version_from_other_processes_is_read_after_ttl(self):
+        self.lookup(q="LM-000123")
+        # Another process (e.g. the scheduler) bumps the shared version.
+        cache.incr(serial_lookup.VERSION_KEY)
+        with patch.object(serial_lookup, "VERSION_TTL", 3600):
+            response, _ = self.lookup(q="LM-000123")
+            self.assertEqual(response["X-Serial-Cache"], "HIT")
+        with patch.object(serial_lookup, "VERSION_TTL", 0):
+            response, _ = self.lookup(q="LM-000123")
+            self.assertEqual(response["X-Serial-Cache"], "MISS")
+
+    def test_cache_is_invalidated_by_equipment_changes(self):
+        self.lookup(q="LM-000123")
+        self.equipment.backup = False
+        self.equipment.save()
+        response, data = self.lookup(q="LM-000123")
+        self.assertEqual(response["X-Serial-Cache"], "MISS")
+        self.assertFalse(data["results"][0]["backup"])
+
+    def test_auto_falls_back_to_prefix_then_fuzzy(self):
+        _, data = self.lookup(q="LM-0001")
+        self.assertEqual(data["mode"], "prefix")
+        self.assertEqual(
+            [row["serial_number"] for row in data["results"]],
+            ["LM-000123", "LM-000124"],
+        )
+        _, data = self.lookup(q="000200")
+        self.assertEqual(data["mode"], "fuzzy")
+        self.assertEqual(data["results"][0]["serial_number"], "LM-000200")
+        _, data = self.lookup(q="nothing")
+        self.assertEqual(data["results"], [])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {"mode": "x"}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {"limit": "x"}).status_code, 400)
+
+    def test_benchmark_command_reports_percentiles(self):
+        out = StringIO()
+        call_command("benchmark_serial_lookup", iterations=20, stdout=out)
+        self.assertIn("p99", out.getvalue())
+
+
+class SerialImportTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.location = Location.objects.create(country="DE", supplier_name="Sup")
+        self.laser = Equipment.objects.create(
+            name="Laser", category=Equipment.LASER_MARKER, location=self.location
+        )
+        self.printer = Equipment.objects.create(
+            name="Printer", category=Equipment.PRINTER, location=self.location
+        )
+        EquipmentSerial.objects.create(equipment=self.laser, serial_number="OLD-1")
+
+    def csv_file(self, lines):
+        return BytesIO(
+            ("serial_number,equipment,location,notes\n" + "\n".join(lines)).encode()
+        )
+
+    def test_imports_in_chunks_and_reports_problems(self):
+        lines = [f"L-{i},laser,sup," for i in range(5)] + [
+            "P-1,Printer,Sup,spare",
+            "OLD-1,Laser,Sup,",
+            "L-0,Laser,Sup,",
+            ",Laser,Sup,",
+            "X-1,Unknown,Sup,",
+        ]
+        progress = []
+        result = import_serials(
+            self.csv_file(lines),
+            "serials.csv",
+            chunk_size=2,
+            progress=lambda r: progress.append(r.created),
+        )
+        self.assertEqual(result.rows, 10)
+        self.assertEqual(result.created, 6)
+        self.assertEqual(result.duplicates, 2)
+        self.assertEqual(result.invalid, 2)
+        self.assertEqual(progress, [2, 4, 6, 6])
+        self.assertEqual(
+            EquipmentSerial.objects.get(serial_number="P-1").equipment, self.printer
+        )
+        self.assertEqual(
+            sorted(issue["line"] for issue in result.issues), [8, 9, 10, 11]
+        )
+
+    def test_dry_run_writes_nothing(self):
+        result = import_serials(
+            self.csv_file(["N-1,Laser,Sup,"]), "serials.csv", dry_run=True
+        )
+        self.assertEqual(result.created, 1)
+        self.assertFalse(EquipmentSerial.objects.filter(serial_number="N-1").exists())
+
+    def test_xlsx_and_bad_files(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(["Serial Number", "Equipment", "Location"])
+        workbook.active.append([12345.0, "Laser", "Sup"])
+        data = BytesIO()
+        workbook.save(data)
+        data.seek(0)
+        result = import_serials(data, "serials.xlsx")
+        self.assertEqual(result.created, 1)
+        self.assertTrue(EquipmentSerial.objects.filter(serial_number="12345").exists())
+
+        with self.assertRaises(SerialImportError):
+            import_serials(BytesIO(b"a,b\n"), "serials.csv")
+        with self.assertRaises(SerialImportError):
+            import_serials(BytesIO(b""), "serials.txt")
+
+    def test_unreadable_uploads_are_reported_not_500(self):
+        url = reverse("admin:serial_import")
+        cp1252 = "serial_number,equipment,location\nM-1,Lüfter,Sup\n".encode("cp1252")
+        cases = [
+            ("serials.csv", cp1252, "not UTF-8 encoded"),
+            ("serials.xlsx", b"not a zip file", "not a valid Excel workbook"),
+            ("serials.xlsx", self.csv_file(["M-2,Laser,Sup,"]).read(), "not a valid"),
+        ]
+        for name, content, message in cases:
+            with self.subTest(name=name, message=message):
+                with self.assertRaisesMessage(SerialImportError, message):
+                    import_serials(BytesIO(content), name)
+                response = self.client.post(
+                    url, {"file": SimpleUploadedFile(name, content)}
+                )
+                self.assertContains(response, message)
+        self.assertFalse(EquipmentSerial.objects.filter(serial_number="M-2").exists())
+
+    def test_admin_page_and_command(self):
+        url = reverse("admin:serial_import")
+        upload = SimpleUploadedFile(
+            "serials.csv", self.csv_file(["W-1,Laser,Sup,"]).read()
+        )
+        response = self.client.post(url, {"file": upload})
+        self.assertContains(response, "1 rows: 1 created")
+        self.assertTrue(EquipmentSerial.objects.filter(serial_number="W-1").exists())
+        response = self.client.get(
+            reverse("admin:tb2_vsm_equipmentserialproxy_changelist")
+        )
+        self.assertContains(response, url)
+
+        with tempfile.NamedTemporaryFile("wb", suffix=".csv", delete=False) as handle:
+            handle.write(self.csv_file(["C-1,Laser,Sup,", "W-1,Laser,Sup,"]).read())
+        self.addCleanup(os.remove, handle.name)
+        out = StringIO()
+        call_command("import_serials", handle.name, dry_run=True, stdout=out)
+        self.assertIn("Serial number already exists.", out.getvalue())
+        self.assertIn(
+            "Dry run: 2 rows: 1 would be created, 1 duplicates", out.getvalue()
+        )
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(
+            username="admin", email="admin@test.com", password="password"
+        )
+        self.client.login(username="admin", password="password")
+        self.berlin = Location.objects.create(country="DE", supplier_name="Berlin")
+        self.hanoi = Location.objects.create(country="VN", supplier_name="Hanoi")
+        for location in [self.berlin, self.hanoi]:
+            for i in range(3):
+                equipment = Equipment.objects.create(
+                    name=f"{location.supplier_name} PC {i}",
+                    category=Equipment.COMPUTER,
+                    location=location,
+                )
+                EquipmentSerial.objects.create(
+                    equipment=equipment,
+                    serial_number=f"{location.supplier_name}-{i}",
+                )
+                Maintenance.objects.create(
+                    equipment=equipment,
+                    next_maintenance_day=timezone.now().date() + timedelta(days=i),
+                )
+
+    def read_csv(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Buffering"], "no")
+        content = b"".join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_csv_export_honours_changelist_filters(self):
+        url = reverse("admin:tb2_vsm_equipmentserialproxy_export", args=["csv"])
+        rows = self.read_csv(
+            self.client.get(url, {"equipment__location__id__exact": self.hanoi.pk})
+        )
+        self.assertEqual(rows[0][0], "Serial Number")
+        self.assertEqual(
+            sorted(row[0] for row in rows[1:]), ["Hanoi-0", "Hanoi-1", "Hanoi-2"]
+        )
+        self.assertTrue(all(row[4] == "Hanoi (VN)" for row in rows[1:]))
+
+        rows = self.read_csv(self.client.get(url, {"q": "Berlin-1"}))
+        self.assertEqual([row[0] for row in rows[1:]], ["Berlin-1"])
+
+    def test_every_export_streams_in_constant_queries(self):
+        urls = [
+            reverse("admin:tb2_vsm_equipment_export", args=["csv"]),
+            reverse("admin:tb2_vsm_equipmentserialproxy_export", args=["csv"]),
+            reverse("admin:maintenance_maintenance_export", args=["csv"]),
+            reverse(
+                "admin:spare_parts_management_backupequipment_export", args=["csv"]
+            ),
+        ]
+        BackupEquipment.objects.create(
+            name="Spare",
+            minimum_quantity=3,
+            current_quantity=1,
+            price=Decimal("2.50"),
+            location=self.berlin,
+        )
+        for url in urls:
+            response = self.client.get(url)
+            with CaptureQueriesContext(connection) as ctx:
+                rows = self.read_csv(response)
+            self.assertEqual(len(ctx.captured_queries), 1, url)
+            self.assertGreater(len(rows), 1, url)
+
+        rows = self.read_csv(self.client.get(urls[3]))
+        self.assertEqual(rows[1][7], "5.00")
+
+    def test_xlsx_export_and_selected_action(self):
+        from openpyxl import load_workbook
+
+        response = self.client.get(
+            reverse("admin:maintenance_maintenance_export", args=["xlsx"])
+        )
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(BytesIO(b"".join(response.streaming_content)))
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], "Equipment ID")
+        self.assertEqual(len(rows), 7)
+
+        equipment = Equipment.objects.filter(location=self.berlin)
+        response = self.client.post(
+            reverse("admin:tb2_vsm_equipment_changelist"),
+            {
+                "action": "export_selected_csv",
+                "_selected_action": [e.pk for e in equipment],
+            },
+        )
+        rows = self.read_csv(response)
+        self.assertEqual(len(rows), 4)
+
+        changelist = self.client.get(reverse("admin:tb2_vsm_equipment_changelist"))
+        self.assertContains(changelist, "Export CSV")
+        self.assertEqual(
+            self.client.get(
+                reverse("admin:tb2_vsm_equipment_export", args=["pdf"])
+            ).status_code,
+            404,
+        )
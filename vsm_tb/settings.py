@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "tb2_vsm",
     "django_countries",
     "spare_parts_management",
@@ -110,6 +111,21 @@ else:
         }
     }
 
+# Cache versions and summaries are shared by the web, worker and scheduler
+# containers, so the default cache must not be per process. The database
+# cache needs `manage.py createcachetable`, which entrypoint.sh runs.
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", "django_cache"),
+        # Culling could drop a version counter and revive stale entries;
+        # keep it well above the summary keys written per day.
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "100000"))},
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -156,6 +172,19 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", None)
+VSM_GRAPH_CACHE_SIZE = int(os.getenv("VSM_GRAPH_CACHE_SIZE", "256"))
+# "svg" renders value stream graphs server-side, "mermaid" sends Mermaid text.
+VSM_GRAPH_RENDERER = os.getenv("VSM_GRAPH_RENDERER", "svg")
+GEMINI_SUGGESTION_TTL = int(os.getenv("GEMINI_SUGGESTION_TTL", str(30 * 24 * 3600)))
+GEMINI_SUGGESTION_CACHE_SIZE = int(os.getenv("GEMINI_SUGGESTION_CACHE_SIZE", "5000"))
+GEMINI_BATCH_CONCURRENCY = int(os.getenv("GEMINI_BATCH_CONCURRENCY", "4"))
+# Background jobs processed by `manage.py run_workers` (seconds).
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "600"))
+# Finished jobs are deleted by the workers once they are this old.
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+# Hot serial numbers kept in each process by the scanner lookup endpoint.
+SERIAL_LOOKUP_CACHE_SIZE = int(os.getenv("SERIAL_LOOKUP_CACHE_SIZE", "4096"))
 
 CSRF_TRUSTED_ORIGINS = [
     "https://production-overview-1.eu-central-1.dev.tms.toys",